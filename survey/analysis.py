@@ -0,0 +1,131 @@
+import itertools
+
+from survey.models import Question, Condition
+from survey.routing import NUMBER_CONDITIONS
+
+
+# an expression with more answer combinations of its source questions is not enumerated,
+# it is taken as both visible and hidden for some respondents
+MAX_COMBINATIONS = 4096
+MAX_TEXT_CHECKS = 10
+
+TEXT_CHECKS = {
+    Condition.ConditionType.text_contain: "contain",
+    Condition.ConditionType.text_not_contain: "contain",
+    Condition.ConditionType.text_start: "start",
+    Condition.ConditionType.text_not_start: "start",
+    Condition.ConditionType.text_end: "end",
+    Condition.ConditionType.text_not_end: "end",
+}
+
+
+class TextAnswerClass:
+    # every text answer with the given results of contain, start and end checks of conditions
+    __slots__ = ("results",)
+
+    def __init__(self, results):
+        self.results = results
+
+    def __contains__(self, value):
+        return self.results.get(("contain", value), False)
+
+    def startswith(self, value):
+        return self.results.get(("start", value), False)
+
+    def endswith(self, value):
+        return self.results.get(("end", value), False)
+
+
+def answer_domain(question, conditions):
+    """
+    Answers of a question that conditions on it can tell apart, one typed answer value
+    per class: option ids, numbers around every threshold, and text answer classes for
+    each combination of text checks. None if there are too many text checks.
+    """
+    if question.question_type == Question.QuestionType.option:
+        return [option.id for option in question.options]
+    elif question.question_type == Question.QuestionType.numerical:
+        thresholds = sorted({c.number for c in conditions if c.condition in NUMBER_CONDITIONS and c.number is not None})
+        if not thresholds:
+            return [0.0]
+        domain = [thresholds[0] - 1, thresholds[-1] + 1]
+        for low, high in zip(thresholds, thresholds[1:]):
+            domain.append((low + high) / 2)
+        return domain + thresholds
+    checks = sorted({(TEXT_CHECKS[c.condition], c.value) for c in conditions if c.condition in TEXT_CHECKS})
+    if len(checks) > MAX_TEXT_CHECKS:
+        return None
+    return [
+        TextAnswerClass(dict(zip(checks, results)))
+        for results in itertools.product([False, True], repeat=len(checks))
+    ]
+
+
+def analyze_survey(plan):
+    """
+    Static analysis of a compiled survey plan, stored with the survey on publish.
+
+    Every question is checked in priority order against the answers its source questions
+    can have, None included when a source may be skipped or hidden. Sources are taken as
+    independent, so a question is reported unreachable only if no respondent can see it,
+    and path lengths are bounds: min_path_length counts questions every respondent sees,
+    max_path_length the reachable ones, which also bounds answer rows per respondent.
+    unlocks maps a question to questions some answer of it can make visible, and
+    option_unlocks does the same for every option. Keys are strings, like in json.
+    """
+    domains = {}
+    unreachable = []
+    always_visible = 0
+    unlocks = {}
+    option_unlocks = {}
+    for question in plan.questions:
+        expression = plan.get_expression(question.id)
+        source_ids = sorted({condition.source_question_id for condition in expression.conditions})
+        source_domains = [domains.get(source_id, [None]) for source_id in source_ids]
+        combinations = 1
+        for domain in source_domains:
+            combinations = combinations * len(domain) if domain is not None else MAX_COMBINATIONS + 1
+
+        if combinations > MAX_COMBINATIONS:
+            outcomes = {True, False}
+            visible_answers = [
+                (source_id, value) for source_id, domain in zip(source_ids, source_domains)
+                for value in domain or [True] if value is not None
+            ]
+        else:
+            outcomes = set()
+            visible_answers = set()
+            for values in itertools.product(*source_domains):
+                answers = dict(zip(source_ids, values))
+                visible = expression.evaluate(answers.get)
+                outcomes.add(visible)
+                if visible:
+                    visible_answers.update(
+                        (source_id, value) for source_id, value in answers.items() if value is not None)
+
+        for source_id, value in visible_answers:
+            unlocks.setdefault(str(source_id), set()).add(question.id)
+            source = plan.get_question(source_id)
+            if source.question_type == Question.QuestionType.option:
+                for option in source.options:
+                    if option.id == value or combinations > MAX_COMBINATIONS:
+                        option_unlocks.setdefault(str(option.id), set()).add(question.id)
+
+        if True not in outcomes:
+            unreachable.append(question.id)
+            domains[question.id] = [None]
+            continue
+        if outcomes == {True}:
+            always_visible += 1
+        domain = answer_domain(question, plan.source_conditions(question.id))
+        if domain is not None and (not question.required or outcomes != {True}):
+            domain.append(None)
+        domains[question.id] = domain
+
+    return {
+        "unreachable_questions": unreachable,
+        "min_path_length": always_visible,
+        "max_path_length": len(plan.questions) - len(unreachable),
+        "unlocks": {key: sorted(value) for key, value in unlocks.items()},
+        "option_unlocks": {key: sorted(value) for key, value in option_unlocks.items()},
+    }
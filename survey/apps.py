@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SurveyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'survey'
+
+    def ready(self):
+        import survey.signals  # noqa: F401
+        import survey.instrumentation  # noqa: F401
@@ -0,0 +1,278 @@
+import asyncio
+import math
+import platform
+import random
+import time
+from datetime import datetime, timezone
+
+import django
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from survey import engine
+from survey.instrumentation import get_query_stats, reset_query_stats
+from survey.cache import get_survey_plan
+from survey.definition import SurveyDefinition
+from survey.models import Question
+from survey.routing import compile_survey, parse_number
+from survey.testing import make_survey, make_answer, RespondentWalk
+
+
+def percentile(values, percent):
+    # nearest rank percentile of a sorted list
+    if not values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed else None,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else None,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+    }
+
+
+def run_in_test_database(benchmark):
+    # never touch real data, benchmarks create surveys and users
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        return benchmark.run()
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+
+
+def environment():
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+    }
+
+
+class TimedRespondentWalk(RespondentWalk):
+    # respondent of the benchmark, request latencies are collected per endpoint
+    def __init__(self, client, survey_id, prefix, latencies):
+        super().__init__(client, survey_id, prefix)
+        self.latencies = latencies
+
+    def timed(self, name, start, response):
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"{name} returned {response.status_code}: {response.content[:200]}")
+        return response
+
+    def request(self, name, question_id, answer):
+        start = time.perf_counter()
+        return self.timed(name, start, super().request(name, question_id, answer))
+
+    async def arequest(self, name, question_id, answer):
+        start = time.perf_counter()
+        return self.timed(name, start, await super().request(name, question_id, answer))
+
+
+class RespondentFlowBenchmark:
+    """
+    Drive first_question, answer/next and answer/previous endpoints with simulated respondents
+    through the test client and report latency percentiles, throughput and queries per request.
+    Run it against a test database, every run creates its own survey and users.
+
+    In async mode the async views are driven through the ASGI handler with `concurrency`
+    respondents in flight at once, they log in with a session so their queries include it.
+    """
+
+    # views of each endpoint, and the url prefix of answer views, per mode
+    modes = {
+        "sync": {
+            "first_question": "FirstQuestionApiView",
+            "next": "NextAnswerApiView",
+            "previous": "PreviousAnswerApiView",
+        },
+        "async": {
+            "first_question": "AsyncFirstQuestionApiView",
+            "next": "AsyncNextAnswerApiView",
+            "previous": "AsyncPreviousAnswerApiView",
+        },
+    }
+    prefixes = {"sync": "", "async": "async/"}
+
+    def __init__(self, questions=40, options=4, conditional=0.5, conditions=2, respondents=50,
+                 previous_ratio=0.2, seed=0, mode="sync", concurrency=1):
+        if mode not in self.modes:
+            raise ValueError(f"unknown benchmark mode {mode}")
+        self.config = {
+            "questions": questions,
+            "options": options,
+            "conditional": conditional,
+            "conditions": conditions,
+            "respondents": respondents,
+            "previous_ratio": previous_ratio,
+            "seed": seed,
+            "mode": mode,
+            "concurrency": concurrency,
+        }
+        self.rng = random.Random(seed)
+        self.endpoints = self.modes[mode]
+
+    def respondent(self, client, survey_id, latencies):
+        return TimedRespondentWalk(client, survey_id, self.prefixes[self.config["mode"]], latencies)
+
+    async def arespond_all(self, survey_id, plan, users, latencies):
+        # every respondent has its own random answers, so results do not depend on scheduling
+        semaphore = asyncio.Semaphore(self.config["concurrency"])
+
+        async def respondent(index, user):
+            async with semaphore:
+                client = AsyncClient()
+                await client.aforce_login(user)
+                await self.respondent(client, survey_id, latencies).awalk(
+                    plan, random.Random(self.config["seed"] + index), previous_ratio=self.config["previous_ratio"])
+
+        await asyncio.gather(*(respondent(index, user) for index, user in enumerate(users)))
+
+    def run(self):
+        config = self.config
+        survey = make_survey(
+            questions=config["questions"],
+            options=config["options"],
+            conditional=config["conditional"],
+            conditions=config["conditions"],
+            seed=config["seed"],
+        )
+        plan = get_survey_plan(survey.id)
+        latencies = {name: [] for name in self.endpoints}
+        reset_query_stats()
+
+        users = [
+            User.objects.create_user(username=f"benchmark-{survey.id}-{respondent}")
+            for respondent in range(config["respondents"])
+        ]
+        start = time.perf_counter()
+        if config["mode"] == "async":
+            async_to_sync(self.arespond_all)(survey.id, plan, users, latencies)
+        else:
+            for user in users:
+                client = APIClient()
+                client.force_authenticate(user)
+                self.respondent(client, survey.id, latencies).walk(
+                    plan, self.rng, previous_ratio=config["previous_ratio"])
+        elapsed = time.perf_counter() - start
+
+        query_stats = get_query_stats()
+        endpoints = {}
+        for name, view_name in self.endpoints.items():
+            endpoints[name] = summarize(latencies[name], elapsed)
+            stats = query_stats.get(view_name)
+            if stats:
+                endpoints[name]["queries_per_request"] = stats["queries"] / stats["requests"]
+                endpoints[name]["max_queries"] = stats["max_queries"]
+                endpoints[name]["sql_ms_per_request"] = stats["time"] / stats["requests"] * 1000
+
+        total = summarize([value for values in latencies.values() for value in values], elapsed)
+        view_stats = [query_stats[view_name] for view_name in self.endpoints.values() if view_name in query_stats]
+        if view_stats:
+            total["queries_per_request"] = sum(s["queries"] for s in view_stats) / sum(s["requests"] for s in view_stats)
+
+        return {
+            "benchmark": "respondent_flow",
+            **environment(),
+            "config": config,
+            "elapsed_s": elapsed,
+            "total": total,
+            "endpoints": endpoints,
+        }
+
+
+class ReplayBenchmark:
+    """
+    Replay answers of simulated respondents with survey.engine.replay on a large synthetic
+    survey, without database access and HTTP, and report latency percentiles of a replay and
+    questions walked per second. Some respondents stop before the end, so replays cover
+    finished and unfinished paths. Compile time of the survey plan is reported too.
+    """
+
+    def __init__(self, questions=1000, options=4, conditional=0.5, conditions=2, respondents=200,
+                 repeat=5, seed=0):
+        self.config = {
+            "questions": questions,
+            "options": options,
+            "conditional": conditional,
+            "conditions": conditions,
+            "respondents": respondents,
+            "repeat": repeat,
+            "seed": seed,
+        }
+        self.rng = random.Random(seed)
+
+    @staticmethod
+    def typed_answer(question, answer):
+        # value of an answer like AnswerSnapshot.typed_value
+        if question.question_type == Question.QuestionType.option:
+            return int(answer)
+        elif question.question_type == Question.QuestionType.numerical:
+            return parse_number(answer)
+        return answer
+
+    def respondent_answers(self, plan):
+        # answers along the path of one respondent, stopping at a random question for a third of them
+        stop = self.rng.randrange(len(plan.questions)) if self.rng.random() < 1 / 3 else None
+        answers = {}
+        question = plan.first_question()
+        while question and question.priority != stop:
+            answers[question.id] = self.typed_answer(question, make_answer(question, self.rng))
+            question = plan.next_question(question.id, answers.get)
+        return answers
+
+    def run(self):
+        config = self.config
+        survey = make_survey(
+            questions=config["questions"],
+            options=config["options"],
+            conditional=config["conditional"],
+            conditions=config["conditions"],
+            seed=config["seed"],
+        )
+        definition = SurveyDefinition.load(survey.id)
+        start = time.perf_counter()
+        compile_survey(definition)
+        compile_s = time.perf_counter() - start
+
+        plan = get_survey_plan(survey.id)
+        respondents = [self.respondent_answers(plan) for _ in range(config["respondents"])]
+        latencies = []
+        walked = 0
+        finished = 0
+        start = time.perf_counter()
+        for _ in range(config["repeat"]):
+            for answers in respondents:
+                replay_start = time.perf_counter()
+                result = engine.replay(plan, answers)
+                latencies.append(time.perf_counter() - replay_start)
+                walked += len(result.path)
+                finished += result.finished
+        elapsed = time.perf_counter() - start
+
+        replay = summarize(latencies, elapsed)
+        replay["questions_per_second"] = walked / elapsed if elapsed else None
+        replay["mean_path_length"] = walked / len(latencies) if latencies else None
+        replay["finished_ratio"] = finished / len(latencies) if latencies else None
+        return {
+            "benchmark": "replay",
+            **environment(),
+            "config": config,
+            "compile_ms": compile_s * 1000,
+            "elapsed_s": elapsed,
+            "replay": replay,
+        }
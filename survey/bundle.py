@@ -0,0 +1,87 @@
+from survey.models import Condition, Operatior
+from survey.routing import PlanCondition, parse_number
+from survey.serializers.question import QuestionSerializer
+
+
+# changed when the routing program format or its semantics change
+BUNDLE_FORMAT = 1
+
+
+def routing_node(node):
+    """
+    Routing program of a condition expression, a tree of json objects. A condition is
+    {"condition", "source", "value"} with "number" for number conditions, an operator is
+    {"operator", "first", "second"}.
+
+    A condition on a question without answer is false. Option conditions compare value
+    with the option id, number conditions compare number with the answer as a number,
+    text conditions check value in the text answer. and_operator, or_operator and
+    xor_operator combine their first and second node.
+    """
+    if isinstance(node, PlanCondition):
+        program = {"condition": node.condition, "source": node.source_question_id, "value": node.value}
+        if node.number is not None:
+            program["number"] = node.number
+        return program
+    return {"operator": node.operator, "first": routing_node(node.first), "second": routing_node(node.second)}
+
+
+def survey_bundle(survey, plan):
+    """
+    Self-contained bundle of a published survey, for clients that run it offline:
+    questions in priority order with their options, and the routing program of every
+    conditional question. A question is shown when its routing program is true with
+    the answers of questions before it, questions without program are always shown.
+    """
+    return {
+        "format": BUNDLE_FORMAT,
+        "survey": {"id": survey.id, "title": survey.title, "version": survey.version},
+        "questions": QuestionSerializer(plan.questions, many=True).data,
+        "routing": {
+            str(question.id): routing_node(plan.get_expression(question.id).root)
+            for question in plan.questions if plan.get_expression(question.id).root is not None
+        },
+    }
+
+
+def evaluate_routing(program, answers):
+    # reference evaluation of a routing program, answers maps question id to the answer text or option id
+    if "operator" in program:
+        first = evaluate_routing(program["first"], answers)
+        if program["operator"] == Operatior.OperatorType.and_operator:
+            return first and evaluate_routing(program["second"], answers)
+        elif program["operator"] == Operatior.OperatorType.or_operator:
+            return first or evaluate_routing(program["second"], answers)
+        elif program["operator"] == Operatior.OperatorType.xor_operator:
+            return first != evaluate_routing(program["second"], answers)
+        return False
+
+    answer = answers.get(program["source"])
+    if answer is None:
+        return False
+    condition = program["condition"]
+    value = program["value"]
+    if condition == Condition.ConditionType.option_equal:
+        return str(answer) == value
+    elif condition == Condition.ConditionType.option_not_equal:
+        return str(answer) != value
+    elif condition.startswith("number_"):
+        answer = parse_number(answer)
+        number = program.get("number")
+        if answer is None or number is None:
+            return False
+        return {
+            Condition.ConditionType.number_lt: answer < number,
+            Condition.ConditionType.number_lte: answer <= number,
+            Condition.ConditionType.number_gt: answer > number,
+            Condition.ConditionType.number_gte: answer >= number,
+        }.get(condition, False)
+    answer = str(answer)
+    return {
+        Condition.ConditionType.text_contain: value in answer,
+        Condition.ConditionType.text_not_contain: value not in answer,
+        Condition.ConditionType.text_start: answer.startswith(value),
+        Condition.ConditionType.text_not_start: not answer.startswith(value),
+        Condition.ConditionType.text_end: answer.endswith(value),
+        Condition.ConditionType.text_not_end: not answer.endswith(value),
+    }.get(condition, False)
@@ -0,0 +1,206 @@
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from survey.models import Survey
+from survey.definition import SurveyDefinition
+from survey.routing import compile_survey
+
+
+# compiled plans already unpickled by this process, {survey_id: (version, plan)}
+_survey_plans = {}
+_survey_plans_lock = threading.Lock()
+
+
+class SurveyStamp(NamedTuple):
+    version: int
+    status: str
+
+
+class SurveyCache:
+    """
+    Survey definitions and compiled plans in the Django cache configured by SURVEY_CACHE
+    setting, shared by every worker. Entries are keyed by Survey.version, and the current
+    version stamp of a survey is cached too, so a cached read does not touch the database.
+    Writes bump the version and replace the stamp (see survey.signals).
+    """
+
+    def __init__(self, alias=None):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(settings, "SURVEY_CACHE", "default")]
+
+    @property
+    def timeout(self):
+        return getattr(settings, "SURVEY_CACHE_TIMEOUT", 60 * 60 * 24)
+
+    @staticmethod
+    def stamp_key(survey_id):
+        return f"survey:stamp:{survey_id}"
+
+    @staticmethod
+    def data_keys(survey_id, version):
+        return [f"survey:definition:{survey_id}:{version}", f"survey:plan:{survey_id}:{version}"]
+
+    def get_stamp(self, survey_id):
+        # version and status of a survey, or None if survey does not exist
+        stamp = self.cache.get(self.stamp_key(survey_id))
+        if stamp is None:
+            stamp = Survey.objects.filter(id=survey_id).values_list("version", "status").first()
+            if stamp is None:
+                return None
+            stamp = SurveyStamp(*stamp)
+            self.cache.set(self.stamp_key(survey_id), stamp, self.timeout)
+        return stamp
+
+    async def aget_stamp(self, survey_id):
+        stamp = await self.cache.aget(self.stamp_key(survey_id))
+        if stamp is None:
+            stamp = await Survey.objects.filter(id=survey_id).values_list("version", "status").afirst()
+            if stamp is None:
+                return None
+            stamp = SurveyStamp(*stamp)
+            await self.cache.aset(self.stamp_key(survey_id), stamp, self.timeout)
+        return stamp
+
+    def set_stamp(self, survey_id, stamp):
+        # data cached for this version by an older survey with the same id is dropped too
+        self.cache.delete_many(self.data_keys(survey_id, stamp.version))
+        self.cache.set(self.stamp_key(survey_id), stamp, self.timeout)
+
+    def invalidate(self, survey_id, version=None):
+        # drop the stamp, and the data cached for a version if given
+        keys = [self.stamp_key(survey_id)]
+        if version is not None:
+            keys += self.data_keys(survey_id, version)
+        self.cache.delete_many(keys)
+
+    def get_definition(self, survey_id, version):
+        key = self.data_keys(survey_id, version)[0]
+        definition = self.cache.get(key)
+        if definition is None:
+            definition = SurveyDefinition.load(survey_id)
+            self.cache.set(key, definition, self.timeout)
+        return definition
+
+    def get_plan(self, survey_id, version, definition=None, plan=None):
+        key = self.data_keys(survey_id, version)[1]
+        cached_plan = self.cache.get(key)
+        if cached_plan is None:
+            if definition is None:
+                definition = self.get_definition(survey_id, version)
+            else:
+                self.cache.set(self.data_keys(survey_id, version)[0], definition, self.timeout)
+            cached_plan = plan or compile_survey(definition)
+            self.cache.set(key, cached_plan, self.timeout)
+        return cached_plan
+
+
+survey_cache = SurveyCache()
+
+
+def touch_survey(survey_id, created=False):
+    """
+    Bump version of a survey after a write to its definition. The new stamp is published
+    when the transaction commits: a reader of another transaction that saw it before would
+    cache the rows committed before under the new version. Until then readers load the stamp
+    from the database, and data cached for the new version, by this transaction or by an
+    older survey with the same id, is dropped again on commit.
+    """
+    if not created:
+        Survey.objects.filter(id=survey_id).update(version=F("version") + 1)
+    stamp = Survey.objects.filter(id=survey_id).values_list("version", "status").first()
+    forget_survey_plan(survey_id)
+    if stamp is None:
+        survey_cache.invalidate(survey_id)
+        return
+    stamp = SurveyStamp(*stamp)
+    survey_cache.invalidate(survey_id, stamp.version)
+    transaction.on_commit(lambda: survey_cache.set_stamp(survey_id, stamp))
+
+
+_touch_batch = threading.local()
+
+
+class TouchBatch:
+    # surveys whose definition changed in a batch_touches block
+    def __init__(self):
+        self.survey_ids = set()
+        # survey of questions deleted in the block, options deleted with them do not look it up
+        self.question_surveys = {}
+
+
+@contextmanager
+def batch_touches():
+    """
+    Definition writes in the block run in one transaction and bump the version of each
+    changed survey once, at the end of it, instead of once per saved or deleted row, like
+    the rows of a cascading delete. A nested block joins the outer one.
+    """
+    batch = current_touch_batch()
+    if batch is not None:
+        yield batch
+        return
+    batch = _touch_batch.current = TouchBatch()
+    try:
+        with transaction.atomic():
+            yield batch
+            _touch_batch.current = None
+            for survey_id in sorted(batch.survey_ids):
+                touch_survey(survey_id)
+    finally:
+        _touch_batch.current = None
+
+
+def current_touch_batch():
+    return getattr(_touch_batch, "current", None)
+
+
+def get_survey_plan(survey_id):
+    # return compiled plan of a published survey, or None if survey is not published
+    stamp = survey_cache.get_stamp(survey_id)
+    if stamp is None or stamp.status != Survey.StatusType.publish:
+        return None
+    entry = _survey_plans.get(survey_id)
+    if entry is not None and entry[0] == stamp.version:
+        return entry[1]
+    plan = survey_cache.get_plan(survey_id, stamp.version)
+    with _survey_plans_lock:
+        _survey_plans[survey_id] = (stamp.version, plan)
+    return plan
+
+
+async def aget_survey_plan(survey_id):
+    # get_survey_plan for async views, a plan missing in cache is compiled in a thread
+    stamp = await survey_cache.aget_stamp(survey_id)
+    if stamp is None or stamp.status != Survey.StatusType.publish:
+        return None
+    entry = _survey_plans.get(survey_id)
+    if entry is not None and entry[0] == stamp.version:
+        return entry[1]
+    plan = await sync_to_async(survey_cache.get_plan)(survey_id, stamp.version)
+    with _survey_plans_lock:
+        _survey_plans[survey_id] = (stamp.version, plan)
+    return plan
+
+
+def publish_survey_plan(survey_id, definition=None, plan=None):
+    # compile plan of a just published survey into the cache, from its definition or plan if already loaded
+    stamp = survey_cache.get_stamp(survey_id)
+    plan = survey_cache.get_plan(survey_id, stamp.version, definition, plan)
+    with _survey_plans_lock:
+        _survey_plans[survey_id] = (stamp.version, plan)
+    return plan
+
+
+def forget_survey_plan(survey_id):
+    with _survey_plans_lock:
+        _survey_plans.pop(survey_id, None)
@@ -0,0 +1,31 @@
+from typing import NamedTuple
+
+from django.db.models import Prefetch
+
+from survey.models import Question, Option, Condition, Operatior
+
+
+def question_options():
+    # prefetch of question options, ordered like options of a survey plan
+    return Prefetch("option_set", queryset=Option.objects.order_by("priority", "id"))
+
+
+class SurveyDefinition(NamedTuple):
+    # every row that define a survey, loaded with one query per model
+    survey_id: int
+    questions: list
+    options: list
+    conditions: list
+    operators: list
+
+    @classmethod
+    def load(cls, survey_id):
+        questions = list(
+            Question.objects.filter(survey_id=survey_id).order_by("priority", "id").prefetch_related(question_options()))
+        return cls(
+            survey_id=survey_id,
+            questions=questions,
+            options=[option for question in questions for option in question.option_set.all()],
+            conditions=list(Condition.objects.filter(survey_id=survey_id).order_by("id")),
+            operators=list(Operatior.objects.filter(survey_id=survey_id).order_by("priority", "id")),
+        )
@@ -0,0 +1,83 @@
+"""
+Routing of respondents through a compiled survey plan, without database access. Answers
+are given as a get_answer(question_id) function or a mapping of question id to the typed
+answer value conditions compare: option id, number, or text (see AnswerSnapshot.typed_value).
+"""
+
+from typing import NamedTuple
+
+from survey.models import Question
+from survey.routing import parse_number
+from survey.translation import Translation
+from survey.validation import Violation
+
+
+class Replay(NamedTuple):
+    path: tuple  # visible questions in priority order
+    current: object  # first question of the path without answer, None if every one is answered
+    error: object  # Violation of the first invalid answer or required question without answer on the path
+    hidden: tuple  # ids of answered questions that are not on the path
+
+    @property
+    def finished(self):
+        # every required question of the path has a valid answer
+        return self.error is None
+
+
+def replay(plan, answers):
+    """
+    Walk the visible path of a survey with a mapping of answers, return the path, where the
+    respondent stands, the first error and the answers of questions the path skips.
+    """
+    path = []
+    current = None
+    error = None
+    question = plan.first_question()
+    while question:
+        path.append(question)
+        # checked like an answer sent to the next answer view
+        message, value = parse_answer(question, answers.get(question.id), False)
+        if message and error is None:
+            error = Violation(message, question=question.id)
+        if value is None:
+            current = current or question
+        question = plan.next_question(question.id, answers.get)
+
+    on_path = {question.id for question in path}
+    hidden = tuple(question_id for question_id in answers if question_id not in on_path)
+    return Replay(path=tuple(path), current=current, error=error, hidden=hidden)
+
+
+def check_question(plan, question, get_answer):
+    """
+    Message why a respondent with these answers can not answer a question, or None: a
+    visible required question before it has no answer, or its conditions fail.
+    """
+    for required_question in plan.required_questions_before(question.id):
+        if get_answer(required_question.id) is None and plan.is_visible(required_question.id, get_answer):
+            return Translation.answer_required_question
+    if not plan.is_visible(question.id, get_answer):
+        return Translation.condition_failed
+    return None
+
+
+def parse_answer(question, user_answer, answered):
+    """
+    Check an answer sent for a question, return the message of the error, or None and
+    the value to store: the plan option of option questions, else the answer. An empty
+    answer skips the question, unless it is required and not answered before, the value
+    is None then. The views and replay check answers with it.
+    """
+    if user_answer is None or user_answer == "":
+        if not answered and question.required:
+            return Translation.this_question_required, None
+        return None, None
+    if question.question_type == Question.QuestionType.numerical:
+        if parse_number(user_answer) is None:
+            return Translation.invalid_answer, None
+    elif question.question_type == Question.QuestionType.option:
+        user_answer = question.get_option(user_answer)
+        if user_answer is None:
+            return Translation.invalid_answer, None
+    return None, user_answer
+
@@ -0,0 +1,36 @@
+from django.db.models import Count, Max, Sum
+
+from survey.models import Survey
+from survey.cache import survey_cache
+
+
+# etag functions for django.views.decorators.http.condition, they change with Survey.version
+
+def version_etag(survey_id, version):
+    return f"survey-{survey_id}-{version}"
+
+
+def survey_version_etag(survey_id):
+    stamp = survey_cache.get_stamp(survey_id)
+    if stamp is None:
+        return None
+    return version_etag(survey_id, stamp.version)
+
+
+def survey_etag(request, survey_id=None, pk=None, **kwargs):
+    survey_id = survey_id if survey_id is not None else pk
+    if not str(survey_id).isdigit():
+        return None
+    return survey_version_etag(survey_id)
+
+
+def survey_list_etag(request, **kwargs):
+    surveys = Survey.objects.aggregate(count=Count("id"), last=Max("id"), versions=Sum("version"))
+    return f"surveys-{surveys['count']}-{surveys['last']}-{surveys['versions']}"
+
+
+def question_options_etag(request, question_id, **kwargs):
+    survey = Survey.objects.filter(question__id=question_id).values_list("id", "version").first()
+    if survey is None:
+        return None
+    return version_etag(*survey)
@@ -0,0 +1,62 @@
+import csv
+import json
+
+from survey.models import Answer
+
+
+class Echo:
+    # file like object for csv.writer that return the line instead of storing it
+    def write(self, value):
+        return value
+
+
+class AnswerExport:
+    """
+    Answers of a survey pivoted to one row per respondent and one column per question, in
+    question priority order. Rows are read with a server side iterator ordered by user, so
+    memory does not grow with respondents. Option answers are exported with their title.
+    """
+
+    formats = {"csv": "text/csv", "jsonl": "application/jsonl"}
+
+    def __init__(self, definition, chunk_size=2000):
+        self.questions = definition.questions
+        self.option_titles = {option.id: option.title for option in definition.options}
+        self.chunk_size = chunk_size
+        self.survey_id = definition.survey_id
+
+    def answers(self):
+        return Answer.objects.filter(question__survey_id=self.survey_id).order_by("user_id").values_list(
+            "user_id", "user__username", "question_id", "text", "option_id").iterator(chunk_size=self.chunk_size)
+
+    def respondents(self):
+        # (user id, username, {question id: value}) of every respondent, in user id order
+        current = None
+        for user_id, username, question_id, text, option_id in self.answers():
+            if current is None or current[0] != user_id:
+                if current is not None:
+                    yield current
+                current = (user_id, username, {})
+            current[2][question_id] = self.option_titles.get(option_id) if option_id is not None else text
+        if current is not None:
+            yield current
+
+    def csv_lines(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(["user_id", "username"] + [question.title for question in self.questions])
+        for user_id, username, values in self.respondents():
+            yield writer.writerow(
+                [user_id, username] + [values.get(question.id, "") for question in self.questions])
+
+    def jsonl_lines(self):
+        for user_id, username, values in self.respondents():
+            yield json.dumps({
+                "user_id": user_id,
+                "username": username,
+                "answers": {str(question.id): values.get(question.id) for question in self.questions},
+            }, ensure_ascii=False) + "\n"
+
+    def lines(self, output_format):
+        if output_format not in self.formats:
+            raise ValueError(f"unknown export format {output_format}")
+        return self.csv_lines() if output_format == "csv" else self.jsonl_lines()
@@ -0,0 +1,195 @@
+from collections import Counter
+
+from django.db import transaction
+
+from survey.cache import touch_survey
+from survey.definition import SurveyDefinition
+from survey.models import Survey, Question, Option, Condition, Operatior
+from survey.translation import Translation
+from survey.validation import Violation, condition_violation, operator_violation, validate_definition
+
+
+OPTION_CONDITIONS = [Condition.ConditionType.option_equal, Condition.ConditionType.option_not_equal]
+
+
+class SurveyImport:
+    """
+    Rows of a survey definition inserted as a new draft survey with one bulk_create per
+    model. The rows come from a definition document, validated data of
+    SurveyImportSerializer, checked in memory with the rules of condition and operator
+    serializers and publish, or from the SurveyDefinition of a survey to clone.
+
+    Ids of the rows only link them together (and the value of option conditions), they
+    are remapped to the ids of the inserted rows. Violations refer to document ids.
+    """
+
+    def __init__(self, title, definition):
+        self.title = title
+        self.questions = definition.questions
+        self.options = definition.options
+        self.conditions = definition.conditions
+        self.operators = definition.operators
+
+    @classmethod
+    def from_document(cls, document):
+        questions = [
+            Question(
+                id=question["id"],
+                title=question["title"],
+                question_type=question["question_type"],
+                required=question["required"],
+                priority=question["priority"],
+            )
+            for question in document["questions"]
+        ]
+        options = [
+            Option(id=option["id"], question_id=question["id"], title=option["title"], priority=option["priority"])
+            for question in document["questions"] for option in question["options"] or []
+        ]
+        conditions = [
+            Condition(
+                id=condition["id"],
+                source_question_id=condition["source_question"],
+                target_question_id=condition["target_question"],
+                condition=condition["condition"],
+                value=condition["value"],
+            )
+            for condition in document["conditions"]
+        ]
+        operators = [
+            Operatior(
+                id=operator["id"],
+                first_condition_id=operator["first_condition"],
+                second_condition_id=operator["second_condition"],
+                operator=operator["operator"],
+                priority=operator["priority"],
+            )
+            for operator in document["operators"]
+        ]
+        return cls(document["survey"]["title"], SurveyDefinition(None, questions, options, conditions, operators))
+
+    def violations(self):
+        """
+        Return every violation of the document rows, like the serializers of the CRUD
+        endpoints would reject them, or when rows are valid the violations of publish.
+        """
+        violations = []
+        for rows, violation in [
+            (self.questions, lambda row: Violation(Translation.duplicate_id, question=row.id)),
+            (self.options, lambda row: Violation(Translation.duplicate_id, question=row.question_id)),
+            (self.conditions, lambda row: Violation(Translation.duplicate_id, condition=row.id)),
+            (self.operators, lambda row: Violation(Translation.duplicate_id, operator=row.id)),
+        ]:
+            ids = Counter(row.id for row in rows)
+            violations.extend(violation(row) for row in rows if ids[row.id] > 1)
+        if violations:
+            return violations
+
+        questions = {question.id: question for question in self.questions}
+        question_options = {}
+        for option in self.options:
+            question_options.setdefault(option.question_id, set()).add(option.id)
+            if questions[option.question_id].question_type != Question.QuestionType.option:
+                violations.append(Violation(Translation.invalid_question_type, question=option.question_id))
+
+        for condition in self.conditions:
+            source_question = questions.get(condition.source_question_id)
+            target_question = questions.get(condition.target_question_id)
+            if source_question is None or target_question is None:
+                violations.append(Violation(Translation.invalid_source_or_target_survey, condition=condition.id))
+                continue
+            options = question_options.get(source_question.id, set())
+            message = condition_violation(
+                condition.condition,
+                condition.value,
+                source_question,
+                target_question,
+                lambda value: int(value) in options,
+            )
+            if message:
+                violations.append(Violation(message, question=target_question.id, condition=condition.id))
+
+        conditions = {condition.id: condition for condition in self.conditions}
+        for operator in self.operators:
+            first_condition = conditions.get(operator.first_condition_id)
+            second_condition = conditions.get(operator.second_condition_id)
+            if first_condition is None or second_condition is None:
+                violations.append(Violation(Translation.invalid_condition_id, operator=operator.id))
+                continue
+            message = operator_violation(first_condition, second_condition)
+            if message:
+                violations.append(Violation(message, operator=operator.id))
+
+        if violations:
+            return violations
+        return validate_definition(SurveyDefinition(
+            survey_id=None,
+            questions=self.questions,
+            options=self.options,
+            conditions=self.conditions,
+            operators=self.operators,
+        ))
+
+    @staticmethod
+    def condition_value(condition, question_types, option_ids):
+        # option id of an option condition, remapped to the inserted option
+        if (
+            condition.condition in OPTION_CONDITIONS
+            and question_types[condition.source_question_id] == Question.QuestionType.option
+            and condition.value.isdigit()
+            and int(condition.value) in option_ids
+        ):
+            return str(option_ids[int(condition.value)])
+        return condition.value
+
+    @transaction.atomic
+    def save(self):
+        # insert the survey as a draft, a document must have no violations
+        survey = Survey.objects.create(title=self.title)
+
+        new_questions = Question.objects.bulk_create([
+            Question(
+                survey=survey,
+                title=question.title,
+                question_type=question.question_type,
+                required=question.required,
+                priority=question.priority,
+            )
+            for question in self.questions
+        ])
+        question_ids = {old.id: new.id for old, new in zip(self.questions, new_questions)}
+
+        new_options = Option.objects.bulk_create([
+            Option(question_id=question_ids[option.question_id], title=option.title, priority=option.priority)
+            for option in self.options
+        ])
+        option_ids = {old.id: new.id for old, new in zip(self.options, new_options)}
+
+        question_types = {question.id: question.question_type for question in self.questions}
+        new_conditions = Condition.objects.bulk_create([
+            Condition(
+                survey=survey,
+                source_question_id=question_ids[condition.source_question_id],
+                target_question_id=question_ids[condition.target_question_id],
+                condition=condition.condition,
+                value=self.condition_value(condition, question_types, option_ids),
+            )
+            for condition in self.conditions
+        ])
+        condition_ids = {old.id: new.id for old, new in zip(self.conditions, new_conditions)}
+
+        Operatior.objects.bulk_create([
+            Operatior(
+                survey=survey,
+                first_condition_id=condition_ids[operator.first_condition_id],
+                second_condition_id=condition_ids[operator.second_condition_id],
+                operator=operator.operator,
+                priority=operator.priority,
+            )
+            for operator in self.operators
+        ])
+
+        # bulk_create does not send signals, a definition cached before commit must not be reused
+        touch_survey(survey.id)
+        survey.refresh_from_db(fields=["version"])
+        return survey
@@ -0,0 +1,124 @@
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# query count and sql time of every view since process start (or last reset)
+_query_stats = {}
+_query_stats_lock = threading.Lock()
+
+# recorder of the async request being served, async views run their queries in other threads
+_current_recorder = ContextVar("query_recorder", default=None)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def record_current_request(execute, sql, params, many, context):
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_current_request not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_current_request)
+
+
+def view_name(request):
+    # class name of the view, with the action for viewsets (QuestionViewSet.list)
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+    view_class = getattr(match.func, "cls", None) or getattr(match.func, "view_class", None)
+    if view_class is None:
+        return match.func.__name__
+    actions = getattr(match.func, "actions", None)
+    if actions and request.method.lower() in actions:
+        return f"{view_class.__name__}.{actions[request.method.lower()]}"
+    return view_class.__name__
+
+
+def record_query_stats(name, recorder):
+    with _query_stats_lock:
+        stats = _query_stats.setdefault(name, {"requests": 0, "queries": 0, "time": 0.0, "max_queries": 0})
+        stats["requests"] += 1
+        stats["queries"] += recorder.count
+        stats["time"] += recorder.duration
+        stats["max_queries"] = max(stats["max_queries"], recorder.count)
+
+
+def get_query_stats():
+    with _query_stats_lock:
+        return {name: dict(stats) for name, stats in _query_stats.items()}
+
+
+def reset_query_stats():
+    with _query_stats_lock:
+        _query_stats.clear()
+
+
+class QueryAccountingMiddleware:
+    """
+    Count queries and sql time of every request and keep them per view. With
+    SURVEY_QUERY_HEADERS setting enabled the figures are sent in X-Query-Count and
+    X-Query-Time-Ms response headers.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        return self.process_recorder(request, response, recorder)
+
+    async def __acall__(self, request):
+        # queries run in sync_to_async threads, they find the recorder from the copied context
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self.process_recorder(request, response, recorder)
+
+    @staticmethod
+    def process_recorder(request, response, recorder):
+        name = view_name(request)
+        if name is not None:
+            record_query_stats(name, recorder)
+        if getattr(settings, "SURVEY_QUERY_HEADERS", False):
+            response["X-Query-Count"] = str(recorder.count)
+            response["X-Query-Time-Ms"] = f"{recorder.duration * 1000:.2f}"
+        return response
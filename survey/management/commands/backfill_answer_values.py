@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from survey.models import Question, Answer
+from survey.routing import parse_number
+
+
+class Command(BaseCommand):
+    help = "Fill Answer.number of numerical answers saved before typed answer values"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        answers = Answer.objects.filter(
+            question__question_type=Question.QuestionType.numerical, number__isnull=True, text__isnull=False,
+        ).only("id", "text").order_by("id")
+
+        filled = invalid = 0
+        last_id = 0
+        while True:
+            # page by id, filled rows leave the queryset and invalid ones stay behind last_id
+            batch = list(answers.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            changed = []
+            for answer in batch:
+                answer.number = parse_number(answer.text)
+                if answer.number is None:
+                    invalid += 1
+                else:
+                    changed.append(answer)
+            Answer.objects.bulk_update(changed, ["number"])
+            filled += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(f"{filled} answers filled"))
+        if invalid:
+            self.stdout.write(self.style.WARNING(f"{invalid} answers are not a finite number and left empty"))
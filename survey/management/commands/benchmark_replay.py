@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from survey.benchmark import ReplayBenchmark, run_in_test_database
+
+
+class Command(BaseCommand):
+    help = "Benchmark replay of respondent answers with the routing engine on a large synthetic survey"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=1000)
+        parser.add_argument("--options", type=int, default=4)
+        parser.add_argument("--conditional", type=float, default=0.5, help="ratio of questions with conditions")
+        parser.add_argument("--conditions", type=int, default=2, help="conditions of every conditional question")
+        parser.add_argument("--respondents", type=int, default=200)
+        parser.add_argument("--repeat", type=int, default=5, help="replays of every respondent")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="write results as json to this file")
+
+    def handle(self, *args, **options):
+        benchmark = ReplayBenchmark(
+            questions=options["questions"],
+            options=options["options"],
+            conditional=options["conditional"],
+            conditions=options["conditions"],
+            respondents=options["respondents"],
+            repeat=options["repeat"],
+            seed=options["seed"],
+        )
+        results = run_in_test_database(benchmark)
+
+        replay = results["replay"]
+        self.stdout.write(f"compile plan: {results['compile_ms']:.2f} ms")
+        self.stdout.write(
+            f"replays: {replay['requests']}, {replay['throughput']:.1f}/s, p50 {replay['p50_ms']:.3f} ms, "
+            f"p99 {replay['p99_ms']:.3f} ms, {replay['questions_per_second']:.0f} questions/s"
+        )
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"results written to {options['output']}"))
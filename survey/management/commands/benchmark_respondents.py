@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from survey.benchmark import RespondentFlowBenchmark, run_in_test_database
+
+
+class Command(BaseCommand):
+    help = "Benchmark first_question -> answer/next -> answer/previous flow on a synthetic survey in a test database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=40)
+        parser.add_argument("--options", type=int, default=4)
+        parser.add_argument("--conditional", type=float, default=0.5, help="ratio of questions with conditions")
+        parser.add_argument("--conditions", type=int, default=2, help="conditions of every conditional question")
+        parser.add_argument("--respondents", type=int, default=50)
+        parser.add_argument("--previous-ratio", type=float, default=0.2)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--mode", choices=["sync", "async"], default="sync", help="drive the sync or async views")
+        parser.add_argument("--concurrency", type=int, default=1, help="respondents in flight at once in async mode")
+        parser.add_argument("--output", help="write results as json to this file")
+
+    def handle(self, *args, **options):
+        benchmark = RespondentFlowBenchmark(
+            questions=options["questions"],
+            options=options["options"],
+            conditional=options["conditional"],
+            conditions=options["conditions"],
+            respondents=options["respondents"],
+            previous_ratio=options["previous_ratio"],
+            seed=options["seed"],
+            mode=options["mode"],
+            concurrency=options["concurrency"],
+        )
+        results = run_in_test_database(benchmark)
+
+        self.stdout.write(f"{'endpoint':<16}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'queries':>10}")
+        for name, result in list(results["endpoints"].items()) + [("total", results["total"])]:
+            if not result["requests"]:
+                continue
+            self.stdout.write(
+                f"{name:<16}{result['requests']:>10}{result['throughput']:>10.1f}{result['p50_ms']:>10.2f}"
+                f"{result['p99_ms']:>10.2f}{result.get('queries_per_request', 0):>10.2f}"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"results written to {options['output']}"))
+
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.definition import SurveyDefinition
+from survey.export import AnswerExport
+from survey.models import Survey
+
+
+class Command(BaseCommand):
+    help = "Export answers of a survey as csv or json lines, one row per respondent"
+
+    def add_arguments(self, parser):
+        parser.add_argument("survey_id", type=int)
+        parser.add_argument("--format", dest="output_format", choices=sorted(AnswerExport.formats), default="csv")
+        parser.add_argument("--output", help="write to this file instead of stdout")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not Survey.objects.filter(id=options["survey_id"]).exists():
+            raise CommandError(f"survey {options['survey_id']} does not exist")
+        export = AnswerExport(SurveyDefinition.load(options["survey_id"]), chunk_size=options["chunk_size"])
+        lines = export.lines(options["output_format"])
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                output.writelines(lines)
+            self.stdout.write(self.style.SUCCESS(f"answers written to {options['output']}"))
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
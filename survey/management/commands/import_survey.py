@@ -0,0 +1,39 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.importer import SurveyImport
+from survey.serializers.survey import SurveyImportSerializer
+
+
+class Command(BaseCommand):
+    help = "Create a draft survey from a json definition document, in the format of the definition endpoint"
+    stealth_options = ("stdin",)
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="definition document, - to read stdin")
+
+    def handle(self, *args, **options):
+        try:
+            if options["path"] == "-":
+                document = json.load(options.get("stdin", sys.stdin))
+            else:
+                with open(options["path"], encoding="utf-8") as definition_file:
+                    document = json.load(definition_file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"can not read {options['path']}: {error}")
+
+        serializer = SurveyImportSerializer(data=document)
+        if not serializer.is_valid():
+            raise CommandError(json.dumps(serializer.errors))
+        survey_import = SurveyImport.from_document(serializer.validated_data)
+        violations = survey_import.violations()
+        if violations:
+            raise CommandError("\n".join(
+                f"{violation.message} (question={violation.question}, condition={violation.condition}, "
+                f"operator={violation.operator})"
+                for violation in violations
+            ))
+        survey = survey_import.save()
+        self.stdout.write(self.style.SUCCESS(f"survey {survey.id} imported"))
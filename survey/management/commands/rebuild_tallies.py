@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from survey.models import Survey
+from survey.tally import rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = "Recompute answer tallies of surveys from their answers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("survey_ids", nargs="*", type=int, help="surveys to rebuild, all surveys by default")
+
+    def handle(self, *args, **options):
+        survey_ids = options["survey_ids"] or Survey.objects.order_by("id").values_list("id", flat=True)
+        for survey_id in survey_ids:
+            count = rebuild_tallies(survey_id)
+            self.stdout.write(f"survey {survey_id}: {count} tallies")
+        self.stdout.write(self.style.SUCCESS("tallies rebuilt"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
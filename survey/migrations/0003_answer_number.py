@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0002_survey_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='number',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+    ]
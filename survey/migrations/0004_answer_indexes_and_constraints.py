@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    # keep the last answer of a question, it is the one answers were routed with, and the first finish of a survey
+    Answer = apps.get_model('survey', 'Answer')
+    UserAnsweredToSurvey = apps.get_model('survey', 'UserAnsweredToSurvey')
+    for model, fields, keep in [(Answer, ['user', 'question'], Max), (UserAnsweredToSurvey, ['user', 'survey'], Min)]:
+        duplicates = model.objects.values(*fields).annotate(count=Count('id'), keep_id=keep('id')).filter(count__gt=1)
+        for duplicate in duplicates.iterator():
+            model.objects.filter(**{field: duplicate[field] for field in fields}).exclude(
+                id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0003_answer_number'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='condition',
+            index=models.Index(fields=['survey', 'target_question'], name='condition_survey_target'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['survey', 'priority'], name='question_survey_priority'),
+        ),
+        migrations.AddConstraint(
+            model_name='answer',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='unique_user_question_answer'),
+        ),
+        migrations.AddConstraint(
+            model_name='useransweredtosurvey',
+            constraint=models.UniqueConstraint(fields=('user', 'survey'), name='unique_user_answered_survey'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_progress(apps, schema_editor):
+    # progress of respondents that answered before, their current question is found again on resume
+    Answer = apps.get_model('survey', 'Answer')
+    UserAnsweredToSurvey = apps.get_model('survey', 'UserAnsweredToSurvey')
+    SurveyProgress = apps.get_model('survey', 'SurveyProgress')
+    progress = {}
+    for user_id, survey_id, question_id in Answer.objects.values_list(
+            'user_id', 'question__survey_id', 'question_id').order_by('user_id', 'question__survey_id').iterator():
+        progress.setdefault((user_id, survey_id), SurveyProgress(
+            user_id=user_id, survey_id=survey_id)).answered_question_ids.append(question_id)
+    for user_id, survey_id in UserAnsweredToSurvey.objects.values_list('user_id', 'survey_id').iterator():
+        progress.setdefault((user_id, survey_id), SurveyProgress(user_id=user_id, survey_id=survey_id)).completed = True
+    SurveyProgress.objects.bulk_create(progress.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0004_answer_indexes_and_constraints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answered_question_ids', models.JSONField(default=list)),
+                ('completed', models.BooleanField(default=False)),
+                ('current_question', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='survey.question')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='survey.survey')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'survey'), name='unique_user_survey_progress')],
+            },
+        ),
+        migrations.RunPython(create_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:09
+
+import math
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# keys of survey.tally when this migration was written, with the default SURVEY_TALLY_BUCKET_SIZE,
+# tallies of another bucket size are recomputed with rebuild_tallies like after any change of it
+BUCKET_SIZE = 10
+MAX_BUCKET_INDEX = 10 ** 6
+
+
+def tally_keys(answer):
+    keys = ['answers']
+    if answer.option_id is not None:
+        keys.append(f'option:{answer.option_id}')
+    elif answer.number is not None:
+        index = min(max(math.floor(answer.number / BUCKET_SIZE), -MAX_BUCKET_INDEX), MAX_BUCKET_INDEX)
+        keys.append(f'bucket:{index * BUCKET_SIZE}')
+    return keys
+
+
+def create_tallies(apps, schema_editor):
+    # tallies of answers saved before, edits of those answers decrement them
+    Answer = apps.get_model('survey', 'Answer')
+    AnswerTally = apps.get_model('survey', 'AnswerTally')
+    counts = Counter()
+    for answer in Answer.objects.only('question_id', 'option_id', 'number').iterator():
+        for key in tally_keys(answer):
+            counts[(answer.question_id, key)] += 1
+    AnswerTally.objects.bulk_create(
+        [AnswerTally(question_id=question_id, key=key, count=count) for (question_id, key), count in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0005_survey_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='survey.question')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('question', 'key'), name='unique_question_tally_key')],
+            },
+        ),
+        migrations.RunPython(create_tallies, migrations.RunPython.noop),
+    ]
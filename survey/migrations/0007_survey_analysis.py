@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0006_answer_tally'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='analysis',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
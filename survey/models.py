@@ -10,6 +10,17 @@ class Survey(models.Model):
 
     title = models.CharField(max_length=200)
     status = models.CharField(max_length=20, choices=StatusType.choices, default=StatusType.draft)
+    # changed on any write to the survey or its questions, options, conditions and operators
+    version = models.PositiveIntegerField(default=0)
+    # reachable questions, path lengths and unlocked questions, computed on publish (see survey.analysis)
+    analysis = models.JSONField(null=True, blank=True)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # version is only changed with F() updates, so a stale instance must not overwrite it
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != "version"]
+        super().save(*args, **kwargs)
 
 
 class Question(models.Model):
@@ -24,6 +35,9 @@ class Question(models.Model):
     required = models.BooleanField(default=False)
     priority = models.IntegerField()
 
+    class Meta:
+        indexes = [models.Index(fields=["survey", "priority"], name="question_survey_priority")]
+
 
 class Option(models.Model):
     title = models.CharField(max_length=200)
@@ -63,6 +77,9 @@ class Condition(models.Model):
     condition = models.CharField(max_length=20, choices=ConditionType.choices)
     value = models.CharField(max_length=200)
 
+    class Meta:
+        indexes = [models.Index(fields=["survey", "target_question"], name="condition_survey_target")]
+
 
 class Operatior(models.Model):  # operatior between conditions
     class OperatorType(models.TextChoices):
@@ -82,9 +99,42 @@ class UserAnsweredToSurvey(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     survey = models.ForeignKey("Survey", on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "survey"], name="unique_user_answered_survey")]
+
+
+class SurveyProgress(models.Model):
+    # where a user is in a survey, written in the transaction of every answer write
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    survey = models.ForeignKey("Survey", on_delete=models.CASCADE)
+    # the question next answer returned, null before the first answer and after finish
+    current_question = models.ForeignKey("Question", null=True, blank=True, on_delete=models.SET_NULL)
+    answered_question_ids = models.JSONField(default=list)
+    completed = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "survey"], name="unique_user_survey_progress")]
+
 
 class Answer(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     question = models.ForeignKey("Question", on_delete=models.CASCADE)
     text = models.TextField(null=True, blank=True)
+    # value of numerical answers, filled with text on write so conditions and range queries compare numbers
+    number = models.FloatField(null=True, blank=True, db_index=True)
     option = models.ForeignKey("Option", null=True, blank=True, on_delete=models.CASCADE)
+
+    class Meta:
+        # one answer of a user to a question, also the index of answer lookups by user
+        constraints = [models.UniqueConstraint(fields=["user", "question"], name="unique_user_question_answer")]
+
+
+class AnswerTally(models.Model):
+    # count of answers of a question per option or numerical bucket, kept up to date on answer writes
+    question = models.ForeignKey("Question", on_delete=models.CASCADE)
+    # "answers" for all answers, "option:<option id>" and "bucket:<lower bound>" (see survey.tally)
+    key = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["question", "key"], name="unique_question_tally_key")]
@@ -0,0 +1,79 @@
+import itertools
+from typing import NamedTuple
+
+from survey.analysis import TEXT_CHECKS, TextAnswerClass
+from survey.models import Question
+from survey.routing import NUMBER_CONDITIONS
+
+
+# numerical questions with more answer ranges and text questions with more checks get no hints
+MAX_NUMBER_HINTS = 21
+MAX_TEXT_CHECKS = 4
+
+
+class PrefetchHint(NamedTuple):
+    """
+    Follow-up question of a question for a set of its answers: one option, numbers in the
+    open range (lower, upper) or equal to lower when lower and upper are equal, or any
+    answer when option, lower and upper are all None.
+    """
+    question: object  # PlanQuestion, None when the survey is finished
+    answer: object = None  # answer of the user to the follow-up question
+    option: int = None
+    lower: float = None
+    upper: float = None
+
+
+def follow_up_question(plan, question, value, get_answer):
+    # next question after answering question with the typed value, answers it would invalidate are left out
+    def edited(question_id):
+        return value if question_id == question.id else get_answer(question_id)
+
+    invalidated = set(plan.invalidated_questions(question.id, get_answer, edited))
+
+    def get_edited_answer(question_id):
+        return None if question_id in invalidated else edited(question_id)
+
+    return plan.next_question(question.id, get_edited_answer)
+
+
+def prefetch_hints(plan, question, answers):
+    """
+    Hints of the question a respondent will see after answering a question, computed from
+    the conditions on it without any query: one hint per option, one per range of numbers
+    the conditions tell apart, and for text questions one hint for any answer when every
+    result of the text checks leads to the same question, else no hint.
+    """
+    conditions = plan.source_conditions(question.id)
+
+    def hint(value, **kwargs):
+        follow_up = follow_up_question(plan, question, value, answers.typed_value)
+        return PrefetchHint(follow_up, answer=follow_up and answers.value(follow_up.id), **kwargs)
+
+    if question.question_type == Question.QuestionType.option:
+        return [hint(option.id, option=option.id) for option in question.options]
+
+    elif question.question_type == Question.QuestionType.numerical:
+        thresholds = sorted({c.number for c in conditions if c.condition in NUMBER_CONDITIONS and c.number is not None})
+        if not thresholds:
+            return [hint(0.0)]
+        if len(thresholds) * 2 + 1 > MAX_NUMBER_HINTS:
+            return []
+        hints = [hint(thresholds[0] - 1, upper=thresholds[0])]
+        for low, high in zip(thresholds, thresholds[1:]):
+            hints.append(hint(low, lower=low, upper=low))
+            hints.append(hint((low + high) / 2, lower=low, upper=high))
+        hints.append(hint(thresholds[-1], lower=thresholds[-1], upper=thresholds[-1]))
+        hints.append(hint(thresholds[-1] + 1, lower=thresholds[-1]))
+        return hints
+
+    checks = sorted({(TEXT_CHECKS[c.condition], c.value) for c in conditions if c.condition in TEXT_CHECKS})
+    if len(checks) > MAX_TEXT_CHECKS:
+        return []
+    hints = [
+        hint(TextAnswerClass(dict(zip(checks, results))))
+        for results in itertools.product([False, True], repeat=len(checks))
+    ]
+    if len({h.question and h.question.id for h in hints}) > 1:
+        return []
+    return hints[:1]
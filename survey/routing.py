@@ -0,0 +1,434 @@
+import heapq
+import math
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple
+
+from django.contrib.auth.models import User
+from django.db.models import Q, Exists, OuterRef, F, Value
+from django.db.models.functions import Left, Right, StrIndex
+from django.db.models.lookups import Exact, GreaterThan
+
+from survey.models import Condition, Operatior, Answer
+
+
+class PlanOption(NamedTuple):
+    id: int
+    title: str
+    priority: int
+
+
+class PlanQuestion(NamedTuple):
+    id: int
+    title: str
+    question_type: str
+    required: bool
+    priority: int
+    options: tuple
+
+    def get_option(self, option_id):
+        for option in self.options:
+            if str(option.id) == str(option_id):
+                return option
+        return None
+
+
+NUMBER_CONDITIONS = (
+    Condition.ConditionType.number_lt,
+    Condition.ConditionType.number_lte,
+    Condition.ConditionType.number_gt,
+    Condition.ConditionType.number_gte,
+)
+
+
+TEXT_CONDITIONS = (
+    Condition.ConditionType.text_contain,
+    Condition.ConditionType.text_not_contain,
+    Condition.ConditionType.text_start,
+    Condition.ConditionType.text_not_start,
+    Condition.ConditionType.text_end,
+    Condition.ConditionType.text_not_end,
+)
+
+NEGATED_TEXT_CONDITIONS = (
+    Condition.ConditionType.text_not_contain,
+    Condition.ConditionType.text_not_start,
+    Condition.ConditionType.text_not_end,
+)
+
+
+def text_match(condition, value):
+    """
+    Case-sensitive lookup of answer text for a text condition and its negation, like the
+    str checks of PlanCondition.check. The contains, startswith and endswith lookups ignore
+    case on sqlite, instr and comparing the start or end of the text do not.
+    """
+    text = F("text")
+    if condition in (Condition.ConditionType.text_contain, Condition.ConditionType.text_not_contain):
+        return GreaterThan(StrIndex(text, Value(value)), 0)
+    elif condition in (Condition.ConditionType.text_start, Condition.ConditionType.text_not_start):
+        return Exact(Left(text, len(value)), value)
+    return Exact(Right(text, len(value)), value)
+
+
+def parse_number(value):
+    # float of a numerical answer or condition value, None if it is not a finite number
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+class PlanCondition(NamedTuple):
+    id: int
+    source_question_id: int
+    condition: str
+    value: str
+    number: float = None  # value of number conditions, parsed once on compile
+
+    def evaluate(self, get_answer):
+        # get_answer(question_id) returns the user answer value or None, a missing answer never pass
+        answer = get_answer(self.source_question_id)
+        if answer is None:
+            return False
+        return self.check(answer)
+
+    def check(self, answer):
+        # answer is the option id for option questions, the number for numerical and the text for others
+        condition = self.condition
+        value = self.value
+
+        if condition in NUMBER_CONDITIONS:
+            if isinstance(answer, str):  # answer saved before typed values, see backfill_answer_values
+                answer = parse_number(answer)
+            if answer is None or self.number is None:
+                return False
+
+        if condition == Condition.ConditionType.option_equal:
+            return value == str(answer)
+        elif condition == Condition.ConditionType.option_not_equal:
+            return value != str(answer)
+        elif condition == Condition.ConditionType.number_lt:
+            return self.number > answer
+        elif condition == Condition.ConditionType.number_lte:
+            return self.number >= answer
+        elif condition == Condition.ConditionType.number_gt:
+            return self.number < answer
+        elif condition == Condition.ConditionType.number_gte:
+            return self.number <= answer
+        elif condition == Condition.ConditionType.text_contain:
+            return value in answer
+        elif condition == Condition.ConditionType.text_not_contain:
+            return value not in answer
+        elif condition == Condition.ConditionType.text_start:
+            return answer.startswith(value)
+        elif condition == Condition.ConditionType.text_not_start:
+            return not answer.startswith(value)
+        elif condition == Condition.ConditionType.text_end:
+            return answer.endswith(value)
+        elif condition == Condition.ConditionType.text_not_end:
+            return not answer.endswith(value)
+        return False
+
+    def as_q(self):
+        # Q over User, true for users whose answer to source question satisfy this condition
+        condition = self.condition
+        value = self.value
+        answers = Answer.objects.filter(user=OuterRef("pk"), question_id=self.source_question_id)
+
+        if condition in [Condition.ConditionType.option_equal, Condition.ConditionType.option_not_equal]:
+            if not value.isdecimal() or value != str(int(value)):
+                # check compares strings, an option id never equals a non numeric value or one like "01"
+                return Q(Exists(answers)) if condition == Condition.ConditionType.option_not_equal else Q(pk__in=[])
+            if condition == Condition.ConditionType.option_equal:
+                answers = answers.filter(option_id=value)
+            else:
+                answers = answers.exclude(option_id=value)
+        elif condition in NUMBER_CONDITIONS:
+            if self.number is None:
+                return Q(pk__in=[])
+            lookup = condition.replace("number_", "number__")
+            answers = answers.filter(**{lookup: self.number})
+        elif condition in TEXT_CONDITIONS:
+            negated = condition in NEGATED_TEXT_CONDITIONS
+            if not value:
+                # every text contains, starts and ends with an empty value
+                return Q(pk__in=[]) if negated else Q(Exists(answers))
+            if negated:
+                answers = answers.exclude(text_match(condition, value))
+            else:
+                answers = answers.filter(text_match(condition, value))
+        else:
+            return Q(pk__in=[])
+        return Q(Exists(answers))
+
+
+class PlanOperator(NamedTuple):
+    first_condition_id: int
+    second_condition_id: int
+    operator: str
+    priority: int
+
+
+class OperatorNode(NamedTuple):
+    operator: str
+    first: object  # PlanCondition or OperatorNode
+    second: object
+
+    def evaluate(self, get_answer):
+        # second side is evaluated only when it can change the result
+        if self.operator == Operatior.OperatorType.and_operator:
+            return self.first.evaluate(get_answer) and self.second.evaluate(get_answer)
+        elif self.operator == Operatior.OperatorType.or_operator:
+            return self.first.evaluate(get_answer) or self.second.evaluate(get_answer)
+        elif self.operator == Operatior.OperatorType.xor_operator:
+            return self.first.evaluate(get_answer) != self.second.evaluate(get_answer)
+        return False
+
+    def as_q(self):
+        first = self.first.as_q()
+        second = self.second.as_q()
+        if self.operator == Operatior.OperatorType.and_operator:
+            return first & second
+        elif self.operator == Operatior.OperatorType.or_operator:
+            return first | second
+        elif self.operator == Operatior.OperatorType.xor_operator:
+            return (first & ~second) | (~first & second)
+        return Q(pk__in=[])
+
+
+class ConditionExpression(NamedTuple):
+    # all conditions that decide to show or skip one target question, combined into one tree
+    conditions: tuple
+    root: object  # PlanCondition, OperatorNode or None for a question without condition
+
+    @classmethod
+    def build(cls, conditions, operators):
+        """
+        Operators are applied in priority order, each one joins the subtrees that hold its
+        first and second condition, so a lower priority binds tighter. An operator between two
+        conditions that are already in one subtree is skipped, and subtrees that no operator
+        joins are combined with and.
+        """
+        subtrees = {condition.id: condition for condition in conditions}
+        for operator in sorted(operators, key=lambda o: o.priority):
+            first = subtrees.get(operator.first_condition_id)
+            second = subtrees.get(operator.second_condition_id)
+            if first is None or second is None or first is second:
+                continue
+            node = OperatorNode(operator=operator.operator, first=first, second=second)
+            for condition_id, subtree in subtrees.items():
+                if subtree is first or subtree is second:
+                    subtrees[condition_id] = node
+
+        root = None
+        for subtree in {id(subtree): subtree for subtree in subtrees.values()}.values():
+            root = subtree if root is None else OperatorNode(
+                operator=Operatior.OperatorType.and_operator, first=root, second=subtree)
+        return cls(conditions=tuple(conditions), root=root)
+
+    def evaluate(self, get_answer):
+        # get_answer(question_id) returns the user answer value or None
+        if self.root is None:
+            return True
+        return self.root.evaluate(get_answer)
+
+    def as_q(self):
+        # Q over User with the same result as evaluate() for every user
+        if self.root is None:
+            return Q()
+        return self.root.as_q()
+
+
+EMPTY_EXPRESSION = ConditionExpression(conditions=(), root=None)
+
+
+class SurveyPlan:
+    """
+    Immutable routing plan of a published survey: questions ordered by priority with their
+    options, one condition expression for every target question, and the dependency graph
+    from every source question to the targets of its conditions.
+    """
+
+    __slots__ = (
+        "survey_id", "questions", "_positions", "_expressions", "_condition_targets",
+        "_conditional_positions", "_next_unconditional", "_previous_unconditional",
+    )
+
+    def __init__(self, survey_id, questions, expressions):
+        self.survey_id = survey_id
+        self.questions = tuple(sorted(questions, key=lambda q: q.priority))
+        self._positions = {question.id: position for position, question in enumerate(self.questions)}
+        self._expressions = dict(expressions)
+
+        # dependency graph: question id to positions of questions with a condition on its answer
+        condition_targets = {}
+        for target_question_id, expression in self._expressions.items():
+            if target_question_id not in self._positions:
+                continue
+            for condition in expression.conditions:
+                condition_targets.setdefault(condition.source_question_id, set()).add(
+                    self._positions[target_question_id])
+        self._condition_targets = {
+            source_question_id: tuple(sorted(positions)) for source_question_id, positions in condition_targets.items()}
+
+        # jump table: questions without condition are always visible, so routing only has to evaluate
+        # conditional questions between a question and its nearest unconditional neighbours
+        count = len(self.questions)
+        conditional = [question.id in self._expressions for question in self.questions]
+        self._conditional_positions = [position for position in range(count) if conditional[position]]
+        self._next_unconditional = [count] * count
+        self._previous_unconditional = [-1] * count
+        following = count
+        for position in range(count - 1, -1, -1):
+            self._next_unconditional[position] = following
+            if not conditional[position]:
+                following = position
+        preceding = -1
+        for position in range(count):
+            self._previous_unconditional[position] = preceding
+            if not conditional[position]:
+                preceding = position
+
+    def get_question(self, question_id):
+        position = self._positions.get(question_id)
+        if position is None:
+            return None
+        return self.questions[position]
+
+    def get_expression(self, question_id):
+        return self._expressions.get(question_id, EMPTY_EXPRESSION)
+
+    def is_visible(self, question_id, get_answer):
+        return self.get_expression(question_id).evaluate(get_answer)
+
+    def first_question(self):
+        return self.questions[0] if self.questions else None
+
+    def _conditional_between(self, start, stop):
+        # positions of conditional questions in the open range (start, stop)
+        return self._conditional_positions[
+            bisect_right(self._conditional_positions, start):bisect_left(self._conditional_positions, stop)]
+
+    def next_question(self, question_id, get_answer):
+        position = self._positions[question_id]
+        stop = self._next_unconditional[position]
+        for candidate in self._conditional_between(position, stop):
+            if self.is_visible(self.questions[candidate].id, get_answer):
+                return self.questions[candidate]
+        return self.questions[stop] if stop < len(self.questions) else None
+
+    def previous_question(self, question_id, get_answer):
+        position = self._positions[question_id]
+        start = self._previous_unconditional[position]
+        for candidate in reversed(self._conditional_between(start, position)):
+            if self.is_visible(self.questions[candidate].id, get_answer):
+                return self.questions[candidate]
+        return self.questions[start] if start >= 0 else None
+
+    def segment(self, question_id):
+        # users that answered this survey and question is visible for them, in one query
+        respondents = User.objects.filter(Exists(Answer.objects.filter(
+            user=OuterRef("pk"), question__survey_id=self.survey_id)))
+        return respondents.filter(self.get_expression(question_id).as_q())
+
+    def dependent_questions(self, question_id):
+        # questions whose visibility depends on the answer of a question, directly or through other questions
+        positions = set()
+        pending = list(self._condition_targets.get(question_id, ()))
+        while pending:
+            position = pending.pop()
+            if position not in positions:
+                positions.add(position)
+                pending.extend(self._condition_targets.get(self.questions[position].id, ()))
+        return [self.questions[position] for position in sorted(positions)]
+
+    def source_conditions(self, question_id):
+        # conditions on the answer of a question, of every question that depends on it directly
+        return [
+            condition
+            for position in self._condition_targets.get(question_id, ())
+            for condition in self.get_expression(self.questions[position].id).conditions
+            if condition.source_question_id == question_id
+        ]
+
+    def invalidated_questions(self, question_id, before, after):
+        """
+        Ids of answered questions whose visibility changes when the answer of a question is
+        edited. before and after return answer values, None for a question without answer,
+        before and after the edit. Dependent questions are checked in priority order, and an
+        invalidated answer is removed from after answers, so only questions depending on the
+        edited answer or on an invalidated one are evaluated.
+        """
+        invalidated = set()
+
+        def get_after(source_question_id):
+            return None if source_question_id in invalidated else after(source_question_id)
+
+        pending = list(self._condition_targets.get(question_id, ()))
+        heapq.heapify(pending)
+        checked = set()
+        while pending:
+            position = heapq.heappop(pending)
+            if position in checked:
+                continue
+            checked.add(position)
+            target_question_id = self.questions[position].id
+            if before(target_question_id) is None:
+                continue  # no answer to invalidate, and its questions see no change of it
+            if self.is_visible(target_question_id, before) != self.is_visible(target_question_id, get_after):
+                invalidated.add(target_question_id)
+                for target_position in self._condition_targets.get(target_question_id, ()):
+                    heapq.heappush(pending, target_position)
+        return [question.id for question in self.questions if question.id in invalidated]
+
+    def required_questions_before(self, question_id):
+        return [q for q in self.questions[:self._positions[question_id]] if q.required]
+
+
+def compile_survey(definition):
+    # build the plan of a survey from its SurveyDefinition, without any query
+    options = {}
+    for option in definition.options:
+        options.setdefault(option.question_id, []).append(
+            PlanOption(id=option.id, title=option.title, priority=option.priority))
+
+    questions = [
+        PlanQuestion(
+            id=question.id,
+            title=question.title,
+            question_type=question.question_type,
+            required=question.required,
+            priority=question.priority,
+            options=tuple(options.get(question.id, ())),
+        )
+        for question in definition.questions
+    ]
+
+    conditions = {}
+    condition_targets = {}
+    for condition in definition.conditions:
+        conditions.setdefault(condition.target_question_id, []).append(PlanCondition(
+            id=condition.id,
+            source_question_id=condition.source_question_id,
+            condition=condition.condition,
+            value=condition.value,
+            number=parse_number(condition.value) if condition.condition in NUMBER_CONDITIONS else None,
+        ))
+        condition_targets[condition.id] = condition.target_question_id
+
+    operators = {}
+    for operator in definition.operators:
+        target_question_id = condition_targets.get(operator.first_condition_id)
+        operators.setdefault(target_question_id, []).append(PlanOperator(
+            first_condition_id=operator.first_condition_id,
+            second_condition_id=operator.second_condition_id,
+            operator=operator.operator,
+            priority=operator.priority,
+        ))
+
+    expressions = {
+        target_question_id: ConditionExpression.build(target_conditions, operators.get(target_question_id, ()))
+        for target_question_id, target_conditions in conditions.items()
+    }
+    return SurveyPlan(definition.survey_id, questions, expressions)
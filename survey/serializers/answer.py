@@ -6,9 +6,34 @@ from survey.serializers.question import QuestionSerializer
 
 class NextAnswerRequestSerializer(serializers.Serializer):
     answer = serializers.CharField(required=False)
+    # return prefetch hints of the next question
+    prefetch = serializers.BooleanField(required=False, default=False)
+
+
+class PrefetchHintSerializer(serializers.Serializer):
+    option = serializers.IntegerField(allow_null=True)
+    lower = serializers.FloatField(allow_null=True)
+    upper = serializers.FloatField(allow_null=True)
+    question = QuestionSerializer(allow_null=True)
+    answer = serializers.CharField(allow_null=True)
 
 
 class NextPreviousAnswerResponseSerializer(serializers.Serializer):
     question = QuestionSerializer()
     answer = serializers.CharField()
     finished = serializers.BooleanField(required=False)
+    prefetch = PrefetchHintSerializer(many=True, required=False)
+
+
+class BatchAnswerItemSerializer(serializers.Serializer):
+    question = serializers.IntegerField()
+    answer = serializers.CharField(required=False)
+
+
+class BatchAnswerRequestSerializer(serializers.Serializer):
+    answers = BatchAnswerItemSerializer(many=True, allow_empty=False)
+
+
+class BatchAnswerErrorSerializer(serializers.Serializer):
+    question = serializers.IntegerField()
+    detail = serializers.CharField()
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+from survey.serializers.question import QuestionSerializer
+
+
+class BundleSurveySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    version = serializers.IntegerField()
+
+
+class SurveyBundleSerializer(serializers.Serializer):
+    format = serializers.IntegerField()
+    survey = BundleSurveySerializer()
+    questions = QuestionSerializer(many=True)
+    # question id to its routing program, see survey.bundle.routing_node
+    routing = serializers.DictField(child=serializers.DictField())
@@ -14,7 +14,10 @@ class QuestionSerializer(serializers.ModelSerializer):
 
     def get_options(self, value) -> list:
         if value.question_type == Question.QuestionType.option:
-            option = Option.objects.filter(question=value.id)
+            if isinstance(value, Question):
+                option = value.option_set.all()  # use prefetched options when queryset prefetch them
+            else:  # question of a compiled survey plan
+                option = value.options
             op = OptionSerializer(option, many=True)
             return op.data
         return None
@@ -0,0 +1,23 @@
+from rest_framework import serializers
+
+
+class OptionResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class BucketResultSerializer(serializers.Serializer):
+    # null for the open first and last buckets, see survey.tally.MAX_BUCKET_INDEX
+    lower = serializers.FloatField(allow_null=True)
+    upper = serializers.FloatField(allow_null=True)
+    count = serializers.IntegerField()
+
+
+class QuestionResultSerializer(serializers.Serializer):
+    question = serializers.IntegerField()
+    title = serializers.CharField()
+    question_type = serializers.CharField()
+    answers = serializers.IntegerField()
+    options = OptionResultSerializer(many=True)
+    buckets = BucketResultSerializer(many=True)
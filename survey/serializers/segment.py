@@ -0,0 +1,8 @@
+from rest_framework import serializers
+from django.contrib.auth.models import User
+
+
+class SegmentUserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username']
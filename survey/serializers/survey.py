@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from survey.models import Survey
+from survey.models import Survey, Question, Condition, Operatior
+from survey.serializers.question import QuestionSerializer
+from survey.serializers.conditions import ConditionSerializer, OperatiorSerializer
 from survey.translation import Translation
 
 
@@ -9,7 +11,7 @@ class SurveySerializer(serializers.ModelSerializer):
     class Meta:
         model = Survey
         fields = '__all__'
-        read_only_fields  = ['status']
+        read_only_fields  = ['status', 'version', 'analysis']
 
     def validate(self, attrs):
         if self.instance:
@@ -17,5 +19,72 @@ class SurveySerializer(serializers.ModelSerializer):
                 raise ValidationError(Translation.survey_status_is_publish)
         return super().validate(attrs)
 
+class SurveyCloneSerializer(serializers.Serializer):
+    # title of the copy, title of the survey by default
+    title = serializers.CharField(max_length=200, required=False)
+
+
 class SurveyPublishSerializer(serializers.Serializer):
     message = serializers.CharField()
+
+
+class SurveyViolationSerializer(serializers.Serializer):
+    message = serializers.CharField()
+    question = serializers.IntegerField(allow_null=True)
+    condition = serializers.IntegerField(allow_null=True)
+    operator = serializers.IntegerField(allow_null=True)
+
+
+class SurveyValidationSerializer(serializers.Serializer):
+    valid = serializers.BooleanField()
+    violations = SurveyViolationSerializer(many=True)
+
+
+class SurveyDefinitionSerializer(serializers.Serializer):
+    survey = SurveySerializer()
+    questions = QuestionSerializer(many=True)
+    conditions = ConditionSerializer(many=True)
+    operators = OperatiorSerializer(many=True)
+
+
+class ImportOptionSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField(max_length=200)
+    priority = serializers.IntegerField(allow_null=True, required=False, default=None)
+
+
+class ImportQuestionSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField(max_length=200)
+    question_type = serializers.ChoiceField(choices=Question.QuestionType.choices)
+    required = serializers.BooleanField(default=False)
+    priority = serializers.IntegerField()
+    options = ImportOptionSerializer(many=True, allow_null=True, required=False, default=None)
+
+
+class ImportConditionSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    source_question = serializers.IntegerField()
+    target_question = serializers.IntegerField()
+    condition = serializers.ChoiceField(choices=Condition.ConditionType.choices)
+    value = serializers.CharField(max_length=200)
+
+
+class ImportOperatiorSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    first_condition = serializers.IntegerField()
+    second_condition = serializers.IntegerField()
+    operator = serializers.ChoiceField(choices=Operatior.OperatorType.choices)
+    priority = serializers.IntegerField()
+
+
+class ImportSurveyTitleSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=200)
+
+
+class SurveyImportSerializer(serializers.Serializer):
+    # a survey definition document, in the format of the definition endpoint, checked without queries
+    survey = ImportSurveyTitleSerializer()
+    questions = ImportQuestionSerializer(many=True)
+    conditions = ImportConditionSerializer(many=True, required=False, default=list)
+    operators = ImportOperatiorSerializer(many=True, required=False, default=list)
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from survey.models import Survey, Question, Option, Condition, Operatior
+from survey.cache import survey_cache, touch_survey, forget_survey_plan, current_touch_batch
+
+
+def definition_touched(survey_id):
+    # bump the survey version now, or once at the end of the batch_touches block
+    batch = current_touch_batch()
+    if batch is None:
+        touch_survey(survey_id)
+    else:
+        batch.survey_ids.add(survey_id)
+
+
+@receiver(post_save, sender=Survey)
+def survey_saved(sender, instance, created, raw=False, **kwargs):
+    # a new or changed survey must never be routed with an older compiled plan
+    if not raw:
+        touch_survey(instance.id, created=created)
+
+
+@receiver(post_delete, sender=Survey)
+def survey_deleted(sender, instance, **kwargs):
+    # rows deleted with the survey do not bump it, they are deleted before it
+    batch = current_touch_batch()
+    if batch is not None:
+        batch.survey_ids.discard(instance.id)
+    forget_survey_plan(instance.id)
+    survey_cache.invalidate(instance.id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Condition)
+@receiver(post_delete, sender=Condition)
+@receiver(post_save, sender=Operatior)
+@receiver(post_delete, sender=Operatior)
+def definition_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        definition_touched(instance.survey_id)
+
+
+@receiver(pre_delete, sender=Question)
+def question_deleting(sender, instance, **kwargs):
+    # pre_delete of every collected row is sent before post_delete of its options
+    batch = current_touch_batch()
+    if batch is not None:
+        batch.question_surveys[instance.id] = instance.survey_id
+
+
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+def option_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        batch = current_touch_batch()
+        survey_id = batch.question_surveys.get(instance.question_id) if batch is not None else None
+        if survey_id is None:
+            survey_id = Question.objects.filter(id=instance.question_id).values_list("survey_id", flat=True).first()
+        if survey_id is not None:
+            definition_touched(survey_id)
@@ -0,0 +1,62 @@
+from survey.models import Answer
+
+
+class AnswerSnapshot:
+    """
+    All answers of one user to one survey, loaded with a single query and keyed by question id.
+    """
+
+    def __init__(self, answers):
+        self._answers = {}
+        for answer in answers:  # a user has one answer of a question, see Answer constraints
+            self._answers[answer.question_id] = answer
+
+    @classmethod
+    def load(cls, user, survey_id):
+        return cls(Answer.objects.filter(user=user, question__survey_id=survey_id))
+
+    @classmethod
+    async def aload(cls, user, survey_id):
+        return cls([answer async for answer in Answer.objects.filter(user=user, question__survey_id=survey_id)])
+
+    def __contains__(self, question_id):
+        return question_id in self._answers
+
+    def __iter__(self):
+        return iter(self._answers.values())
+
+    def __len__(self):
+        return len(self._answers)
+
+    def get(self, question_id):
+        return self._answers.get(question_id)
+
+    def value(self, question_id):
+        # option id for option questions and answer text for others, None if not answered
+        answer = self._answers.get(question_id)
+        if answer is None:
+            return None
+        return answer.text if answer.text else answer.option_id
+
+    def typed_value(self, question_id):
+        # value conditions compare, number for numerical answers, None if not answered
+        answer = self._answers.get(question_id)
+        if answer is None:
+            return None
+        if answer.number is not None:
+            return answer.number
+        return answer.text if answer.text else answer.option_id
+
+    def typed_values(self):
+        # typed value of every answer keyed by question id, answers of survey.engine.replay
+        return {question_id: self.typed_value(question_id) for question_id in self._answers}
+
+    def question_ids(self):
+        return set(self._answers.keys())
+
+    def add(self, answer):
+        self._answers[answer.question_id] = answer
+
+    def discard(self, question_ids):
+        for question_id in question_ids:
+            self._answers.pop(question_id, None)
@@ -0,0 +1,143 @@
+import math
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, F, Count
+from django.db.models.functions import Floor
+
+from survey.models import Question, Answer, AnswerTally
+
+
+ANSWERS_KEY = "answers"
+# numerical answers further than this many buckets from zero are counted in the first or
+# last bucket, which are open, so the key of any finite answer fits AnswerTally.key
+MAX_BUCKET_INDEX = 10 ** 6
+
+
+def bucket_size():
+    # width of numerical answer buckets, tallies must be rebuilt after it changes
+    return getattr(settings, "SURVEY_TALLY_BUCKET_SIZE", 10)
+
+
+def bucket_index_key(index):
+    # key of the bucket [index * size, (index + 1) * size), the first and last buckets are open
+    index = min(max(index, -MAX_BUCKET_INDEX), MAX_BUCKET_INDEX)
+    lower = index * bucket_size()
+    if float(lower).is_integer():
+        lower = int(lower)
+    return f"bucket:{lower}"
+
+
+def bucket_key(number):
+    return bucket_index_key(math.floor(number / bucket_size()))
+
+
+def answer_tally_keys(answer):
+    keys = [ANSWERS_KEY]
+    if answer.option_id is not None:
+        keys.append(f"option:{answer.option_id}")
+    elif answer.number is not None:
+        keys.append(bucket_key(answer.number))
+    return keys
+
+
+class TallyChanges:
+    """
+    Tally changes of the answers written in one transaction. An edited answer is removed
+    with its old value before it is changed and added again after, so only keys that
+    really change are written, with F() increments and one update per distinct delta.
+    """
+
+    def __init__(self):
+        self.deltas = Counter()
+
+    def add(self, answer, delta=1):
+        for key in answer_tally_keys(answer):
+            self.deltas[(answer.question_id, key)] += delta
+
+    def remove(self, answer):
+        self.add(answer, -1)
+
+    def save(self):
+        changes = {tally: delta for tally, delta in self.deltas.items() if delta}
+        if not changes:
+            return
+        new_tallies = [AnswerTally(question_id=q, key=key) for (q, key), delta in changes.items() if delta > 0]
+        if new_tallies:
+            AnswerTally.objects.bulk_create(new_tallies, ignore_conflicts=True)
+        keys_by_delta = {}
+        for (question_id, key), delta in changes.items():
+            keys_by_delta.setdefault(delta, []).append(Q(question_id=question_id, key=key))
+        for delta, keys in keys_by_delta.items():
+            AnswerTally.objects.filter(reduce(or_, keys)).update(count=F("count") + delta)
+        self.deltas.clear()
+
+
+def question_results(definition):
+    # results of every question of a survey from its tallies, with one query
+    tallies = {}  # {question_id: {key: count}}
+    for question_id, key, count in AnswerTally.objects.filter(
+            question_id__in=[question.id for question in definition.questions]).values_list("question_id", "key", "count"):
+        tallies.setdefault(question_id, {})[key] = count
+    options = {}
+    for option in definition.options:
+        options.setdefault(option.question_id, []).append(option)
+
+    results = []
+    for question in definition.questions:
+        question_tallies = tallies.get(question.id, {})
+        result = {
+            "question": question.id,
+            "title": question.title,
+            "question_type": question.question_type,
+            "answers": question_tallies.get(ANSWERS_KEY, 0),
+            "options": [],
+            "buckets": [],
+        }
+        if question.question_type == Question.QuestionType.option:
+            result["options"] = [
+                {"id": option.id, "title": option.title, "count": question_tallies.get(f"option:{option.id}", 0)}
+                for option in options.get(question.id, [])
+            ]
+        elif question.question_type == Question.QuestionType.numerical:
+            buckets = sorted(
+                (float(key.split(":", 1)[1]), count) for key, count in question_tallies.items()
+                if key.startswith("bucket:") and count)
+            limit = MAX_BUCKET_INDEX * bucket_size()
+            result["buckets"] = [
+                {
+                    "lower": lower if lower > -limit else None,
+                    "upper": lower + bucket_size() if lower < limit else None,
+                    "count": count,
+                }
+                for lower, count in buckets
+            ]
+        results.append(result)
+    return results
+
+
+def rebuild_tallies(survey_id):
+    # recompute tallies of a survey from its answers, for recovery after writes that skipped them
+    answers = Answer.objects.filter(question__survey_id=survey_id)
+    tallies = [
+        AnswerTally(question_id=row["question_id"], key=ANSWERS_KEY, count=row["count"])
+        for row in answers.values("question_id").annotate(count=Count("id"))
+    ]
+    tallies += [
+        AnswerTally(question_id=row["question_id"], key=f"option:{row['option_id']}", count=row["count"])
+        for row in answers.filter(option__isnull=False).values("question_id", "option_id").annotate(count=Count("id"))
+    ]
+    # buckets beyond MAX_BUCKET_INDEX share the key of the open first or last bucket
+    buckets = Counter()
+    for row in answers.filter(option__isnull=True, number__isnull=False).annotate(
+            index=Floor(F("number") / bucket_size())).values("question_id", "index").annotate(count=Count("id")):
+        buckets[(row["question_id"], bucket_index_key(int(row["index"])))] += row["count"]
+    tallies += [AnswerTally(question_id=question_id, key=key, count=count) for (question_id, key), count in buckets.items()]
+
+    with transaction.atomic():
+        AnswerTally.objects.filter(question__survey_id=survey_id).delete()
+        AnswerTally.objects.bulk_create(tallies)
+    return len(tallies)
@@ -0,0 +1,193 @@
+import random
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from survey.models import Survey, Question, Option, Condition, Operatior
+from survey.analysis import analyze_survey
+from survey.cache import publish_survey_plan
+
+
+def make_survey(questions=10, options=3, conditional=0.5, conditions=2, publish=True, seed=0):
+    """
+    Create a synthetic survey for tests and benchmarks. Question types rotate between
+    option, numerical and text, every option question has `options` options, and about
+    `conditional` of the questions get `conditions` conditions on earlier questions that
+    are chained with operators, so the survey is valid for publish.
+    """
+    rng = random.Random(seed)
+    survey = Survey.objects.create(title=f"synthetic survey {questions}")
+    question_types = [Question.QuestionType.option, Question.QuestionType.numerical, Question.QuestionType.text]
+    question_objects = Question.objects.bulk_create([
+        Question(
+            title=f"q{priority}",
+            survey=survey,
+            question_type=question_types[priority % len(question_types)],
+            required=priority % 7 == 0,
+            priority=priority,
+        )
+        for priority in range(questions)
+    ])
+    option_objects = Option.objects.bulk_create([
+        Option(title=f"q{question.priority} o{priority}", question=question, priority=priority)
+        for question in question_objects if question.question_type == Question.QuestionType.option
+        for priority in range(max(options, 2))
+    ])
+    question_options = {}
+    for option in option_objects:
+        question_options.setdefault(option.question_id, []).append(option)
+
+    condition_objects = []
+    for target in question_objects[1:]:
+        if rng.random() >= conditional:
+            continue
+        for _ in range(conditions):
+            source = question_objects[rng.randrange(target.priority)]
+            if source.question_type == Question.QuestionType.option:
+                condition = rng.choice([Condition.ConditionType.option_equal, Condition.ConditionType.option_not_equal])
+                value = str(rng.choice(question_options[source.id]).id)
+            elif source.question_type == Question.QuestionType.numerical:
+                condition = rng.choice([Condition.ConditionType.number_gt, Condition.ConditionType.number_lte])
+                value = str(rng.randrange(10))
+            else:
+                condition = rng.choice([Condition.ConditionType.text_contain, Condition.ConditionType.text_not_start])
+                value = rng.choice("abc")
+            condition_objects.append(Condition(
+                survey=survey, source_question=source, target_question=target, condition=condition, value=value))
+    condition_objects = Condition.objects.bulk_create(condition_objects)
+
+    target_conditions = {}
+    for condition in condition_objects:
+        target_conditions.setdefault(condition.target_question_id, []).append(condition)
+    Operatior.objects.bulk_create([
+        Operatior(
+            first_condition=first,
+            second_condition=second,
+            operator=rng.choice(Operatior.OperatorType.values),
+            priority=priority,
+            survey=survey,
+        )
+        for target_condition in target_conditions.values()
+        for priority, (first, second) in enumerate(zip(target_condition, target_condition[1:]))
+    ])
+
+    if publish:
+        survey.status = Survey.StatusType.publish
+        survey.save()
+        plan = publish_survey_plan(survey.id)
+        # like publish, without a version change
+        survey.analysis = analyze_survey(plan)
+        Survey.objects.filter(id=survey.id).update(analysis=survey.analysis)
+    return survey
+
+
+def make_answer(question, rng):
+    # a random valid answer for a question of a survey plan
+    if question.question_type == Question.QuestionType.option:
+        return str(rng.choice(question.options).id)
+    elif question.question_type == Question.QuestionType.numerical:
+        return str(rng.randrange(20))
+    return "".join(rng.choice("abcd") for _ in range(rng.randrange(1, 6)))
+
+
+def respondent_steps(plan, rng, previous_ratio=0.0, edit_at=None):
+    """
+    Requests of a respondent that answers a published survey from the first question to
+    the end, as a generator of (name, question_id, answer) steps: first_question, then
+    next with make_answer for every question, sometimes preceded by previous. It is sent
+    the id of the question each next returns, None at the end. previous_ratio of the
+    questions after the first one get a previous request, and after edit_at answers the
+    respondent goes back once to edit an answered question.
+    """
+    yield "first_question", None, None
+    answered = []
+    question = plan.first_question()
+    while question:
+        if question.id != plan.questions[0].id and rng.random() < previous_ratio:
+            yield "previous", question.id, None
+        next_question_id = yield "next", question.id, make_answer(question, rng)
+        answered.append(question)
+        question = next_question_id and plan.get_question(next_question_id)
+        if question and len(answered) == edit_at:
+            question = answered[rng.randrange(len(answered))]
+
+
+class RespondentWalk:
+    """
+    One respondent walking a survey with respondent_steps through the answer views of a
+    test client, prefix "async/" for the async views. walk() drives a sync client and
+    awalk() an async one, override request() and arequest() to time or check requests.
+    """
+
+    def __init__(self, client, survey_id, prefix=""):
+        self.client = client
+        self.survey_id = survey_id
+        self.prefix = prefix
+
+    def url(self, name, question_id):
+        if name == "first_question":
+            return f'/api/survey/{self.survey_id}/{self.prefix}question/first_question'
+        return f'/api/survey/{self.survey_id}/{self.prefix}answer/{name}/{question_id}'
+
+    def request(self, name, question_id, answer):
+        # response of a step, or an awaitable of it with an async client
+        if name == "next":
+            return self.client.post(self.url(name, question_id), data={"answer": answer})
+        return self.client.get(self.url(name, question_id))
+
+    async def arequest(self, name, question_id, answer):
+        return await self.request(name, question_id, answer)
+
+    @staticmethod
+    def next_question_id(name, response):
+        # question the walk continues with after a next answer, None at the end of the survey
+        if name != "next":
+            return None
+        if response.status_code != 200:
+            raise AssertionError(f"answer/next returned {response.status_code}: {response.content[:200]}")
+        question = response.json()["question"]
+        return question and question["id"]
+
+    def walk(self, plan, rng, **options):
+        # answer the survey to the end, return every response
+        responses = []
+        steps = respondent_steps(plan, rng, **options)
+        try:
+            step = next(steps)
+            while True:
+                response = self.request(*step)
+                responses.append(response)
+                step = steps.send(self.next_question_id(step[0], response))
+        except StopIteration:
+            return responses
+
+    async def awalk(self, plan, rng, **options):
+        responses = []
+        steps = respondent_steps(plan, rng, **options)
+        try:
+            step = next(steps)
+            while True:
+                response = await self.arequest(*step)
+                responses.append(response)
+                step = steps.send(self.next_question_id(step[0], response))
+        except StopIteration:
+            return responses
+
+
+class QueryBudgetMixin:
+    """
+    Test case mixin to fail a test when requests to a view run more queries than the
+    query_budget declared on the view class.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, view_class, budget=None):
+        budget = view_class.query_budget if budget is None else budget
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        queries = "\n".join(query["sql"] for query in context.captured_queries)
+        self.assertLessEqual(
+            len(context), budget,
+            f"{view_class.__name__} ran {len(context)} queries, budget is {budget}:\n{queries}"
+        )
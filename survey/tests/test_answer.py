@@ -0,0 +1,502 @@
+import random
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from survey.models import Survey, Question, Option, Condition, Operatior, Answer, UserAnsweredToSurvey, SurveyProgress
+from survey.cache import get_survey_plan
+from survey.snapshot import AnswerSnapshot
+from survey.routing import (
+    SurveyPlan,
+    PlanQuestion,
+    PlanCondition,
+    PlanOperator,
+    ConditionExpression,
+    parse_number,
+)
+from survey.testing import make_survey, make_answer, RespondentWalk
+from survey.translation import Translation
+
+
+class TestAnswer(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="respondent")
+        self.client.force_authenticate(self.user)
+        self.survey = Survey.objects.create(title="s1")
+        self.question1 = Question.objects.create(
+            title="q1",
+            survey=self.survey,
+            question_type=Question.QuestionType.option,
+            priority=1
+        )
+        self.option1 = Option.objects.create(title="o1", question=self.question1, priority=1)
+        self.option2 = Option.objects.create(title="o2", question=self.question1, priority=2)
+        self.question2 = Question.objects.create(
+            title="q2",
+            survey=self.survey,
+            question_type=Question.QuestionType.text,
+            priority=2
+        )
+        self.question3 = Question.objects.create(
+            title="q3",
+            survey=self.survey,
+            question_type=Question.QuestionType.numerical,
+            required=True,
+            priority=3
+        )
+        Condition.objects.create(
+            survey=self.survey,
+            source_question=self.question1,
+            target_question=self.question2,
+            condition=Condition.ConditionType.option_equal,
+            value=str(self.option1.id)
+        )
+        response = self.client.get(f'/api/survey/{self.survey.id}/publish')
+        self.assertEqual(response.status_code, 200)
+
+    def answer(self, question, answer=None):
+        data = {"answer": answer} if answer is not None else {}
+        return self.client.post(f'/api/survey/{self.survey.id}/answer/next/{question.id}', data=data)
+
+    def test_next_answer(self):
+        # test draft survey and invalid question
+        draft_survey = Survey.objects.create(title="draft")
+        response = self.client.post(f'/api/survey/{draft_survey.id}/answer/next/{self.question1.id}')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(f'/api/survey/{self.survey.id}/answer/next/999')
+        self.assertEqual(response.status_code, 404)
+
+        # test invalid option
+        response = self.answer(self.question1, "999")
+        self.assertEqual(response.status_code, 400)
+
+        # test condition show question 2
+        response = self.answer(self.question1, str(self.option1.id))
+        self.assertEqual(response.status_code, 200)
+        response_data = response.json()
+        self.assertEqual(response_data["question"]["id"], self.question2.id)
+        self.assertFalse(response_data["finished"])
+
+        # test required question
+        response = self.answer(self.question3)
+        self.assertEqual(response.status_code, 400)
+        for invalid in ["12a", "nan", "inf"]:
+            response = self.answer(self.question3, invalid)
+            self.assertEqual(response.status_code, 400)
+        response = self.answer(self.question3, "12.5")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["finished"])
+        self.assertTrue(UserAnsweredToSurvey.objects.filter(user=self.user, survey=self.survey).exists())
+        answer = Answer.objects.get(user=self.user, question=self.question3)
+        self.assertEqual((answer.text, answer.number), ("12.5", 12.5))
+
+        # test answer a finished survey
+        response = self.answer(self.question3, "12")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content.decode(), Translation.you_answered_to_survey)
+
+    def test_next_answer_skip_condition(self):
+        response = self.answer(self.question1, str(self.option2.id))
+        self.assertEqual(response.status_code, 200)
+        response_data = response.json()
+        self.assertEqual(response_data["question"]["id"], self.question3.id)
+        self.assertEqual(response_data["question"]["options"], None)
+
+        # test answer a question that its condition failed
+        response = self.answer(self.question2, "text")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content.decode(), Translation.condition_failed)
+
+    def test_next_answer_question_added_after_publish(self):
+        question4 = Question.objects.create(
+            title="q4",
+            survey=self.survey,
+            question_type=Question.QuestionType.text,
+            priority=4
+        )
+        # the edit bumps survey version, so the cached plan is replaced
+        self.assertIsNotNone(get_survey_plan(self.survey.id).get_question(question4.id))
+        self.answer(self.question1, str(self.option1.id))
+        self.answer(self.question2, "text")
+        self.answer(self.question3, "3")
+        response = self.answer(question4, "text")
+        self.assertEqual(response.status_code, 200)
+
+    def test_previous_answer(self):
+        self.answer(self.question1, str(self.option2.id))
+        response = self.client.get(f'/api/survey/{self.survey.id}/answer/previous/{self.question3.id}')
+        self.assertEqual(response.status_code, 200)
+        response_data = response.json()
+        self.assertEqual(response_data["question"]["id"], self.question1.id)
+        self.assertEqual(response_data["answer"], str(self.option2.id))
+        self.assertEqual(len(response_data["question"]["options"]), 2)
+
+        response = self.client.get(f'/api/survey/{self.survey.id}/answer/previous/{self.question1.id}')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content.decode(), Translation.firsy_question)
+
+    def test_survey_plan(self):
+        plan = get_survey_plan(self.survey.id)
+        self.assertIs(plan, get_survey_plan(self.survey.id))
+        self.assertEqual([q.id for q in plan.questions], [self.question1.id, self.question2.id, self.question3.id])
+        self.assertEqual([o.id for o in plan.get_question(self.question1.id).options], [self.option1.id, self.option2.id])
+
+        # answer endpoints route from the plan and do not read survey definition
+        Answer.objects.create(user=self.user, question=self.question1, option=self.option1)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/survey/{self.survey.id}/answer/previous/{self.question3.id}')
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            self.assertNotIn('"survey_condition"', query["sql"])
+            self.assertNotIn('"survey_operatior"', query["sql"])
+            self.assertNotIn('"survey_option"', query["sql"])
+
+    def test_next_answer_query_count(self):
+        survey = Survey.objects.create(title="s2")
+        source = Question.objects.create(
+            title="q1", survey=survey, question_type=Question.QuestionType.numerical, priority=1)
+        for priority in range(2, 22):
+            question = Question.objects.create(
+                title=f"q{priority}", survey=survey, question_type=Question.QuestionType.text, priority=priority)
+            Condition.objects.create(
+                survey=survey,
+                source_question=source,
+                target_question=question,
+                condition=Condition.ConditionType.number_gt,
+                value="100"
+            )
+        self.client.get(f'/api/survey/{survey.id}/publish')
+        Answer.objects.create(user=self.user, question=self.question1, option=self.option1)
+
+        # load answers and progress, then in a savepoint save answer, tallies, progress and mark survey as finished
+        with self.assertNumQueries(9):
+            response = self.client.post(f'/api/survey/{survey.id}/answer/next/{source.id}', data={"answer": "5"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["finished"])
+
+    def test_edit_answer(self):
+        self.answer(self.question1, str(self.option1.id))
+        self.answer(self.question2, "text")
+        response = self.answer(self.question1, str(self.option2.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["question"]["id"], self.question3.id)
+        self.assertEqual(Answer.objects.get(user=self.user, question=self.question1).option, self.option2)
+        # question 2 is hidden by the edit, so its answer is removed
+        self.assertFalse(Answer.objects.filter(user=self.user, question=self.question2).exists())
+
+    def concurrent_request(self, write):
+        # snapshot loaded before a request of the same user writes its rows, like a double tap
+        load = AnswerSnapshot.load
+
+        def load_then_write(*args, **kwargs):
+            answers = load(*args, **kwargs)
+            if not write.done:
+                write.done = True
+                write()
+            return answers
+        write.done = False
+        return mock.patch.object(AnswerSnapshot, "load", side_effect=load_then_write)
+
+    def test_concurrent_answer(self):
+        def write():
+            Answer.objects.create(user=self.user, question=self.question1, option=self.option2)
+            SurveyProgress.objects.create(user=self.user, survey=self.survey, current_question=self.question3)
+        with self.concurrent_request(write):
+            response = self.answer(self.question1, str(self.option1.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["question"]["id"], self.question2.id)
+        self.assertEqual(Answer.objects.get(user=self.user, question=self.question1).option, self.option1)
+        self.assertEqual(
+            SurveyProgress.objects.get(user=self.user, survey=self.survey).current_question_id, self.question2.id)
+
+        # the other request finished the survey
+        self.answer(self.question2, "text")
+        with self.concurrent_request(lambda: self.answer(self.question3, "1")):
+            response = self.answer(self.question3, "2")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content.decode(), Translation.you_answered_to_survey)
+        self.assertEqual(UserAnsweredToSurvey.objects.filter(user=self.user, survey=self.survey).count(), 1)
+
+        # batch answers
+        Answer.objects.filter(user=self.user).delete()
+        SurveyProgress.objects.filter(user=self.user).delete()
+        UserAnsweredToSurvey.objects.filter(user=self.user).delete()
+        data = {"answers": [
+            {"question": self.question1.id, "answer": str(self.option2.id)},
+            {"question": self.question3.id, "answer": "3"},
+        ]}
+        with self.concurrent_request(lambda: self.answer(self.question1, str(self.option1.id))):
+            response = self.client.post(f'/api/survey/{self.survey.id}/answer/batch', data=data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["finished"])
+        self.assertEqual(Answer.objects.get(user=self.user, question=self.question1).option, self.option2)
+
+    def test_resume(self):
+        url = f'/api/survey/{self.survey.id}/answer/resume'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["question"]["id"], self.question1.id)
+
+        self.answer(self.question1, str(self.option1.id))
+        self.answer(self.question2, "text")
+        progress = SurveyProgress.objects.get(user=self.user, survey=self.survey)
+        self.assertEqual(progress.answered_question_ids, [self.question1.id, self.question2.id])
+        self.assertEqual(progress.current_question_id, self.question3.id)
+
+        # edit first answer, same value keep later answers and next is an answered question
+        self.answer(self.question1, str(self.option1.id))
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.json()["question"]["id"], self.question2.id)
+        self.assertEqual(response.json()["answer"], "text")
+
+        # edit that skip question 2 move progress to question 3
+        self.answer(self.question1, str(self.option2.id))
+        progress.refresh_from_db()
+        self.assertEqual(progress.current_question_id, self.question3.id)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.json()["question"]["id"], self.question3.id)
+        self.assertIsNone(response.json()["answer"])
+
+        # progress without current question is found again from answers
+        SurveyProgress.objects.filter(id=progress.id).update(current_question=None)
+        response = self.client.get(url)
+        self.assertEqual(response.json()["question"]["id"], self.question3.id)
+
+        self.answer(self.question3, "1")
+        response = self.client.get(url)
+        self.assertEqual(response.json(), {"question": None, "answer": None, "finished": True})
+        self.assertTrue(SurveyProgress.objects.get(id=progress.id).completed)
+
+    def test_batch_answer(self):
+        url = f'/api/survey/{self.survey.id}/answer/batch'
+        response = self.client.post(url, data={"answers": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+        # test one invalid answer reject all of them
+        data = {"answers": [
+            {"question": self.question1.id, "answer": str(self.option2.id)},
+            {"question": self.question2.id, "answer": "text"},
+        ]}
+        response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"question": self.question2.id, "detail": Translation.condition_failed})
+        self.assertFalse(Answer.objects.filter(user=self.user).exists())
+
+        data = {"answers": [
+            {"question": self.question1.id, "answer": str(self.option1.id)},
+            {"question": self.question2.id},
+            {"question": self.question3.id},
+        ]}
+        response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"question": self.question3.id, "detail": Translation.this_question_required})
+
+        data = {"answers": [
+            {"question": self.question1.id, "answer": str(self.option1.id)},
+            {"question": self.question2.id, "answer": "text"},
+        ]}
+        with self.assertNumQueries(8):
+            response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.status_code, 200)
+        response_data = response.json()
+        self.assertEqual(response_data["question"]["id"], self.question3.id)
+        self.assertFalse(response_data["finished"])
+        self.assertEqual(Answer.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            SurveyProgress.objects.get(user=self.user, survey=self.survey).current_question_id, self.question3.id)
+
+        # test edit answers and finish survey in one request
+        data = {"answers": [
+            {"question": self.question1.id, "answer": str(self.option1.id)},
+            {"question": self.question2.id, "answer": "edited"},
+            {"question": self.question3.id, "answer": "3.5"},
+        ]}
+        response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["finished"])
+        self.assertEqual(Answer.objects.get(user=self.user, question=self.question2).text, "edited")
+        self.assertEqual(Answer.objects.filter(user=self.user).count(), 3)
+        self.assertTrue(UserAnsweredToSurvey.objects.filter(user=self.user, survey=self.survey).exists())
+
+
+class TestSurveyPlan(SimpleTestCase):
+    def test_jump_table(self):
+        questions = [
+            PlanQuestion(id=i, title=f"q{i}", question_type=Question.QuestionType.text, required=False,
+                         priority=i, options=())
+            for i in range(1, 11)
+        ]
+        # question 1 is source of conditions, questions 3, 4, 7 and 10 are visible only for some answers
+        expressions = {
+            target: ConditionExpression.build([PlanCondition(
+                id=target, source_question_id=1, condition=Condition.ConditionType.text_contain, value=value)], [])
+            for target, value in [(3, "a"), (4, "b"), (7, "c"), (10, "a")]
+        }
+        plan = SurveyPlan(1, questions, expressions)
+
+        def scan(question_id, answers, step):
+            position = question_id - 1 + step
+            while 0 <= position < len(questions):
+                if plan.is_visible(questions[position].id, answers.get):
+                    return questions[position]
+                position += step
+            return None
+
+        for text in ["", "a", "b", "c", "abc"]:
+            answers = {1: text} if text else {}
+            for question in questions:
+                self.assertEqual(plan.next_question(question.id, answers.get), scan(question.id, answers, 1))
+                self.assertEqual(plan.previous_question(question.id, answers.get), scan(question.id, answers, -1))
+
+    def test_dependency_graph(self):
+        questions = [
+            PlanQuestion(id=i, title=f"q{i}", question_type=Question.QuestionType.text, required=False,
+                         priority=i, options=())
+            for i in range(1, 8)
+        ]
+        # 2 and 5 depend on 1, 3 on 2, 4 on 3, 6 on 5 or 2, 7 on nothing
+        edges = [(1, 2, "a"), (2, 3, "b"), (3, 4, "c"), (1, 5, "b"), (5, 6, "c"), (2, 6, "x")]
+        conditions = {}
+        for index, (source, target, value) in enumerate(edges):
+            conditions.setdefault(target, []).append(PlanCondition(
+                id=index, source_question_id=source, condition=Condition.ConditionType.text_contain, value=value))
+        operators = {6: [PlanOperator(first_condition_id=4, second_condition_id=5,
+                                      operator=Operatior.OperatorType.or_operator, priority=1)]}
+        plan = SurveyPlan(1, questions, {
+            target: ConditionExpression.build(target_conditions, operators.get(target, []))
+            for target, target_conditions in conditions.items()
+        })
+        self.assertEqual([q.id for q in plan.dependent_questions(1)], [2, 3, 4, 5, 6])
+        self.assertEqual([q.id for q in plan.dependent_questions(5)], [6])
+        self.assertEqual(plan.dependent_questions(7), [])
+
+        before = {1: "ab", 2: "bx", 3: "c", 4: "d", 5: "c", 6: "e", 7: "f"}
+        # same visibility for every dependent question, nothing is invalidated
+        self.assertEqual(plan.invalidated_questions(1, before.get, {**before, 1: "abz"}.get), [])
+        # 2 is hidden, so 3 loses its source and 4 too, 5 and 6 stay visible
+        self.assertEqual(plan.invalidated_questions(1, before.get, {**before, 1: "b"}.get), [2, 3, 4])
+        # 5 is hidden, 6 stays visible through 2
+        self.assertEqual(plan.invalidated_questions(1, before.get, {**before, 1: "a"}.get), [5])
+        # questions without answer are not invalidated and do not propagate
+        self.assertEqual(plan.invalidated_questions(
+            1, {**before, 2: None}.get, {**before, 1: "b", 2: None}.get), [])
+
+    def test_expression_tree(self):
+        conditions = [
+            PlanCondition(id=i, source_question_id=i, condition=Condition.ConditionType.text_contain, value="yes")
+            for i in range(1, 5)
+        ]
+        # (c1 or c2) and (c3 xor c4)
+        operators = [
+            PlanOperator(first_condition_id=2, second_condition_id=4, operator=Operatior.OperatorType.and_operator,
+                         priority=3),
+            PlanOperator(first_condition_id=1, second_condition_id=2, operator=Operatior.OperatorType.or_operator,
+                         priority=1),
+            PlanOperator(first_condition_id=3, second_condition_id=4, operator=Operatior.OperatorType.xor_operator,
+                         priority=2),
+        ]
+        expression = ConditionExpression.build(conditions, operators)
+        for mask in range(16):
+            answers = {i: "yes" if mask & (1 << (i - 1)) else "no" for i in range(1, 5)}
+            c1, c2, c3, c4 = [answers[i] == "yes" for i in range(1, 5)]
+            self.assertEqual(expression.evaluate(answers.get), (c1 or c2) and (c3 != c4), answers)
+
+        # answers are looked up only when they can change the result
+        looked_up = []
+        def get_answer(question_id):
+            looked_up.append(question_id)
+            return {1: "yes", 2: "no", 3: "no", 4: "no"}[question_id]
+        self.assertFalse(expression.evaluate(get_answer))
+        self.assertEqual(looked_up, [1, 3, 4])
+
+        # missing answer fail only its own condition
+        self.assertTrue(expression.evaluate({2: "yes", 3: "yes"}.get))
+        self.assertTrue(ConditionExpression.build([], []).evaluate({}.get))
+
+    def test_number_conditions(self):
+        cases = [
+            (Condition.ConditionType.number_lt, "2.5", [True, False, False]),
+            (Condition.ConditionType.number_lte, "2.5", [True, True, False]),
+            (Condition.ConditionType.number_gt, "2.5", [False, False, True]),
+            (Condition.ConditionType.number_gte, "2.5", [False, True, True]),
+        ]
+        for condition_type, value, expected in cases:
+            condition = PlanCondition(
+                id=1, source_question_id=1, condition=condition_type, value=value, number=parse_number(value))
+            self.assertEqual([condition.check(answer) for answer in [2.0, 2.5, 3.0]], expected, condition_type)
+            # answers saved as text only are still compared as numbers
+            self.assertEqual([condition.check(answer) for answer in ["2", "2.5", "3"]], expected, condition_type)
+            self.assertFalse(condition.check("x"))
+        self.assertFalse(PlanCondition(
+            id=1, source_question_id=1, condition=Condition.ConditionType.number_lt, value="x").check(1.0))
+
+
+class PrefetchWalk(RespondentWalk):
+    # respondent asking for prefetch hints, the hint of each answer must be the question it leads to
+    def __init__(self, test, survey_id, plan):
+        super().__init__(test.client, survey_id)
+        self.test = test
+        self.plan = plan
+        self.hints = None
+        self.matched = 0
+
+    def request(self, name, question_id, answer):
+        if name != "next":
+            return super().request(name, question_id, answer)
+        response = self.client.post(self.url(name, question_id), data={"answer": answer, "prefetch": True})
+        self.test.assertEqual(response.status_code, 200)
+        data = response.json()
+        hint = self.hints and self.test.matching_hint(self.hints, self.plan.get_question(question_id), answer)
+        if hint:
+            self.matched += 1
+            self.test.assertEqual(hint["question"] and hint["question"]["id"], data["question"] and data["question"]["id"])
+
+        if data["question"] is None:
+            self.test.assertNotIn("prefetch", data)
+            return response
+        next_question = self.plan.get_question(data["question"]["id"])
+        self.hints = data["prefetch"]
+        if next_question.question_type == Question.QuestionType.option:
+            self.test.assertEqual([hint["option"] for hint in self.hints], [option.id for option in next_question.options])
+        return response
+
+
+class TestPrefetchHints(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="respondent")
+        self.client.force_authenticate(self.user)
+
+    def matching_hint(self, hints, question, answer):
+        for hint in hints:
+            if question.question_type == Question.QuestionType.option:
+                if hint["option"] == int(answer):
+                    return hint
+            elif hint["lower"] is None and hint["upper"] is None:
+                return hint
+            elif question.question_type == Question.QuestionType.numerical:
+                number = float(answer)
+                if hint["lower"] == hint["upper"]:
+                    if number == hint["lower"]:
+                        return hint
+                elif (hint["lower"] is None or number > hint["lower"]) and (hint["upper"] is None or number < hint["upper"]):
+                    return hint
+        return None
+
+    def test_prefetch_hints(self):
+        survey = make_survey(questions=40, options=3, conditional=0.6, conditions=2)
+        plan = get_survey_plan(survey.id)
+        rng = random.Random(3)
+        question = plan.first_question()
+        response = self.client.post(
+            f'/api/survey/{survey.id}/answer/next/{question.id}', data={"answer": make_answer(question, rng)})
+        self.assertNotIn("prefetch", response.json())
+
+        walk = PrefetchWalk(self, survey.id, plan)
+        walk.walk(plan, rng)
+        self.assertGreater(walk.matched, 5)
@@ -0,0 +1,87 @@
+import random
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from survey.cache import get_survey_plan
+from survey.instrumentation import get_query_stats, reset_query_stats
+from survey.models import Answer, SurveyProgress
+from survey.testing import make_survey, make_answer, QueryBudgetMixin, RespondentWalk
+from survey.translation import Translation
+from survey.views.async_answer import AsyncFirstQuestionApiView, AsyncNextAnswerApiView, AsyncPreviousAnswerApiView
+
+
+class TestAsyncAnswer(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.survey = make_survey(questions=20, options=3, conditional=0.5, conditions=2)
+        self.plan = get_survey_plan(self.survey.id)
+
+    def walk(self, prefix, user, seed):
+        # answer the survey from first question to the end, going back before every answer, return every response
+        self.client.force_login(user)
+        responses = RespondentWalk(self.client, self.survey.id, prefix).walk(
+            self.plan, random.Random(seed), previous_ratio=1.0)
+        return [response.json() if response.status_code == 200 else response.content for response in responses]
+
+    def test_same_as_sync_views(self):
+        sync_user = User.objects.create_user(username="sync")
+        async_user = User.objects.create_user(username="async")
+        self.assertEqual(self.walk("async/", async_user, 0), self.walk("", sync_user, 0))
+        self.assertEqual(
+            sorted(Answer.objects.filter(user=async_user).values_list("question_id", "text", "option_id")),
+            sorted(Answer.objects.filter(user=sync_user).values_list("question_id", "text", "option_id")),
+        )
+        self.assertTrue(SurveyProgress.objects.get(user=async_user, survey=self.survey).completed)
+
+        response = self.client.post(
+            f'/api/survey/{self.survey.id}/async/answer/next/{self.plan.questions[0].id}', data={"answer": "1"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content.decode(), Translation.you_answered_to_survey)
+
+    def test_errors(self):
+        url = f'/api/survey/{self.survey.id}/async/answer/next/{self.plan.questions[0].id}'
+        self.assertEqual(self.client.post(url, data={"answer": "1"}).status_code, 403)
+        self.client.force_login(User.objects.create_user(username="respondent"))
+        self.assertEqual(self.client.post(url, data={"answer": "999999"}).status_code, 400)
+        response = self.client.post(url, data="{bad", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.status_code, self.client.post(
+            f'/api/survey/{self.survey.id}/answer/next/{self.plan.questions[0].id}',
+            data="{bad", content_type="application/json").status_code)
+        self.assertIn("JSON parse error", response.json()["detail"])
+        self.assertEqual(self.client.post(f'/api/survey/{self.survey.id}/async/answer/next/999999').status_code, 404)
+        self.assertEqual(self.client.get('/api/survey/999999/async/question/first_question').status_code, 404)
+
+        url = f'/api/survey/{self.survey.id}/async/question/first_question'
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(etag, self.client.get(f'/api/survey/{self.survey.id}/question/first_question')["ETag"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_query_budget(self):
+        self.client.force_login(User.objects.create_user(username="respondent"))
+        question = self.plan.questions[0]
+        with self.assertQueryBudget(AsyncFirstQuestionApiView):
+            self.client.get(f'/api/survey/{self.survey.id}/async/question/first_question')
+        with self.assertQueryBudget(AsyncNextAnswerApiView):
+            response = self.client.post(
+                f'/api/survey/{self.survey.id}/async/answer/next/{question.id}',
+                data={"answer": make_answer(question, random.Random(0))})
+        with self.assertQueryBudget(AsyncPreviousAnswerApiView):
+            self.client.get(f'/api/survey/{self.survey.id}/async/answer/previous/{response.json()["question"]["id"]}')
+
+    @override_settings(SURVEY_QUERY_HEADERS=True)
+    async def test_asgi_request(self):
+        user = await sync_to_async(User.objects.create_user)(username="respondent")
+        await self.async_client.aforce_login(user)
+        question = self.plan.questions[0]
+        reset_query_stats()
+        response = await self.async_client.post(
+            f'/api/survey/{self.survey.id}/async/answer/next/{question.id}',
+            data={"answer": make_answer(question, random.Random(0))}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response["X-Query-Count"]), 0)
+        self.assertEqual(get_query_stats()["AsyncNextAnswerApiView"]["queries"], int(response["X-Query-Count"]))
+        self.assertTrue(await Answer.objects.filter(user=user, question_id=question.id).aexists())
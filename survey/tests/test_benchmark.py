@@ -0,0 +1,37 @@
+from django.test import TestCase
+
+from survey.benchmark import RespondentFlowBenchmark, ReplayBenchmark, percentile
+from survey.views.answer import NextAnswerApiView
+from survey.views.async_answer import AsyncNextAnswerApiView
+
+
+class TestRespondentFlowBenchmark(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertIsNone(percentile([], 50))
+
+    def test_run(self):
+        results = RespondentFlowBenchmark(questions=8, respondents=3).run()
+        self.assertEqual(results["endpoints"]["first_question"]["requests"], 3)
+        self.assertGreater(results["endpoints"]["next"]["requests"], 0)
+        self.assertLessEqual(results["endpoints"]["next"]["max_queries"], NextAnswerApiView.query_budget)
+        self.assertIsNotNone(results["total"]["p99_ms"])
+
+    def test_async_run(self):
+        results = RespondentFlowBenchmark(questions=8, respondents=4, mode="async", concurrency=2).run()
+        self.assertEqual(results["config"]["mode"], "async")
+        self.assertEqual(results["endpoints"]["first_question"]["requests"], 4)
+        self.assertGreater(results["endpoints"]["next"]["requests"], 0)
+        self.assertLessEqual(results["endpoints"]["next"]["max_queries"], AsyncNextAnswerApiView.query_budget)
+
+
+class TestReplayBenchmark(TestCase):
+    def test_run(self):
+        results = ReplayBenchmark(questions=200, respondents=10, repeat=2).run()
+        self.assertEqual(results["replay"]["requests"], 20)
+        self.assertGreater(results["replay"]["questions_per_second"], 0)
+        self.assertGreater(results["replay"]["finished_ratio"], 0)
+        self.assertIsNotNone(results["compile_ms"])
@@ -0,0 +1,114 @@
+import json
+import random
+
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from survey.bundle import evaluate_routing
+from survey.cache import get_survey_plan
+from survey.models import Answer, Question, Survey, SurveyProgress
+from survey.routing import parse_number
+from survey.testing import make_survey, make_answer, QueryBudgetMixin
+from survey.translation import Translation
+from survey.views.bundle import SurveyBundleApiView, UploadBundleAnswersApiView
+
+
+class TestSurveyBundle(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.survey = make_survey(questions=40, options=3, conditional=0.6, conditions=3)
+        self.plan = get_survey_plan(self.survey.id)
+        self.user = User.objects.create_user(username="respondent")
+
+    def bundle(self):
+        with self.assertQueryBudget(SurveyBundleApiView):
+            response = self.client.get(f'/api/survey/{self.survey.id}/bundle')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(json.dumps(response.json()))
+
+    def run_offline(self, bundle, rng):
+        # what a client does with the bundle: show questions whose routing program is true and answer them
+        answers = {}
+        items = []
+        for question in bundle["questions"]:
+            program = bundle["routing"].get(str(question["id"]))
+            if program and not evaluate_routing(program, answers):
+                continue
+            if not question["required"] and rng.random() < 0.2:
+                items.append({"question": question["id"]})
+                continue
+            answer = make_answer(self.plan.get_question(question["id"]), rng)
+            answers[question["id"]] = answer
+            items.append({"question": question["id"], "answer": answer})
+        return items
+
+    def test_bundle(self):
+        self.assertEqual(self.client.get('/api/survey/999/bundle').status_code, 404)
+        draft = make_survey(questions=3, publish=False)
+        self.assertEqual(self.client.get(f'/api/survey/{draft.id}/bundle').status_code, 404)
+
+        bundle = self.bundle()
+        self.assertEqual(bundle["survey"], {
+            "id": self.survey.id, "title": self.survey.title, "version": Survey.objects.get(id=self.survey.id).version})
+        self.assertEqual([q["id"] for q in bundle["questions"]], [q.id for q in self.plan.questions])
+        self.assertEqual(
+            sorted(bundle["routing"]), sorted(str(q.id) for q in self.plan.questions if self.plan.get_expression(q.id).root))
+
+        # routing programs give the visibility of the survey plan
+        rng = random.Random(1)
+        for _ in range(50):
+            answers = {
+                question.id: make_answer(question, rng) for question in self.plan.questions if rng.random() < 0.7}
+
+            def typed_value(question_id):
+                answer = answers.get(question_id)
+                question = self.plan.get_question(question_id)
+                if answer is None or question.question_type == Question.QuestionType.text:
+                    return answer
+                if question.question_type == Question.QuestionType.numerical:
+                    return parse_number(answer)
+                return int(answer)
+
+            for question_id, program in bundle["routing"].items():
+                self.assertEqual(
+                    evaluate_routing(program, answers), self.plan.is_visible(int(question_id), typed_value))
+
+    def test_upload_answers(self):
+        self.client.force_authenticate(self.user)
+        bundle = self.bundle()
+        items = self.run_offline(bundle, random.Random(2))
+        url = f'/api/survey/{self.survey.id}/bundle/answers'
+
+        # answers that do not reach the end of the survey are rejected
+        response = self.client.post(url, data={"answers": items[:-1]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"question": items[-1]["question"], "detail": Translation.survey_not_finished})
+        self.assertFalse(Answer.objects.filter(user=self.user).exists())
+
+        with self.assertQueryBudget(UploadBundleAnswersApiView):
+            response = self.client.post(url, data={"answers": items}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["finished"])
+        self.assertEqual(
+            sorted(Answer.objects.filter(user=self.user).values_list("question_id", flat=True)),
+            sorted(item["question"] for item in items if "answer" in item))
+        self.assertTrue(SurveyProgress.objects.get(user=self.user, survey=self.survey).completed)
+
+        # a finished survey can not be uploaded again
+        response = self.client.post(url, data={"answers": items}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_upload_validation(self):
+        self.client.force_authenticate(self.user)
+        bundle = self.bundle()
+        items = self.run_offline(bundle, random.Random(3))
+        url = f'/api/survey/{self.survey.id}/bundle/answers'
+
+        # an answer to a question the routing hides is checked like next answer
+        shown = {item["question"] for item in items}
+        hidden = next(q for q in self.plan.questions if q.id not in shown and q.priority > 0)
+        invalid = [item for item in items if self.plan.get_question(item["question"]).priority < hidden.priority]
+        invalid.append({"question": hidden.id, "answer": make_answer(hidden, random.Random(4))})
+        response = self.client.post(url, data={"answers": invalid}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["question"], hidden.id)
+        self.assertFalse(Answer.objects.filter(user=self.user).exists())
@@ -0,0 +1,114 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from survey import cache as survey_cache_module
+from survey.cache import survey_cache, get_survey_plan
+from survey.models import Survey, Question, Option
+from survey.testing import make_survey
+
+
+class TestSurveyCache(APITestCase):
+    def setUp(self):
+        self.survey = make_survey(questions=10)
+
+    def other_worker(self):
+        # a worker that did not run the signals of this one, only shares the cache backend
+        survey_cache_module._survey_plans.clear()
+
+    def test_cached_plan(self):
+        plan = get_survey_plan(self.survey.id)
+        with self.assertNumQueries(0):
+            self.assertIs(get_survey_plan(self.survey.id), plan)
+        self.other_worker()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_survey_plan(self.survey.id).questions, plan.questions)
+
+        # cold cache compile plan from database
+        cache.clear()
+        self.other_worker()
+        with self.assertNumQueries(5):
+            self.assertEqual(get_survey_plan(self.survey.id).questions, plan.questions)
+
+    def test_stale_worker(self):
+        plan = get_survey_plan(self.survey.id)
+        stale_plans = dict(survey_cache_module._survey_plans)
+        question = Question.objects.create(
+            title="new", survey=self.survey, question_type=Question.QuestionType.text, priority=100)
+
+        survey_cache_module._survey_plans.update(stale_plans)
+        new_plan = get_survey_plan(self.survey.id)
+        self.assertIsNot(new_plan, plan)
+        self.assertIsNotNone(new_plan.get_question(question.id))
+
+        question.delete()
+        survey_cache_module._survey_plans.update(stale_plans)
+        self.assertIsNone(get_survey_plan(self.survey.id).get_question(question.id))
+
+    def test_option_invalidation(self):
+        question = next(q for q in get_survey_plan(self.survey.id).questions if q.options)
+        option = Option.objects.get(id=question.options[0].id)
+        option.title = "changed"
+        option.save()
+        self.other_worker()
+        question = get_survey_plan(self.survey.id).get_question(question.id)
+        self.assertEqual(question.options[0].title, "changed")
+
+        response = self.client.get(f'/api/survey/{self.survey.id}/definition')
+        options = next(q for q in response.json()["questions"] if q["id"] == question.id)["options"]
+        self.assertEqual(options[0]["title"], "changed")
+
+    def test_status_and_delete(self):
+        draft = make_survey(questions=3, publish=False)
+        self.assertEqual(survey_cache.get_stamp(draft.id).status, Survey.StatusType.draft)
+        self.assertIsNone(get_survey_plan(draft.id))
+
+        survey_id = self.survey.id
+        Survey.objects.filter(id=survey_id).update(status=Survey.StatusType.draft)
+        self.survey.delete()
+        self.other_worker()
+        self.assertIsNone(survey_cache.get_stamp(survey_id))
+        self.assertIsNone(get_survey_plan(survey_id))
+
+    def test_delete_query_count(self):
+        # rows deleted with a survey do not bump its version one by one, the collector of
+        # the cascade selects every related model once and deletes by batches of 100 rows
+        counts = []
+        for questions in [10, 100]:
+            draft = make_survey(questions=questions, options=3, conditional=0.5, conditions=3, publish=False)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.delete(f'/api/survey/{draft.id}/')
+            self.assertEqual(response.status_code, 204)
+            self.assertFalse(Question.objects.filter(survey_id=draft.id).exists())
+            self.assertIsNone(survey_cache.get_stamp(draft.id))
+            counts.append(len(context))
+        self.assertEqual(counts[0], 22)
+        self.assertLessEqual(counts[1], 25)
+
+    def test_delete_question_bumps_version_once(self):
+        draft = make_survey(questions=10, options=3, conditional=1, conditions=2, publish=False)
+        question = Question.objects.filter(survey=draft, question_type=Question.QuestionType.option).first()
+        self.assertTrue(Option.objects.filter(question=question).exists())
+        version = Survey.objects.get(id=draft.id).version
+        response = self.client.delete(f'/api/survey/{draft.id}/question/{question.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Survey.objects.get(id=draft.id).version, version + 1)
+        self.assertEqual(survey_cache.get_stamp(draft.id).version, version + 1)
+
+    def test_stamp_published_on_commit(self):
+        draft = make_survey(questions=5, publish=False)
+        version = Survey.objects.get(id=draft.id).version
+        stale = survey_cache.get_definition(draft.id, version)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Question.objects.create(
+                    title="new", survey=draft, question_type=Question.QuestionType.text, priority=100)
+                # another worker reads the rows committed before and caches them under the new version
+                survey_cache.cache.set(survey_cache.data_keys(draft.id, version + 1)[0], stale)
+                self.assertIsNone(survey_cache.cache.get(survey_cache.stamp_key(draft.id)))
+        self.assertEqual(survey_cache.get_stamp(draft.id).version, version + 1)
+        # the stale entry is dropped on commit, the definition is loaded again
+        with self.assertNumQueries(4):
+            definition = survey_cache.get_definition(draft.id, version + 1)
+        self.assertEqual(len(definition.questions), len(stale.questions) + 1)
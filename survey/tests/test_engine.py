@@ -0,0 +1,91 @@
+import random
+
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from survey import engine
+from survey.benchmark import ReplayBenchmark
+from survey.cache import get_survey_plan
+from survey.models import Question
+from survey.snapshot import AnswerSnapshot
+from survey.testing import make_survey, make_answer, RespondentWalk
+from survey.translation import Translation
+
+
+class TestReplay(APITestCase):
+    def setUp(self):
+        self.survey = make_survey(questions=60, options=3, conditional=0.6, conditions=2)
+        self.plan = get_survey_plan(self.survey.id)
+
+    def test_replay_matches_views(self):
+        for seed in range(3):
+            user = User.objects.create_user(username=f"respondent{seed}")
+            self.client.force_authenticate(user)
+            responses = RespondentWalk(self.client, self.survey.id).walk(self.plan, random.Random(seed))
+            # first question, then the question each answer led to
+            visited = [responses[0].json()["id"]] + [
+                response.json()["question"]["id"] for response in responses[1:] if response.json()["question"]]
+
+            # no query, the path walked through the views is the replay of the saved answers
+            answers = AnswerSnapshot.load(user, self.survey.id).typed_values()
+            with self.assertNumQueries(0):
+                result = engine.replay(self.plan, answers)
+            self.assertEqual([q.id for q in result.path], visited)
+            self.assertTrue(result.finished)
+            self.assertIsNone(result.current)
+            self.assertEqual(result.hidden, ())
+
+    def test_replay_errors(self):
+        rng = random.Random(1)
+        answers = {}
+        question = self.plan.first_question()
+        while question:
+            answers[question.id] = ReplayBenchmark.typed_answer(question, make_answer(question, rng))
+            question = self.plan.next_question(question.id, answers.get)
+        self.assertTrue(engine.replay(self.plan, answers).finished)
+
+        # respondent stopped before a required question
+        required = next(q for q in self.plan.questions[1:] if q.required and q.id in answers)
+        partial = {question_id: value for question_id, value in answers.items()
+                   if self.plan.get_question(question_id).priority < required.priority}
+        result = engine.replay(self.plan, partial)
+        self.assertFalse(result.finished)
+        self.assertEqual(result.error.message, Translation.this_question_required)
+        self.assertEqual(result.error.question, required.id)
+        self.assertLessEqual(result.current.priority, required.priority)
+
+        # an answer that is not an option of its question
+        option_question = next(q for q in self.plan.questions if q.question_type == Question.QuestionType.option)
+        result = engine.replay(self.plan, {**answers, option_question.id: 999999})
+        self.assertEqual((result.error.message, result.error.question), (Translation.invalid_answer, option_question.id))
+
+        # answers of questions off the path are reported
+        hidden = next(q for q in self.plan.questions if q.id not in answers)
+        hidden_answer = ReplayBenchmark.typed_answer(hidden, make_answer(hidden, rng))
+        result = engine.replay(self.plan, {**answers, hidden.id: hidden_answer})
+        self.assertEqual(result.hidden, (hidden.id,))
+        self.assertTrue(result.finished)
+
+        # replay checks answers like the next answer view, an empty text is a skipped question
+        text = next(q for q in self.plan.questions if q.question_type == Question.QuestionType.text and q.id in answers)
+        result = engine.replay(self.plan, {**answers, text.id: ""})
+        self.assertEqual(result.current.id if not text.required else result.error.question, text.id)
+
+    def test_check_and_parse_answer(self):
+        text = next(q for q in self.plan.questions if q.question_type == Question.QuestionType.text)
+        numerical = next(q for q in self.plan.questions if q.question_type == Question.QuestionType.numerical)
+        option = self.plan.first_question()
+        self.assertEqual(engine.parse_answer(numerical, "x", False), (Translation.invalid_answer, None))
+        self.assertEqual(engine.parse_answer(numerical, "2.5", False), (None, "2.5"))
+        self.assertEqual(engine.parse_answer(option, str(option.options[1].id), False), (None, option.options[1]))
+        self.assertEqual(engine.parse_answer(option, None, False)[0], Translation.this_question_required)
+        self.assertEqual(engine.parse_answer(option, None, True), (None, None))
+        self.assertEqual(engine.parse_answer(text, "", True), (None, None))
+        self.assertEqual(engine.parse_answer(numerical, 0.0, False), (None, 0.0))
+        self.assertEqual(engine.parse_answer(text, "abc", False), (None, "abc"))
+
+        # a question after an unanswered required question can not be answered
+        self.assertEqual(
+            engine.check_question(self.plan, self.plan.questions[1], {}.get), Translation.answer_required_question)
+        self.assertIsNone(engine.check_question(self.plan, option, {}.get))
+
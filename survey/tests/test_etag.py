@@ -0,0 +1,74 @@
+from rest_framework.test import APITestCase
+
+from survey.models import Survey, Question, Option, Condition
+
+
+class TestConditionalGet(APITestCase):
+    def setUp(self):
+        self.survey = Survey.objects.create(title="s1")
+        self.question1 = Question.objects.create(
+            title="q1", survey=self.survey, question_type=Question.QuestionType.option, priority=1)
+        self.question2 = Question.objects.create(
+            title="q2", survey=self.survey, question_type=Question.QuestionType.text, priority=2)
+        self.option1 = Option.objects.create(title="o1", question=self.question1, priority=1)
+        Option.objects.create(title="o2", question=self.question1, priority=2)
+
+    def assertNotModified(self, url, queries=0):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        # survey version stamp is served from cache
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def test_survey_version(self):
+        versions = [Survey.objects.get(id=self.survey.id).version]
+        Question.objects.create(title="q3", survey=self.survey, question_type=Question.QuestionType.text, priority=3)
+        versions.append(Survey.objects.get(id=self.survey.id).version)
+        self.option1.title = "changed"
+        self.option1.save()
+        versions.append(Survey.objects.get(id=self.survey.id).version)
+        condition = Condition.objects.create(
+            survey=self.survey,
+            source_question=self.question1,
+            target_question=self.question2,
+            condition=Condition.ConditionType.option_equal,
+            value=str(self.option1.id)
+        )
+        versions.append(Survey.objects.get(id=self.survey.id).version)
+        condition.delete()
+        versions.append(Survey.objects.get(id=self.survey.id).version)
+        self.survey.title = "changed"
+        self.survey.save()  # stale version of this instance must not overwrite the counter
+        versions.append(Survey.objects.get(id=self.survey.id).version)
+        self.assertEqual(versions, sorted(set(versions)))
+
+    def test_conditional_get(self):
+        urls = {
+            '/api/survey/': 1,
+            f'/api/survey/{self.survey.id}/': 0,
+            f'/api/survey/{self.survey.id}/question/': 0,
+            f'/api/survey/{self.survey.id}/question/{self.question1.id}/': 0,
+            f'/api/survey/question/{self.question1.id}/option/': 1,
+            f'/api/survey/question/{self.question1.id}/option/{self.option1.id}/': 1,
+        }
+        etags = [self.assertNotModified(url, queries) for url, queries in urls.items()]
+
+        # any write change the etags
+        self.client.patch(f'/api/survey/question/{self.question1.id}/option/{self.option1.id}/', data={"title": "x"})
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_first_question(self):
+        url = f'/api/survey/{self.survey.id}/question/first_question'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(f'/api/survey/{self.survey.id}/publish')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotModified(url)
+        response = self.client.get('/api/survey/999/question/first_question')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+
+from survey.models import Survey, Question, Option, Answer
+
+
+class TestExportAnswers(APITestCase):
+    def setUp(self):
+        self.survey = Survey.objects.create(title="s1")
+        self.question1 = Question.objects.create(
+            title="color", survey=self.survey, question_type=Question.QuestionType.option, priority=1)
+        self.option1 = Option.objects.create(title="red", question=self.question1, priority=1)
+        self.option2 = Option.objects.create(title="blue", question=self.question1, priority=2)
+        self.question2 = Question.objects.create(
+            title="age", survey=self.survey, question_type=Question.QuestionType.numerical, priority=2)
+        self.question3 = Question.objects.create(
+            title="comment, if any", survey=self.survey, question_type=Question.QuestionType.text, priority=3)
+        self.users = [User.objects.create_user(username=f"u{i}") for i in range(3)]
+        Answer.objects.create(user=self.users[0], question=self.question1, option=self.option2)
+        Answer.objects.create(user=self.users[1], question=self.question2, text="30", number=30)
+        Answer.objects.create(user=self.users[0], question=self.question3, text='say "hi"\nbye')
+        Answer.objects.create(user=self.users[1], question=self.question1, option=self.option1)
+        self.admin = User.objects.create_superuser(username="admin")
+
+    def test_export_csv(self):
+        url = f'/api/survey/{self.survey.id}/export/csv'
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(f'/api/survey/{self.survey.id}/export/xml').status_code, 404)
+        self.assertEqual(self.client.get('/api/survey/999/export/csv').status_code, 404)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        # answers are read with one query, whatever the number of respondents
+        with self.assertNumQueries(1):
+            content = b"".join(response.streaming_content).decode()
+        self.assertEqual(list(csv.reader(io.StringIO(content))), [
+            ["user_id", "username", "color", "age", "comment, if any"],
+            [str(self.users[0].id), "u0", "blue", "", 'say "hi"\nbye'],
+            [str(self.users[1].id), "u1", "red", "30", ""],
+        ])
+
+    def test_export_jsonl(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(f'/api/survey/{self.survey.id}/export/jsonl')
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows[1], {
+            "user_id": self.users[1].id,
+            "username": "u1",
+            "answers": {str(self.question1.id): "red", str(self.question2.id): "30", str(self.question3.id): None},
+        })
+        self.assertEqual(len(rows), 2)
+
+    def test_export_command(self):
+        out = io.StringIO()
+        call_command("export_answers", self.survey.id, "--format", "jsonl", "--chunk-size", "1", stdout=out)
+        self.assertEqual([json.loads(line)["username"] for line in out.getvalue().splitlines()], ["u0", "u1"])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "answers.csv")
+            call_command("export_answers", self.survey.id, "--output", path, stdout=io.StringIO())
+            with open(path, newline="", encoding="utf-8") as export:
+                self.assertEqual(len(list(csv.reader(export))), 3)
@@ -0,0 +1,201 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from survey.models import Survey, Question, Option, Condition, Operatior
+from survey.testing import make_survey, QueryBudgetMixin
+from survey.translation import Translation
+from survey.views.survey import ImportSurveyApiView
+
+
+def comparable(definition):
+    # definition without ids, option condition values are replaced with option titles
+    options = {
+        str(option["id"]): option["title"] for question in definition["questions"] for option in question["options"] or []}
+    questions = {question["id"]: question["title"] for question in definition["questions"]}
+    conditions = {}
+    for condition in definition["conditions"]:
+        value = condition["value"]
+        if condition["condition"] in ["option_equal", "option_not_equal"]:
+            value = options[value]
+        conditions[condition["id"]] = (
+            questions[condition["source_question"]], questions[condition["target_question"]], condition["condition"], value)
+    return {
+        "questions": [
+            (q["title"], q["question_type"], q["required"], q["priority"],
+             [(o["title"], o["priority"]) for o in q["options"] or []])
+            for q in definition["questions"]
+        ],
+        "conditions": sorted(conditions.values()),
+        "operators": sorted(
+            (conditions[o["first_condition"]], conditions[o["second_condition"]], o["operator"], o["priority"])
+            for o in definition["operators"]
+        ),
+    }
+
+
+class TestImportSurvey(QueryBudgetMixin, APITestCase):
+    def definition(self, survey):
+        response = self.client.get(f'/api/survey/{survey.id}/definition')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_import_definition(self):
+        survey = make_survey(questions=30, options=3, conditional=0.5, conditions=3)
+        document = self.definition(survey)
+
+        response = self.client.post('/api/survey/import', data=document, format="json")
+        self.assertEqual(response.status_code, 201)
+        imported = Survey.objects.get(id=response.json()["id"])
+        self.assertEqual(imported.title, survey.title)
+        self.assertEqual(imported.status, Survey.StatusType.draft)
+        self.assertEqual(response.json()["version"], imported.version)
+        self.assertEqual(comparable(self.definition(imported)), comparable(document))
+        self.assertFalse(Condition.objects.filter(survey=imported, source_question__survey=survey).exists())
+
+        # imported survey can be published and answered
+        self.assertEqual(self.client.get(f'/api/survey/{imported.id}/publish').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/survey/{imported.id}/question/first_question').status_code, 200)
+
+    def test_import_query_count(self):
+        for questions in [10, 100]:
+            document = self.definition(make_survey(questions=questions, options=3, conditions=2, publish=False))
+            # savepoints, survey and its stamp, one insert per model, version bump and stamp, version
+            with self.assertQueryBudget(ImportSurveyApiView):
+                response = self.client.post('/api/survey/import', data=document, format="json")
+            self.assertEqual(response.status_code, 201)
+
+    def test_import_violations(self):
+        document = self.definition(make_survey(questions=6, options=2, conditional=1, conditions=2, publish=False))
+        counts = [Survey.objects.count(), Question.objects.count(), Option.objects.count(),
+                  Condition.objects.count(), Operatior.objects.count()]
+
+        # field errors
+        response = self.client.post('/api/survey/import', data={"survey": {}, "questions": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("title", response.json()["survey"])
+
+        def violations(document):
+            response = self.client.post('/api/survey/import', data=document, format="json")
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()["valid"])
+            return response.json()["violations"]
+
+        # rules of condition serializer
+        invalid = json.loads(json.dumps(document))
+        condition = invalid["conditions"][0]
+        condition["source_question"], condition["target_question"] = condition["target_question"], condition["source_question"]
+        self.assertEqual(violations(invalid)[0]["message"], Translation.invalid_target_question_priority)
+        self.assertEqual(violations(invalid)[0]["condition"], condition["id"])
+
+        invalid = json.loads(json.dumps(document))
+        option_condition = next(c for c in invalid["conditions"] if c["condition"].startswith("option"))
+        option_condition["value"] = "99999"
+        self.assertEqual(violations(invalid)[0]["message"], Translation.invalid_option_id)
+
+        invalid = json.loads(json.dumps(document))
+        invalid["conditions"][0]["source_question"] = 99999
+        self.assertEqual(violations(invalid)[0]["message"], Translation.invalid_source_or_target_survey)
+
+        # rules of operator serializer
+        invalid = json.loads(json.dumps(document))
+        invalid["operators"][0]["second_condition"] = invalid["operators"][0]["first_condition"]
+        self.assertEqual(violations(invalid)[0]["message"], Translation.change_first_second_condition)
+
+        invalid = json.loads(json.dumps(document))
+        invalid["operators"][0]["second_condition"] = 99999
+        self.assertEqual(violations(invalid)[0]["message"], Translation.invalid_condition_id)
+
+        # rules of publish
+        invalid = json.loads(json.dumps(document))
+        invalid["questions"].append(
+            {"id": 99999, "title": "q", "question_type": "text", "priority": invalid["questions"][-1]["priority"]})
+        messages = {violation["message"] for violation in violations(invalid)}
+        self.assertIn(Translation.unique_question_priorities, messages)
+
+        invalid = json.loads(json.dumps(document))
+        invalid["operators"] = []
+        self.assertEqual(violations(invalid)[0]["message"], Translation.operation_between_condition)
+
+        invalid = json.loads(json.dumps(document))
+        invalid["questions"].append(dict(invalid["questions"][0]))
+        self.assertEqual(violations(invalid)[0]["message"], Translation.duplicate_id)
+
+        self.assertEqual(counts, [Survey.objects.count(), Question.objects.count(), Option.objects.count(),
+                                  Condition.objects.count(), Operatior.objects.count()])
+
+    def test_import_command(self):
+        document = self.definition(make_survey(questions=10, options=3, conditions=2))
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as definition_file:
+            json.dump(document, definition_file)
+            definition_file.flush()
+            out = StringIO()
+            call_command("import_survey", definition_file.name, stdout=out)
+        survey = Survey.objects.latest("id")
+        self.assertIn(f"survey {survey.id} imported", out.getvalue())
+        self.assertEqual(comparable(self.definition(survey)), comparable(document))
+
+        document["operators"] = []
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as definition_file:
+            json.dump(document, definition_file)
+            definition_file.flush()
+            with self.assertRaisesMessage(CommandError, str(Translation.operation_between_condition)):
+                call_command("import_survey", definition_file.name, stdout=StringIO())
+
+    def test_import_command_stdin(self):
+        document = self.definition(make_survey(questions=10, options=3, conditions=2))
+        out = StringIO()
+        call_command("import_survey", "-", stdin=StringIO(json.dumps(document)), stdout=out)
+        survey = Survey.objects.latest("id")
+        self.assertIn(f"survey {survey.id} imported", out.getvalue())
+        self.assertEqual(comparable(self.definition(survey)), comparable(document))
+
+        with self.assertRaisesMessage(CommandError, "can not read -"):
+            call_command("import_survey", "-", stdin=StringIO("{bad"), stdout=StringIO())
+
+
+class TestCloneSurvey(APITestCase):
+    def definition(self, survey_id):
+        return self.client.get(f'/api/survey/{survey_id}/definition').json()
+
+    def test_clone_survey(self):
+        response = self.client.post('/api/survey/999/clone/')
+        self.assertEqual(response.status_code, 404)
+
+        survey = make_survey(questions=30, options=3, conditional=0.5, conditions=3)
+        response = self.client.post(f'/api/survey/{survey.id}/clone/', data={"title": "next quarter"})
+        self.assertEqual(response.status_code, 201)
+        clone = Survey.objects.get(id=response.json()["id"])
+        self.assertEqual(clone.title, "next quarter")
+        self.assertEqual(clone.status, Survey.StatusType.draft)
+        self.assertEqual(comparable(self.definition(clone.id)), comparable(self.definition(survey.id)))
+        self.assertFalse(Condition.objects.filter(survey=clone).exclude(source_question__survey=clone).exists())
+        self.assertFalse(Operatior.objects.filter(survey=clone).exclude(first_condition__survey=clone).exists())
+
+        # copy can be edited and published, the survey is unchanged
+        question = Question.objects.filter(survey=clone).order_by("priority").last()
+        response = self.client.patch(f'/api/survey/{clone.id}/question/{question.id}/', data={"title": "edited"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f'/api/survey/{clone.id}/publish').status_code, 200)
+        self.assertFalse(Question.objects.filter(survey=survey, title="edited").exists())
+
+        response = self.client.post(f'/api/survey/{clone.id}/clone/')
+        self.assertEqual(Survey.objects.get(id=response.json()["id"]).title, "next quarter")
+
+    def test_clone_query_count(self):
+        counts = []
+        for questions in [10, 100]:
+            survey = make_survey(questions=questions, options=3, conditions=2)
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(f'/api/survey/{survey.id}/clone/')
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
@@ -0,0 +1,49 @@
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection, IntegrityError
+from django.test import TestCase
+
+from survey.models import Survey, Question, Condition, Answer, UserAnsweredToSurvey
+
+
+@skipUnless(connection.vendor == "sqlite", "query plans are checked with sqlite EXPLAIN QUERY PLAN")
+class TestHotQueryIndexes(TestCase):
+    def assertSearch(self, queryset, *searches):
+        # every table is searched with an index, none is scanned
+        plan = queryset.explain()
+        self.assertNotIn("SCAN", plan)
+        for search in searches:
+            self.assertIn(search, plan)
+
+    def test_hot_queries_use_indexes(self):
+        self.assertSearch(
+            Question.objects.filter(survey_id=1).order_by("priority", "id"),
+            "USING INDEX question_survey_priority (survey_id=?)",
+        )
+        self.assertSearch(
+            Condition.objects.filter(survey_id=1, target_question_id=1),
+            "USING INDEX condition_survey_target (survey_id=? AND target_question_id=?)",
+        )
+        self.assertSearch(Answer.objects.filter(user_id=1, question_id=1), "(user_id=? AND question_id=?)")
+        self.assertSearch(Answer.objects.filter(user_id=1, question__survey_id=1), "(user_id=?)")
+        self.assertSearch(UserAnsweredToSurvey.objects.filter(user_id=1, survey_id=1), "(user_id=? AND survey_id=?)")
+        self.assertNotIn("TEMP B-TREE", Question.objects.filter(survey_id=1).order_by("priority", "id").explain())
+
+
+class TestUniqueAnswers(TestCase):
+    def test_unique_answers(self):
+        user = User.objects.create_user(username="respondent")
+        survey = Survey.objects.create(title="s1")
+        question = Question.objects.create(
+            title="q1", survey=survey, question_type=Question.QuestionType.text, priority=1)
+        Answer.objects.create(user=user, question=question, text="a")
+        with self.assertRaises(IntegrityError):
+            Answer.objects.create(user=user, question=question, text="b")
+
+    def test_unique_answered_survey(self):
+        user = User.objects.create_user(username="respondent")
+        survey = Survey.objects.create(title="s1")
+        UserAnsweredToSurvey.objects.create(user=user, survey=survey)
+        with self.assertRaises(IntegrityError):
+            UserAnsweredToSurvey.objects.create(user=user, survey=survey)
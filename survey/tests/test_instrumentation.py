@@ -0,0 +1,105 @@
+import random
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from survey.instrumentation import get_query_stats, reset_query_stats
+from survey.cache import get_survey_plan
+from survey.testing import make_survey, make_answer, QueryBudgetMixin, RespondentWalk
+from survey.views.answer import NextAnswerApiView, PreviousAnswerApiView, BatchAnswerApiView, ResumeAnswerApiView
+from survey.views.conditions import ConditionViewSet, OperatiorViewSet
+from survey.views.question import FirstQuestionApiView, QuestionViewSet, OptionViewSet
+from survey.views.segment import SegmentApiView
+from survey.views.survey import SurveyViewSet, SurveyDefinitionApiView
+
+
+class TestQueryAccounting(APITestCase):
+    def setUp(self):
+        self.survey = make_survey(questions=5)
+        reset_query_stats()
+
+    @override_settings(SURVEY_QUERY_HEADERS=True)
+    def test_query_headers(self):
+        response = self.client.get(f'/api/survey/{self.survey.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Query-Count"], "1")  # etag is cached
+        self.assertIn("X-Query-Time-Ms", response)
+
+    @override_settings(SURVEY_QUERY_HEADERS=False)
+    def test_query_stats(self):
+        response = self.client.get(f'/api/survey/{self.survey.id}/question/first_question')
+        self.assertNotIn("X-Query-Count", response)
+        self.client.get(f'/api/survey/{self.survey.id}/')
+        self.client.get(f'/api/survey/{self.survey.id}/')
+        stats = get_query_stats()
+        self.assertEqual(stats["FirstQuestionApiView"]["requests"], 1)
+        self.assertEqual(stats["SurveyViewSet.retrieve"]["requests"], 2)
+        self.assertEqual(stats["SurveyViewSet.retrieve"]["queries"], 2)
+
+
+class BudgetedWalk(RespondentWalk):
+    # every request of the respondent, and a resume after each answer, stays in the query budget of its view
+    views = {"first_question": FirstQuestionApiView, "next": NextAnswerApiView, "previous": PreviousAnswerApiView}
+
+    def __init__(self, test, survey_id):
+        super().__init__(test.client, survey_id)
+        self.test = test
+
+    def request(self, name, question_id, answer):
+        with self.test.assertQueryBudget(self.views[name]):
+            response = super().request(name, question_id, answer)
+        self.test.assertEqual(response.status_code, 200)
+        if name == "next":
+            with self.test.assertQueryBudget(ResumeAnswerApiView):
+                resume = self.client.get(f'/api/survey/{self.survey_id}/answer/resume')
+            self.test.assertEqual(resume.status_code, 200)
+        return response
+
+
+class TestQueryBudget(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="respondent")
+        self.admin = User.objects.create_superuser(username="admin")
+        self.client.force_authenticate(self.user)
+
+    def check_budgets(self, questions):
+        survey = make_survey(questions=questions, options=4, conditional=0.5, conditions=3)
+        plan = get_survey_plan(survey.id)
+        rng = random.Random(questions)
+
+        for view_class, url in [
+            (SurveyViewSet, f'/api/survey/{survey.id}/'),
+            (SurveyDefinitionApiView, f'/api/survey/{survey.id}/definition'),
+            (QuestionViewSet, f'/api/survey/{survey.id}/question/'),
+            (FirstQuestionApiView, f'/api/survey/{survey.id}/question/first_question'),
+            (OptionViewSet, f'/api/survey/question/{plan.questions[0].id}/option/'),
+            (ConditionViewSet, f'/api/survey/{survey.id}/condition/'),
+            (OperatiorViewSet, f'/api/survey/{survey.id}/condition/operator/'),
+        ]:
+            with self.assertQueryBudget(view_class):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(self.admin)
+        with self.assertQueryBudget(SegmentApiView):
+            response = self.client.get(f'/api/survey/{survey.id}/segment/{plan.questions[-1].id}')
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(self.user)
+
+        # walk the survey from first question to the end, going back before every answer
+        BudgetedWalk(self, survey.id).walk(plan, rng, previous_ratio=1.0)
+
+        batch_survey = make_survey(questions=questions, conditional=0, seed=1)
+        data = {"answers": [
+            {"question": q.id, "answer": make_answer(q, rng)} for q in get_survey_plan(batch_survey.id).questions
+        ]}
+        with self.assertQueryBudget(BatchAnswerApiView):
+            response = self.client.post(f'/api/survey/{batch_survey.id}/answer/batch', data=data, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_small_survey_budget(self):
+        self.check_budgets(10)
+
+    def test_large_survey_budget(self):
+        self.check_budgets(100)
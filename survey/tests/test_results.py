@@ -0,0 +1,116 @@
+import importlib
+import random
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+
+from survey.cache import get_survey_plan
+from survey.models import AnswerTally
+from survey.testing import make_survey, make_answer, RespondentWalk
+from survey.views.results import ResultsApiView
+
+
+class TestResults(APITestCase):
+    def setUp(self):
+        self.survey = make_survey(questions=12, options=3, conditional=0.5, conditions=2)
+        self.plan = get_survey_plan(self.survey.id)
+        self.admin = User.objects.create_superuser(username="admin")
+
+    def respond(self, user, seed, edit_at=None):
+        # answer the survey to the end, going back to change an earlier answer after edit_at answers
+        self.client.force_authenticate(user)
+        RespondentWalk(self.client, self.survey.id).walk(self.plan, random.Random(seed), edit_at=edit_at)
+
+    def results(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(f'/api/survey/{self.survey.id}/results')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def tallies(self):
+        return sorted(AnswerTally.objects.exclude(count=0).values_list("question_id", "key", "count"))
+
+    def test_tallies_match_rebuild(self):
+        for i in range(6):
+            self.respond(User.objects.create_user(username=f"u{i}"), seed=i, edit_at=4)
+        batch_user = User.objects.create_user(username="batch")
+        self.client.force_authenticate(batch_user)
+        rng = random.Random(100)
+        self.client.post(f'/api/survey/{self.survey.id}/answer/batch', data={"answers": [
+            {"question": q.id, "answer": make_answer(q, rng)} for q in self.plan.questions[:3]]}, format="json")
+        self.client.post(f'/api/survey/{self.survey.id}/answer/batch', data={"answers": [
+            {"question": q.id, "answer": make_answer(q, rng)} for q in self.plan.questions[:2]]}, format="json")
+
+        incremental = self.tallies()
+        self.assertTrue(incremental)
+        call_command("rebuild_tallies", self.survey.id, stdout=StringIO())
+        self.assertEqual(self.tallies(), incremental)
+
+    def test_results(self):
+        for i in range(5):
+            self.respond(User.objects.create_user(username=f"u{i}"), seed=i)
+        self.client.force_authenticate(User.objects.create_user(username="respondent"))
+        self.assertEqual(self.client.get(f'/api/survey/{self.survey.id}/results').status_code, 403)
+
+        with self.assertNumQueries(1):
+            results = self.results()
+        self.assertEqual([result["question"] for result in results], [q.id for q in self.plan.questions])
+        first = results[0]
+        self.assertEqual(first["answers"], 5)
+        self.assertEqual(sum(option["count"] for option in first["options"]), 5)
+        self.assertEqual([option["id"] for option in first["options"]], [o.id for o in self.plan.questions[0].options])
+        numerical = next(result for result in results if result["question_type"] == "numerical")
+        self.assertEqual(sum(bucket["count"] for bucket in numerical["buckets"]), numerical["answers"])
+        for bucket in numerical["buckets"]:
+            self.assertEqual(bucket["upper"] - bucket["lower"], 10)
+
+        # rebuild recover tallies
+        AnswerTally.objects.all().delete()
+        self.assertEqual(self.results()[0]["answers"], 0)
+        call_command("rebuild_tallies", stdout=StringIO())
+        self.assertEqual(self.results(), results)
+
+    def test_migration_seeds_tallies(self):
+        # answers saved before the tally table are counted when it is created
+        for i in range(3):
+            self.respond(User.objects.create_user(username=f"u{i}"), seed=i, edit_at=3)
+        incremental = self.tallies()
+        AnswerTally.objects.all().delete()
+        importlib.import_module("survey.migrations.0006_answer_tally").create_tallies(apps, None)
+        self.assertEqual(self.tallies(), incremental)
+
+    def test_large_numbers(self):
+        question = next(q for q in self.plan.questions if q.question_type == "numerical")
+        data = {"answers": [
+            {"question": q.id, "answer": make_answer(q, random.Random(0))}
+            for q in self.plan.questions if q.priority < question.priority
+        ]}
+        for i, number in enumerate(["1e300", "-1e300", "5e7", "15"]):
+            self.client.force_authenticate(User.objects.create_user(username=f"u{i}"))
+            answers = data["answers"] + [{"question": question.id, "answer": number}]
+            response = self.client.post(
+                f'/api/survey/{self.survey.id}/answer/batch', data={"answers": answers}, format="json")
+            self.assertEqual(response.status_code, 200)
+        keys = AnswerTally.objects.filter(question_id=question.id).values_list("key", flat=True)
+        self.assertTrue(all(len(key) <= AnswerTally._meta.get_field("key").max_length for key in keys))
+
+        # answers beyond the last bucket are counted in it
+        buckets = next(result for result in self.results() if result["question"] == question.id)["buckets"]
+        self.assertEqual(buckets, [
+            {"lower": None, "upper": -9999990.0, "count": 1},
+            {"lower": 10.0, "upper": 20.0, "count": 1},
+            {"lower": 10000000.0, "upper": None, "count": 2},
+        ])
+        AnswerTally.objects.all().delete()
+        call_command("rebuild_tallies", self.survey.id, stdout=StringIO())
+        self.assertEqual(next(result for result in self.results() if result["question"] == question.id)["buckets"], buckets)
+
+    def test_query_budget(self):
+        self.client.force_authenticate(self.admin)
+        cache.clear()
+        with self.assertNumQueries(ResultsApiView.query_budget):
+            self.client.get(f'/api/survey/{self.survey.id}/results')
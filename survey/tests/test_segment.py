@@ -0,0 +1,168 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from survey.models import Survey, Question, Option, Condition, Operatior, Answer
+from survey.cache import get_survey_plan
+from survey.snapshot import AnswerSnapshot
+
+
+class TestSegment(APITestCase):
+    def setUp(self):
+        self.survey = Survey.objects.create(title="s1")
+        self.question1 = Question.objects.create(
+            title="q1", survey=self.survey, question_type=Question.QuestionType.option, priority=1)
+        self.option1 = Option.objects.create(title="o1", question=self.question1, priority=1)
+        self.option2 = Option.objects.create(title="o2", question=self.question1, priority=2)
+        self.question2 = Question.objects.create(
+            title="q2", survey=self.survey, question_type=Question.QuestionType.numerical, priority=2)
+        self.question3 = Question.objects.create(
+            title="q3", survey=self.survey, question_type=Question.QuestionType.text, priority=3)
+        self.targets = []
+        for priority, operator in enumerate(Operatior.OperatorType.values, start=4):
+            target = Question.objects.create(
+                title=f"q{priority}", survey=self.survey, question_type=Question.QuestionType.text, priority=priority)
+            c1 = Condition.objects.create(
+                survey=self.survey,
+                source_question=self.question1,
+                target_question=target,
+                condition=Condition.ConditionType.option_equal,
+                value=str(self.option1.id)
+            )
+            c2 = Condition.objects.create(
+                survey=self.survey,
+                source_question=self.question2,
+                target_question=target,
+                condition=Condition.ConditionType.number_gte,
+                value="10"
+            )
+            Operatior.objects.create(
+                first_condition=c1, second_condition=c2, operator=operator, priority=1, survey=self.survey)
+            self.targets.append(target)
+        # (q1 == o2 or q3 start with ab) and q2 < 10
+        self.tree_target = Question.objects.create(
+            title="q20", survey=self.survey, question_type=Question.QuestionType.text, priority=20)
+        tree_conditions = [
+            Condition.objects.create(
+                survey=self.survey,
+                source_question=source_question,
+                target_question=self.tree_target,
+                condition=condition,
+                value=value
+            )
+            for source_question, condition, value in [
+                (self.question1, Condition.ConditionType.option_equal, str(self.option2.id)),
+                (self.question3, Condition.ConditionType.text_start, "ab"),
+                (self.question2, Condition.ConditionType.number_lt, "10"),
+            ]
+        ]
+        Operatior.objects.create(first_condition=tree_conditions[0], second_condition=tree_conditions[1],
+                                 operator=Operatior.OperatorType.or_operator, priority=1, survey=self.survey)
+        Operatior.objects.create(first_condition=tree_conditions[1], second_condition=tree_conditions[2],
+                                 operator=Operatior.OperatorType.and_operator, priority=2, survey=self.survey)
+        self.text_targets = []
+        for priority, condition in enumerate(
+                [c for c in Condition.ConditionType.values if c.startswith("text_")], start=10):
+            target = Question.objects.create(
+                title=f"q{priority}", survey=self.survey, question_type=Question.QuestionType.text, priority=priority)
+            Condition.objects.create(
+                survey=self.survey,
+                source_question=self.question3,
+                target_question=target,
+                condition=condition,
+                value="ab"
+            )
+            self.text_targets.append(target)
+        self.survey.status = Survey.StatusType.publish
+        self.survey.save()
+
+        answers = [
+            (self.option1, "5", "abc"),
+            (self.option1, "10", "cab"),
+            (self.option2, "15", "xabx"),
+            (self.option2, "3", "zzz"),
+            (self.option1, None, None),
+        ]
+        for i, (option, number, text) in enumerate(answers):
+            user = User.objects.create_user(username=f"u{i}")
+            Answer.objects.create(user=user, question=self.question1, option=option)
+            if number is not None:
+                Answer.objects.create(user=user, question=self.question2, text=number, number=float(number))
+            if text is not None:
+                Answer.objects.create(user=user, question=self.question3, text=text)
+        User.objects.create_user(username="not respondent")
+
+    def test_segment_same_as_python_evaluation(self):
+        # text conditions are case-sensitive in sql too
+        for username, text in [("upper", "ABC"), ("mixed", "xAbAB")]:
+            user = User.objects.create_user(username=username)
+            Answer.objects.create(user=user, question=self.question1, option=self.option2)
+            Answer.objects.create(user=user, question=self.question3, text=text)
+        # option values that are not the string of an option id never match it
+        padded_targets = []
+        for priority, (condition, value) in enumerate([
+                (Condition.ConditionType.option_equal, f"0{self.option1.id}"),
+                (Condition.ConditionType.option_not_equal, f"0{self.option1.id}"),
+                (Condition.ConditionType.option_equal, f" {self.option1.id}")], start=30):
+            target = Question.objects.create(
+                title=f"q{priority}", survey=self.survey, question_type=Question.QuestionType.text, priority=priority)
+            Condition.objects.create(
+                survey=self.survey, source_question=self.question1, target_question=target, condition=condition,
+                value=value)
+            padded_targets.append(target)
+        plan = get_survey_plan(self.survey.id)
+        users = User.objects.exclude(username="not respondent")
+        for question in [self.question1, self.tree_target] + self.targets + self.text_targets + padded_targets:
+            expected = {
+                user.id for user in users
+                if plan.is_visible(question.id, AnswerSnapshot.load(user, self.survey.id).typed_value)
+            }
+            # conditions that match nobody are not sent to the database
+            with CaptureQueriesContext(connection) as context:
+                segment = set(plan.segment(question.id).values_list("id", flat=True))
+            self.assertLessEqual(len(context), 1)
+            self.assertEqual(segment, expected, question.title)
+
+    def test_segment_api(self):
+        # respondents of a segment are only listed to admins
+        response = self.client.get(f'/api/survey/{self.survey.id}/segment/{self.question1.id}')
+        self.assertEqual(response.status_code, 403)
+        self.client.force_authenticate(User.objects.get(username="u0"))
+        response = self.client.get(f'/api/survey/{self.survey.id}/segment/{self.question1.id}')
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_authenticate(User.objects.create_superuser(username="admin"))
+        response = self.client.get(f'/api/survey/{self.survey.id}/segment/999')
+        self.assertEqual(response.status_code, 404)
+        draft_survey = Survey.objects.create(title="draft")
+        response = self.client.get(f'/api/survey/{draft_survey.id}/segment/{self.question1.id}')
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(f'/api/survey/{self.survey.id}/segment/{self.question1.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 5)
+        response = self.client.get(f'/api/survey/{self.survey.id}/segment/{self.targets[0].id}?limit=1')
+        self.assertEqual(response.status_code, 200)
+        response_data = response.json()
+        self.assertEqual(response_data["count"], 1)
+        self.assertEqual(response_data["results"][0]["username"], "u1")
+
+    def test_backfill_answer_values(self):
+        Answer.objects.filter(question=self.question2).update(number=None)
+        Answer.objects.create(user=User.objects.get(username="u4"), question=self.question2, text="x")
+        plan = get_survey_plan(self.survey.id)
+        self.assertFalse(plan.segment(self.targets[0].id).exists())
+
+        out = StringIO()
+        call_command("backfill_answer_values", "--batch-size", "2", stdout=out)
+        self.assertIn("4 answers filled", out.getvalue())
+        self.assertIn("1 answers are not a finite number", out.getvalue())
+        self.assertEqual(
+            list(Answer.objects.filter(question=self.question2).order_by("id").values_list("number", flat=True)),
+            [5.0, 10.0, 15.0, 3.0, None],
+        )
+        self.assertEqual(list(plan.segment(self.targets[0].id).values_list("username", flat=True)), ["u1"])
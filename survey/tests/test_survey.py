@@ -1,6 +1,8 @@
+from django.core.cache import cache
 from rest_framework.test import APITestCase
 
 from survey.models import Survey, Question, Option, Condition, Operatior
+from survey.testing import make_survey
 from survey.translation import Translation
 
 class TestSurveyCRUD(APITestCase):
@@ -281,4 +283,143 @@ class TestPublishSurvey(APITestCase):
         )
         response = self.client.get(f'/api/survey/{survey_ok.id}/publish')
         self.assertEqual(response.status_code, 200)
-    
\ No newline at end of file
+    
+
+class TestSurveyAnalysis(APITestCase):
+
+    def test_publish_analysis(self):
+        survey = Survey.objects.create(title="analysis survey")
+        q1 = Question.objects.create(
+            title="q1", survey=survey, question_type=Question.QuestionType.option, required=True, priority=1)
+        o1 = Option.objects.create(title="o1", question=q1, priority=1)
+        o2 = Option.objects.create(title="o2", question=q1, priority=2)
+        q2 = Question.objects.create(title="q2", survey=survey, question_type=Question.QuestionType.text, priority=2)
+        q3 = Question.objects.create(title="q3", survey=survey, question_type=Question.QuestionType.numerical, priority=3)
+        q4 = Question.objects.create(title="q4", survey=survey, question_type=Question.QuestionType.text, priority=4)
+        q5 = Question.objects.create(title="q5", survey=survey, question_type=Question.QuestionType.text, priority=5)
+        q6 = Question.objects.create(title="q6", survey=survey, question_type=Question.QuestionType.text, priority=6)
+        Condition.objects.create(survey=survey, source_question=q1, target_question=q2,
+                                 condition=Condition.ConditionType.option_equal, value=str(o1.id))
+        # q3 needs both options of q1, so no respondent see it, nor q5 that depends on q3
+        c1 = Condition.objects.create(survey=survey, source_question=q1, target_question=q3,
+                                      condition=Condition.ConditionType.option_equal, value=str(o1.id))
+        c2 = Condition.objects.create(survey=survey, source_question=q1, target_question=q3,
+                                      condition=Condition.ConditionType.option_equal, value=str(o2.id))
+        Operatior.objects.create(first_condition=c1, second_condition=c2, operator=Operatior.OperatorType.and_operator,
+                                 priority=1, survey=survey)
+        Condition.objects.create(survey=survey, source_question=q2, target_question=q4,
+                                 condition=Condition.ConditionType.text_contain, value="x")
+        Condition.objects.create(survey=survey, source_question=q3, target_question=q5,
+                                 condition=Condition.ConditionType.number_gt, value="5")
+
+        self.assertIsNone(self.client.get(f'/api/survey/{survey.id}/').json()["analysis"])
+        response = self.client.get(f'/api/survey/{survey.id}/publish')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f'/api/survey/{survey.id}/').json()["analysis"], {
+            "unreachable_questions": [q3.id, q5.id],
+            "min_path_length": 2,
+            "max_path_length": 4,
+            "unlocks": {str(q1.id): [q2.id], str(q2.id): [q4.id]},
+            "option_unlocks": {str(o1.id): [q2.id]},
+        })
+
+        # analysis of a synthetic survey is consistent with its size
+        survey = make_survey(questions=60, options=3, conditional=0.5, conditions=2)
+        analysis = Survey.objects.get(id=survey.id).analysis
+        self.assertLessEqual(analysis["min_path_length"], analysis["max_path_length"])
+        self.assertEqual(analysis["max_path_length"], 60 - len(analysis["unreachable_questions"]))
+
+
+class TestValidateSurvey(APITestCase):
+
+    def test_validate_survey(self):
+        response = self.client.get('/api/survey/999/validate')
+        self.assertEqual(response.status_code, 404)
+
+        survey = Survey.objects.create(title="invalid survey")
+        q1 = Question.objects.create(title="q1", survey=survey, question_type=Question.QuestionType.option, priority=1)
+        q2 = Question.objects.create(title="q2", survey=survey, question_type=Question.QuestionType.text, priority=1)
+        q3 = Question.objects.create(title="q3", survey=survey, question_type=Question.QuestionType.text, priority=3)
+        c1 = Condition.objects.create(
+            survey=survey,
+            source_question=q3,
+            target_question=q2,
+            condition=Condition.ConditionType.text_contain,
+            value="asd"
+        )
+        c2 = Condition.objects.create(
+            survey=survey,
+            source_question=q2,
+            target_question=q3,
+            condition=Condition.ConditionType.text_contain,
+            value="asd"
+        )
+        c3 = Condition.objects.create(
+            survey=survey,
+            source_question=q2,
+            target_question=q3,
+            condition=Condition.ConditionType.text_contain,
+            value="asd"
+        )
+        response = self.client.get(f'/api/survey/{survey.id}/validate')
+        self.assertEqual(response.status_code, 200)
+        response_data = response.json()
+        self.assertFalse(response_data["valid"])
+        self.assertEqual(
+            [(v["message"], v["question"], v["condition"]) for v in response_data["violations"]],
+            [
+                (Translation.unique_question_priorities, q1.id, None),
+                (Translation.unique_question_priorities, q2.id, None),
+                (Translation.question_minimum_option, q1.id, None),
+                (Translation.condition_question_priorities, q2.id, c1.id),
+                (Translation.operation_between_condition, q3.id, c2.id),
+                (Translation.operation_between_condition, q3.id, c3.id),
+            ]
+        )
+        # publish respond with the first violation
+        response = self.client.get(f'/api/survey/{survey.id}/publish')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), Translation.unique_question_priorities)
+
+        survey = make_survey(questions=10, publish=False)
+        response = self.client.get(f'/api/survey/{survey.id}/validate')
+        self.assertEqual(response.json(), {"valid": True, "violations": []})
+
+    def test_publish_query_count(self):
+        for questions in [10, 100]:
+            survey = make_survey(questions=questions, conditions=3, publish=False)
+            # load survey, load questions, options, conditions and operators, save survey and bump its version,
+            # and the new stamp, only published to the cache on commit of the test transaction
+            with self.assertNumQueries(9):
+                response = self.client.get(f'/api/survey/{survey.id}/publish')
+            self.assertEqual(response.status_code, 200)
+
+
+class TestSurveyDefinition(APITestCase):
+
+    def test_survey_definition(self):
+        response = self.client.get('/api/survey/999/definition')
+        self.assertEqual(response.status_code, 404)
+
+        for questions in [10, 100]:
+            survey = make_survey(questions=questions, options=3, conditions=2)
+            # load survey, questions, options, conditions and operators
+            cache.clear()
+            with self.assertNumQueries(5):
+                response = self.client.get(f'/api/survey/{survey.id}/definition')
+            # then only the survey, definition is cached for its version
+            with self.assertNumQueries(1):
+                self.client.get(f'/api/survey/{survey.id}/definition')
+            self.assertEqual(response.status_code, 200)
+            response_data = response.json()
+            self.assertEqual(response_data["survey"]["id"], survey.id)
+            self.assertEqual(len(response_data["questions"]), questions)
+            self.assertEqual(
+                [q["priority"] for q in response_data["questions"]], sorted(q["priority"] for q in response_data["questions"]))
+            for question in response_data["questions"]:
+                if question["question_type"] == Question.QuestionType.option:
+                    self.assertEqual(len(question["options"]), 3)
+                else:
+                    self.assertIsNone(question["options"])
+            self.assertEqual(len(response_data["conditions"]), Condition.objects.filter(survey=survey).count())
+            self.assertEqual(len(response_data["operators"]), Operatior.objects.filter(survey=survey).count())
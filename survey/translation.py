@@ -26,3 +26,6 @@ class Translation:
     firsy_question = _("this is first question")
     invalid_source_or_target_survey = _("source or target question not in your survey")
     invalid_condition = _("invalid condition")
+    duplicate_id = _("id is used by more than one row of this type")
+    invalid_condition_id = _("invalid condition id")
+    survey_not_finished = _("answers do not finish the survey")
@@ -1,10 +1,25 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from survey.views.survey import SurveyViewSet, PublishSurveyApiView
+from survey.views.survey import (
+    SurveyViewSet,
+    PublishSurveyApiView,
+    ValidateSurveyApiView,
+    SurveyDefinitionApiView,
+    ImportSurveyApiView,
+)
 from survey.views.question import QuestionViewSet, OptionViewSet, FirstQuestionApiView
 from survey.views.conditions import ConditionViewSet, OperatiorViewSet
-from survey.views.answer import NextAnswerApiView, PreviousAnswerApiView
+from survey.views.answer import NextAnswerApiView, PreviousAnswerApiView, BatchAnswerApiView, ResumeAnswerApiView
+from survey.views.async_answer import (
+    AsyncFirstQuestionApiView,
+    AsyncNextAnswerApiView,
+    AsyncPreviousAnswerApiView,
+)
+from survey.views.segment import SegmentApiView
+from survey.views.export import ExportAnswersApiView
+from survey.views.results import ResultsApiView
+from survey.views.bundle import SurveyBundleApiView, UploadBundleAnswersApiView
 
 
 router = DefaultRouter()
@@ -15,9 +30,26 @@ router.register(r'(?P<survey_id>\d+)/condition/operator', OperatiorViewSet, base
 router.register(r'(?P<survey_id>\d+)/condition', ConditionViewSet, basename="condition")
 
 urlpatterns = [
+    path('import', ImportSurveyApiView.as_view(), name='import_survey'),
     path('<int:survey_id>/question/first_question', FirstQuestionApiView.as_view(), name="first_question"),
     path('<int:survey_id>/publish', PublishSurveyApiView.as_view(), name='publish_survey'),
+    path('<int:survey_id>/validate', ValidateSurveyApiView.as_view(), name='validate_survey'),
+    path('<int:survey_id>/definition', SurveyDefinitionApiView.as_view(), name='survey_definition'),
     path('<int:survey_id>/answer/next/<int:question_id>', NextAnswerApiView.as_view(), name='next_answer'),
     path('<int:survey_id>/answer/previous/<int:question_id>', PreviousAnswerApiView.as_view(), name='previous_answer'),
+    path('<int:survey_id>/answer/batch', BatchAnswerApiView.as_view(), name='batch_answer'),
+    path('<int:survey_id>/answer/resume', ResumeAnswerApiView.as_view(), name='resume_answer'),
+    path('<int:survey_id>/segment/<int:question_id>', SegmentApiView.as_view(), name='segment'),
+    path('<int:survey_id>/results', ResultsApiView.as_view(), name='survey_results'),
+    path('<int:survey_id>/export/<str:output_format>', ExportAnswersApiView.as_view(), name='export_answers'),
+    path('<int:survey_id>/bundle', SurveyBundleApiView.as_view(), name='survey_bundle'),
+    path('<int:survey_id>/bundle/answers', UploadBundleAnswersApiView.as_view(), name='upload_bundle_answers'),
+    # async respondent views, for ASGI deployments
+    path('<int:survey_id>/async/question/first_question', AsyncFirstQuestionApiView.as_view(),
+         name="async_first_question"),
+    path('<int:survey_id>/async/answer/next/<int:question_id>', AsyncNextAnswerApiView.as_view(),
+         name='async_next_answer'),
+    path('<int:survey_id>/async/answer/previous/<int:question_id>', AsyncPreviousAnswerApiView.as_view(),
+         name='async_previous_answer'),
 ]
 urlpatterns += router.urls
@@ -0,0 +1,135 @@
+from collections import Counter
+from typing import NamedTuple
+
+from survey.models import Question, Condition
+from survey.translation import Translation
+
+
+class Violation(NamedTuple):
+    message: str
+    question: int = None
+    condition: int = None
+    operator: int = None
+
+
+def condition_violation(condition, value, source_question, target_question, option_exists):
+    """
+    Message of the first rule a condition breaks, or None. Questions are the source and
+    target of the condition, option_exists(value) tells if the value is an option id of
+    the source question.
+    """
+    # source question priority < target question priority
+    #    => can not create condition by itself or future question
+    if source_question.priority >= target_question.priority:
+        return Translation.invalid_target_question_priority
+
+    # check source question type with condition field
+    if condition in [
+        Condition.ConditionType.option_equal,
+        Condition.ConditionType.option_not_equal
+    ] and source_question.question_type == Question.QuestionType.option:
+        if not value.isdigit() or not option_exists(value):
+            return Translation.invalid_option_id
+
+    elif condition in [
+        Condition.ConditionType.number_lt,
+        Condition.ConditionType.number_lte,
+        Condition.ConditionType.number_gt,
+        Condition.ConditionType.number_gte
+    ] and source_question.question_type == Question.QuestionType.numerical:
+        if not value.isdigit():
+            return Translation.invalid_numerical_condition_value
+
+    elif condition in [
+        Condition.ConditionType.text_contain,
+        Condition.ConditionType.text_not_contain,
+        Condition.ConditionType.text_start,
+        Condition.ConditionType.text_not_start,
+        Condition.ConditionType.text_end,
+        Condition.ConditionType.text_not_end,
+    ]:
+        if source_question.question_type != Question.QuestionType.text:
+            return Translation.condition_only_text_quextion
+    else:
+        return Translation.invalid_condition
+    return None
+
+
+def operator_violation(first_condition, second_condition):
+    # message of the first rule an operator between two conditions breaks, or None
+    if first_condition == second_condition:
+        return Translation.change_first_second_condition
+    if first_condition.target_question_id != second_condition.target_question_id:
+        return Translation.condition_in_one_survey
+    return None
+
+
+def validate_definition(definition):
+    """
+    Check a SurveyDefinition can be published, in memory and in one pass over its rows.
+    Return every violation, ordered like the checks of publish, so the first one is the
+    message publish responds with.
+    """
+    if not definition.questions:
+        return [Violation(Translation.survey_dont_have_question)]
+
+    violations = []
+    questions = {question.id: question for question in definition.questions}
+
+    # check all question have unique priorities
+    priorities = Counter(question.priority for question in definition.questions)
+    for question in definition.questions:
+        if priorities[question.priority] > 1:
+            violations.append(Violation(Translation.unique_question_priorities, question=question.id))
+
+    # check all question with type option, have minimum 2 option
+    option_counts = Counter(option.question_id for option in definition.options)
+    for question in definition.questions:
+        if question.question_type == Question.QuestionType.option and option_counts[question.id] <= 1:
+            violations.append(Violation(Translation.question_minimum_option, question=question.id))
+
+    # double check source question priority < target question priority (maybe question updated later)
+    target_conditions = {}
+    for condition in definition.conditions:
+        source_question = questions.get(condition.source_question_id)
+        target_question = questions.get(condition.target_question_id)
+        if source_question is None or target_question is None:
+            violations.append(Violation(Translation.invalid_source_or_target_survey, condition=condition.id))
+            continue
+        if source_question.priority >= target_question.priority:
+            violations.append(Violation(
+                Translation.condition_question_priorities, question=target_question.id, condition=condition.id))
+        target_conditions.setdefault(condition.target_question_id, []).append(condition)
+
+    # operation validation
+    condition_targets = {condition.id: condition.target_question_id for condition in definition.conditions}
+    target_operators = {}
+    for operator in definition.operators:
+        targets = {condition_targets.get(operator.first_condition_id), condition_targets.get(operator.second_condition_id)}
+        for target_question_id in targets:
+            target_operators.setdefault(target_question_id, []).append(operator)
+
+    for target_question_id, conditions in target_conditions.items():
+        # one condition dont need operation
+        if len(conditions) <= 1:
+            continue
+        operators = target_operators.get(target_question_id, [])
+
+        # check operations have unique priorities
+        operator_priorities = Counter(operator.priority for operator in operators)
+        for operator in operators:
+            if operator_priorities[operator.priority] > 1:
+                violations.append(Violation(
+                    Translation.operation_priorities, question=target_question_id, operator=operator.id))
+
+        # check operation between all condition in any question
+        used_condition_ids = set()
+        for operator in operators:
+            used_condition_ids.add(operator.first_condition_id)
+            used_condition_ids.add(operator.second_condition_id)
+        for condition in conditions:
+            if condition.id not in used_condition_ids:
+                violations.append(Violation(
+                    Translation.operation_between_condition, question=target_question_id, condition=condition.id))
+
+    return violations
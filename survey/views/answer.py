@@ -1,220 +1,320 @@
+import functools
+import inspect
+
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from django.http import HttpResponseBadRequest
-from django.db.models import Q
+from django.http import HttpResponseBadRequest, Http404
+from django.db import transaction, IntegrityError
 from drf_spectacular.utils import extend_schema
 
-from survey.models import Survey, Question, Answer, Condition, Option, UserAnsweredToSurvey, Operatior
-from survey.serializers.answer import NextAnswerRequestSerializer, NextPreviousAnswerResponseSerializer
+from survey.models import Question, Answer, UserAnsweredToSurvey, SurveyProgress
+from survey import engine
+from survey.cache import get_survey_plan
+from survey.routing import parse_number
+from survey.snapshot import AnswerSnapshot
+from survey.prefetch import prefetch_hints
+from survey.tally import TallyChanges
+from survey.serializers.answer import (
+    NextAnswerRequestSerializer,
+    NextPreviousAnswerResponseSerializer,
+    BatchAnswerRequestSerializer,
+    BatchAnswerErrorSerializer,
+)
 from survey.translation import Translation
 
 
+def retry_conflict(post):
+    """
+    Run an answer write once more when a unique constraint rejects it: a request of the same
+    user, like a double tap or a retry, wrote the answer or the progress after this one loaded
+    its snapshot. The second run loads them and routes the answer as an edit.
+    """
+    if inspect.iscoroutinefunction(post):
+        async def wrapper(self, request, *args, **kwargs):
+            try:
+                return await post(self, request, *args, **kwargs)
+            except IntegrityError:
+                return await post(self, request, *args, **kwargs)
+    else:
+        def wrapper(self, request, *args, **kwargs):
+            try:
+                return post(self, request, *args, **kwargs)
+            except IntegrityError:
+                return post(self, request, *args, **kwargs)
+    return functools.wraps(post)(wrapper)
+
+
 class AnswerBussinesLogic:
+    # writes of answers, routing and checks of answers are in survey.engine
 
     @staticmethod
-    def check_last_required_questions(answers, questions, target_question, survey_conditions):
-        answer_ids = answers.values_list('question')
-        answer_ids = [i[0] for i in answer_ids]
-        # find required question without answer that priority less than target question priority
-        required_question_without_answer = questions.filter(
-            priority__lt=target_question.priority, required=True).exclude(id__in=answer_ids)
-        for rqwa in required_question_without_answer:
-            conditions = survey_conditions.filter(target_question=rqwa)
-            if conditions.exists():
-                if AnswerBussinesLogic.check_condition(conditions, answers):
-                    return True, Translation.answer_required_question
-            else:
-                return True, Translation.answer_required_question
-        return False, None
-    
+    def invalidated_answers(value, old_answer, plan, target_question, answers):
+        # answers whose visibility changes when the user edits an answer, value is checked with validate_answer
+        if value and old_answer:
+            edited = Answer(question_id=target_question.id)
+            AnswerBussinesLogic.fill_answer(edited, value, target_question)
+            edited_answers = AnswerSnapshot(answers)
+            edited_answers.add(edited)
+            question_ids = plan.invalidated_questions(
+                target_question.id, answers.typed_value, edited_answers.typed_value)
+            if question_ids:
+                deleted = [answers.get(question_id) for question_id in question_ids]
+                answers.discard(question_ids)
+                return deleted
+        return []
+
     @staticmethod
-    def check_condition(condition_objects, answers):
-        conditions_result = {}
-        for co in condition_objects:
-            question = co.source_question
-            try:
-                user_answer = answers.get(question=question)
-            except Answer.DoesNotExist():
-                return False
-            condition = co.condition
-            value = co.value
-
-            if condition == Condition.ConditionType.option_equal:
-                conditions_result[co] = value == str(user_answer.option_id)
-            elif condition == Condition.ConditionType.option_not_equal:
-                conditions_result[co] = value != str(user_answer.option_id)
-            elif condition == Condition.ConditionType.number_lt:
-                conditions_result[co] = int(value) > int(user_answer.text)
-            elif condition == Condition.ConditionType.number_lte:
-                conditions_result[co] = int(value) >= int(user_answer.text)
-            elif condition == Condition.ConditionType.number_gt:
-                conditions_result[co] = int(value) < int(user_answer.text)
-            elif condition == Condition.ConditionType.number_gte:
-                conditions_result[co] = int(value) <= int(user_answer.text)
-            elif condition == Condition.ConditionType.text_contain:
-                conditions_result[co] = value in user_answer.text
-            elif condition == Condition.ConditionType.text_not_contain:
-                conditions_result[co] = value not in user_answer.text
-            elif condition == Condition.ConditionType.text_start:
-                conditions_result[co] = user_answer.text.startswith(value)
-            elif condition == Condition.ConditionType.text_not_start:
-                conditions_result[co] = not user_answer.text.startswith(value)
-            elif condition == Condition.ConditionType.text_end:
-                conditions_result[co] = user_answer.text.endswith(value)
-            elif condition == Condition.ConditionType.text_not_end:
-                conditions_result[co] = not user_answer.text.endswith(value)
-
-        if len(conditions_result.keys()) == 0:
-            return True
-        if len(conditions_result.keys()) == 1:
-            return conditions_result[co]
-        
-        operators = Operatior.objects.filter(
-            Q(first_condition__in=condition_objects) | Q(second_condition__in=condition_objects)).order_by("priority")
-        for operator in operators:
-            if operator.operator == Operatior.OperatorType.and_operator:
-                return conditions_result[operator.first_condition] and conditions_result[operator.second_condition]
-            elif operator.operator == Operatior.OperatorType.or_operator:
-                return conditions_result[operator.first_condition] or conditions_result[operator.second_condition]
-            elif operator.operator == Operatior.OperatorType.xor_operator:
-                return conditions_result[operator.first_condition] ^ conditions_result[operator.second_condition]
+    def check_user_answered_before(value, old_answer, plan, target_question, answers, tally):
+        deleted = AnswerBussinesLogic.invalidated_answers(value, old_answer, plan, target_question, answers)
+        if deleted:
+            Answer.objects.filter(id__in=[a.id for a in deleted]).delete()
+            for answer in deleted:
+                tally.remove(answer)
 
     @staticmethod
-    def check_user_answered_before(user_answer, old_answer, target_question, answers):
-        if user_answer and old_answer:
-            after_answer = answers.filter(question__priority__gt=target_question.priority).order_by(
-                "question__priority").values_list("question_id") #  check order *************************************
-            if after_answer.exists():  # survey have answer with greater priority
-                old_answer_value = old_answer.text if old_answer.text else old_answer.option
-                if str(old_answer_value) != user_answer["answer"]:  # check answer edited
-                    after_answer = [i[0] for i in after_answer]
-                    conditions = Condition.objects.filter(source_question=after_answer)
-                    # check condition have a question condition with source question that have answer
-                    if conditions.exists():
-                        answers.filter(question__priority__gte=conditions.first().question.priority).delete()
+    def fill_answer(answer, user_answer, target_question):
+        if target_question.question_type == Question.QuestionType.numerical:
+            answer.text = user_answer
+            answer.number = parse_number(user_answer)
+        elif target_question.question_type == Question.QuestionType.text:
+            answer.text = user_answer
+        else:
+            answer.option_id = user_answer.id
 
     @staticmethod
-    def save_answer(user_answer, old_answer, target_question, user):
+    def save_answer(user_answer, old_answer, target_question, user, answers, tally):
+        # save an answer already checked with validate_answer, tallies are counted in the same transaction
         if user_answer:
-            # validate answer with question type
-            if target_question.question_type == Question.QuestionType.numerical:
-                try:
-                    float(user_answer)
-                except ValueError:
-                    return True, Translation.invalid_answer
-            elif target_question.question_type == Question.QuestionType.option:
-                try:
-                    user_answer = Option.objects.get(id=user_answer, question=target_question)
-                except Option.DoesNotExist:
-                    return True, Translation.invalid_answer
-                except ValueError:
-                    return True, Translation.invalid_answer
-                
             # check create or update answer
             if old_answer:
-                if target_question.question_type in [Question.QuestionType.numerical, Question.QuestionType.text]:
-                    old_answer.text = user_answer
-                else:
-                    old_answer.option = user_answer
-                old_answer.save()
-            else:
-                if target_question.question_type in [Question.QuestionType.numerical, Question.QuestionType.text]:
-                    Answer.objects.create(user=user, question=target_question, text=user_answer)
-                else:
-                    Answer.objects.create(user=user, question=target_question, option=user_answer)
-        else:
-            # check user can not skip required question without answer
-            if not old_answer and target_question.required:
-                return True, Translation.this_question_required
-        
-        return False, None
-    
+                tally.remove(old_answer)
+            answer = old_answer or Answer(user=user, question_id=target_question.id)
+            AnswerBussinesLogic.fill_answer(answer, user_answer, target_question)
+            answer.save()
+            answers.add(answer)
+            tally.add(answer)
+
+    @staticmethod
+    def save_progress(progress, user, survey_id, answers, next_question):
+        # must run in the transaction that wrote the answers
+        progress = progress or SurveyProgress(user=user, survey_id=survey_id)
+        progress.answered_question_ids = sorted(answers.question_ids())
+        progress.current_question_id = next_question.id if next_question else None
+        progress.completed = next_question is None
+        progress.save()
+        if progress.completed:
+            UserAnsweredToSurvey.objects.create(user=user, survey_id=survey_id)
+        return progress
+
+
+    @staticmethod
+    def write_answer(value, old_answer, progress, plan, target_question, user, answers):
+        # write a validated answer of next, with the answers it invalidates and the progress, return next question
+        tally = TallyChanges()
+        with transaction.atomic():
+            # if user answered to this question before and now send a answer
+            AnswerBussinesLogic.check_user_answered_before(value, old_answer, plan, target_question, answers, tally)
+            AnswerBussinesLogic.save_answer(value, old_answer, target_question, user, answers, tally)
+            tally.save()
+            next_question = plan.next_question(target_question.id, answers.typed_value)
+            AnswerBussinesLogic.save_progress(progress, user, plan.survey_id, answers, next_question)
+        return next_question
+
 
 class NextAnswerApiView(APIView):
     permission_classes = [IsAuthenticated]
     serializer_class = NextAnswerRequestSerializer
+    # savepoint queries of the answer transaction are counted too
+    query_budget = 11
 
     @extend_schema(
         request=NextAnswerRequestSerializer,
         responses=NextPreviousAnswerResponseSerializer
     )
+    @retry_conflict
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         user_answer = serializer.data
+        prefetch = user_answer["prefetch"]
         user_answer = user_answer.get("answer", None)
-        survey = get_object_or_404(Survey, id=self.kwargs['survey_id'], status=Survey.StatusType.publish)
-        questions = Question.objects.filter(survey=survey)
-        target_question = get_object_or_404(questions, id=self.kwargs['question_id'], survey=survey)
-        next_questions = questions.filter(priority__gt=target_question.priority).order_by("priority")
-        survey_condition = Condition.objects.filter(survey=survey)
-        current_question_conditions = survey_condition.filter(target_question=target_question)
-        answers = Answer.objects.filter(question__survey=survey, user=request.user)
-        old_answer = answers.filter(question=target_question).last()
+        plan = get_survey_plan(self.kwargs['survey_id'])
+        if plan is None:
+            raise Http404
+        target_question = plan.get_question(self.kwargs['question_id'])
+        if target_question is None:
+            raise Http404
+        answers = AnswerSnapshot.load(request.user, plan.survey_id)
+        old_answer = answers.get(target_question.id)
+        progress = SurveyProgress.objects.filter(survey_id=plan.survey_id, user=request.user).first()
 
         # check user can not change answer if before finished this survey
-        if UserAnsweredToSurvey.objects.filter(survey=survey, user=request.user).exists():
+        if progress and progress.completed:
             return HttpResponseBadRequest(Translation.you_answered_to_survey)
         
-        # check last required questions
-        error, message = AnswerBussinesLogic.check_last_required_questions(answers, questions, target_question,
-                                                                           survey_condition)
-        if error:
-            return error, message
-        
-        # Check current Condition
-        if current_question_conditions.exists():
-            if not AnswerBussinesLogic.check_condition(current_question_conditions, answers):
-                return HttpResponseBadRequest(Translation.condition_failed)
-        
-        # if user answered to this question before and now send a answer
-        AnswerBussinesLogic.check_user_answered_before(user_answer, old_answer, target_question, answers)
+        # check last required questions and current condition
+        message = engine.check_question(plan, target_question, answers.typed_value)
+        if message:
+            return HttpResponseBadRequest(message)
 
-        # check and save answer
-        error, message = AnswerBussinesLogic.save_answer(user_answer, old_answer, target_question, request.user)
-        if error:
+        message, user_answer_value = engine.parse_answer(target_question, user_answer, old_answer is not None)
+        if message:
             return HttpResponseBadRequest(message)
-        
+
+        next_question = AnswerBussinesLogic.write_answer(
+            user_answer_value, old_answer, progress, plan, target_question, request.user, answers)
+
         d = {"question": None, "answer": None, "finished": True}
-        for next_question in next_questions:
-            # Check next question conditions
-            next_question_conditions = survey_condition.filter(target_question=next_question)
-            if AnswerBussinesLogic.check_condition(next_question_conditions, answers):
-                next_answer = answers.filter(question=next_question).last()
-                if next_answer:
-                    next_answer = next_answer.text if next_answer.text else next_answer.option_id
-                d["question"] = next_question
-                d["answer"] = next_answer
-                d["finished"] = False
-                break
-        
-        if d["finished"]:
-            UserAnsweredToSurvey.objects.create(user=request.user, survey=survey)
+        if next_question:
+            d["question"] = next_question
+            d["answer"] = answers.value(next_question.id)
+            d["finished"] = False
+            if prefetch:
+                d["prefetch"] = prefetch_hints(plan, next_question, answers)
         serializer = NextPreviousAnswerResponseSerializer(d)
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
 
 class PreviousAnswerApiView(APIView):
+    query_budget = 1
+
     @extend_schema(responses=NextPreviousAnswerResponseSerializer)
     def get(self, request, *args, **kwargs):
-        survey = get_object_or_404(Survey, id=self.kwargs['survey_id'], status=Survey.StatusType.publish)
-        survey_condition = Condition.objects.filter(survey=survey)
-        questions = Question.objects.filter(survey=survey)
-        target_question = get_object_or_404(questions, id=self.kwargs['question_id'])
-        previous_questions = questions.filter(
-            survey=survey, priority__lt=target_question.priority).order_by("-priority")
-        answers = Answer.objects.filter(question__survey=survey, user=request.user)
-        
-        for previous_question in previous_questions:
-            previous_question_conditions = survey_condition.filter(target_question=previous_question)
-            if AnswerBussinesLogic.check_condition(previous_question_conditions, answers):
-                previous_answer = Answer.objects.filter(user=request.user, question=previous_question).last()
-                if previous_answer:
-                    previous_answer = previous_answer.text if previous_answer.text else previous_answer.option_id
-                d = {"question": previous_question, "answer": previous_answer}
-                serializer = NextPreviousAnswerResponseSerializer(d)
-                return Response(data=serializer.data, status=status.HTTP_200_OK)
+        plan = get_survey_plan(self.kwargs['survey_id'])
+        if plan is None:
+            raise Http404
+        target_question = plan.get_question(self.kwargs['question_id'])
+        if target_question is None:
+            raise Http404
+        answers = AnswerSnapshot.load(request.user, plan.survey_id)
+
+        previous_question = plan.previous_question(target_question.id, answers.typed_value)
+        if previous_question:
+            d = {"question": previous_question, "answer": answers.value(previous_question.id)}
+            serializer = NextPreviousAnswerResponseSerializer(d)
+            return Response(data=serializer.data, status=status.HTTP_200_OK)
         return HttpResponseBadRequest(Translation.firsy_question)
+
+
+class BatchAnswerApiView(APIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = BatchAnswerRequestSerializer
+    query_budget = 12
+    # reject answers that leave a question to answer
+    require_finished = False
+
+    @extend_schema(
+        request=BatchAnswerRequestSerializer,
+        responses={200: NextPreviousAnswerResponseSerializer, 400: BatchAnswerErrorSerializer}
+    )
+    @retry_conflict
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        plan = get_survey_plan(self.kwargs['survey_id'])
+        if plan is None:
+            raise Http404
+        answers = AnswerSnapshot.load(request.user, plan.survey_id)
+        progress = SurveyProgress.objects.filter(survey_id=plan.survey_id, user=request.user).first()
+
+        # check user can not change answer if before finished this survey
+        if progress and progress.completed:
+            return HttpResponseBadRequest(Translation.you_answered_to_survey)
+
+        # validate all answers in order against the snapshot, nothing is written until all of them are valid
+        deleted = []
+        changed = []
+        tally = TallyChanges()
+        target_question = None
+        for item in serializer.validated_data["answers"]:
+            user_answer = item.get("answer", None)
+            target_question = plan.get_question(item["question"])
+            if target_question is None:
+                return self.error_response(item["question"], Translation.invalid_question_id)
+
+            message = engine.check_question(plan, target_question, answers.typed_value)
+            if message:
+                return self.error_response(target_question.id, message)
+
+            old_answer = answers.get(target_question.id)
+            message, value = engine.parse_answer(target_question, user_answer, old_answer is not None)
+            if message:
+                return self.error_response(target_question.id, message)
+
+            invalidated = AnswerBussinesLogic.invalidated_answers(value, old_answer, plan, target_question, answers)
+            for answer in invalidated:
+                tally.remove(answer)
+            deleted += invalidated
+            if value:
+                answer = answers.get(target_question.id)
+                if answer:
+                    tally.remove(answer)
+                else:
+                    answer = Answer(user=request.user, question_id=target_question.id)
+                AnswerBussinesLogic.fill_answer(answer, value, target_question)
+                answers.add(answer)
+                tally.add(answer)
+                changed.append(answer)
+
+        # an answer changed in this batch may be invalidated by a later item
+        changed = {id(a): a for a in changed if answers.get(a.question_id) is a}.values()
+        created = [a for a in changed if a.id is None]
+        updated = [a for a in changed if a.id is not None]
+        next_question = plan.next_question(target_question.id, answers.typed_value)
+        if self.require_finished and next_question:
+            return self.error_response(next_question.id, Translation.survey_not_finished)
+        with transaction.atomic():
+            deleted_ids = [a.id for a in deleted if a.id is not None]
+            if deleted_ids:
+                Answer.objects.filter(id__in=deleted_ids).delete()
+            Answer.objects.bulk_create(created)
+            Answer.objects.bulk_update(updated, ["text", "number", "option"])
+            tally.save()
+            AnswerBussinesLogic.save_progress(progress, request.user, plan.survey_id, answers, next_question)
+
+        d = {"question": next_question, "answer": None, "finished": next_question is None}
+        if next_question:
+            d["answer"] = answers.value(next_question.id)
+        serializer = NextPreviousAnswerResponseSerializer(d)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def error_response(question_id, message):
+        serializer = BatchAnswerErrorSerializer({"question": question_id, "detail": message})
+        return Response(data=serializer.data, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ResumeAnswerApiView(APIView):
+    # question a user stopped at, from the progress row without replaying the survey
+    permission_classes = [IsAuthenticated]
+    query_budget = 2
+
+    @extend_schema(responses=NextPreviousAnswerResponseSerializer)
+    def get(self, request, *args, **kwargs):
+        plan = get_survey_plan(self.kwargs['survey_id'])
+        if plan is None:
+            raise Http404
+        progress = SurveyProgress.objects.filter(survey_id=plan.survey_id, user=request.user).first()
+
+        d = {"question": None, "answer": None, "finished": False}
+        if progress is None:
+            d["question"] = plan.first_question()
+        elif progress.completed:
+            d["finished"] = True
+        else:
+            question = progress.current_question_id and plan.get_question(progress.current_question_id)
+            if question:
+                d["question"] = question
+                if question.id in progress.answered_question_ids:
+                    d["answer"] = AnswerSnapshot(Answer.objects.filter(
+                        user=request.user, question_id=question.id)).value(question.id)
+            else:
+                # progress saved before resume or its question removed, find first unanswered question
+                answers = AnswerSnapshot.load(request.user, plan.survey_id)
+                question = engine.replay(plan, answers.typed_values()).current
+                d["question"] = question
+                d["finished"] = question is None
+        serializer = NextPreviousAnswerResponseSerializer(d)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
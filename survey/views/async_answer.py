@@ -0,0 +1,138 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views import View
+from rest_framework.exceptions import ParseError
+
+from survey import engine
+from survey.models import Survey, SurveyProgress
+from survey.cache import survey_cache, aget_survey_plan
+from survey.etag import version_etag
+from survey.snapshot import AnswerSnapshot
+from survey.prefetch import prefetch_hints
+from survey.serializers.answer import NextAnswerRequestSerializer, NextPreviousAnswerResponseSerializer
+from survey.serializers.question import QuestionSerializer
+from survey.translation import Translation
+from survey.views.answer import AnswerBussinesLogic, retry_conflict
+
+
+class AsyncApiView(View):
+    """
+    Base of the async respondent views for ASGI deployments. Reads use the async ORM and the
+    answer transaction runs in a thread with sync_to_async, so a worker serves other respondents
+    while it waits on the database. Responses match the DRF views, authentication is the session.
+    """
+
+    login_required = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.login_required:
+            request.user = await request.auser()
+            if not request.user.is_authenticated:
+                return JsonResponse({"detail": "Authentication credentials were not provided."}, status=403)
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except ParseError as error:
+            return JsonResponse({"detail": error.detail}, status=error.status_code)
+
+    @staticmethod
+    def not_found():
+        return JsonResponse({"detail": "Not found."}, status=404)
+
+    @staticmethod
+    def request_data(request):
+        # a malformed json body is a 400 like in DRF views
+        if request.content_type == "application/json":
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError as error:
+                raise ParseError(f"JSON parse error - {error}")
+        return request.POST
+
+
+class AsyncFirstQuestionApiView(AsyncApiView):
+    login_required = False
+    query_budget = 1
+
+    async def get(self, request, *args, **kwargs):
+        stamp = await survey_cache.aget_stamp(self.kwargs['survey_id'])
+        if stamp is None or stamp.status != Survey.StatusType.publish:
+            return self.not_found()
+        etag = quote_etag(version_etag(self.kwargs['survey_id'], stamp.version))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            plan = await aget_survey_plan(self.kwargs['survey_id'])
+            question = plan and plan.first_question()
+            if question is None:
+                return self.not_found()
+            response = JsonResponse(QuestionSerializer(question).data)
+        response["ETag"] = etag
+        return response
+
+
+class AsyncNextAnswerApiView(AsyncApiView):
+    # queries of NextAnswerApiView, and the session and user of authentication
+    query_budget = 13
+
+    @retry_conflict
+    async def post(self, request, *args, **kwargs):
+        serializer = NextAnswerRequestSerializer(data=self.request_data(request))
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+        user_answer = serializer.data.get("answer", None)
+        prefetch = serializer.data["prefetch"]
+        plan = await aget_survey_plan(self.kwargs['survey_id'])
+        if plan is None:
+            return self.not_found()
+        target_question = plan.get_question(self.kwargs['question_id'])
+        if target_question is None:
+            return self.not_found()
+        answers = await AnswerSnapshot.aload(request.user, plan.survey_id)
+        old_answer = answers.get(target_question.id)
+        progress = await SurveyProgress.objects.filter(survey_id=plan.survey_id, user=request.user).afirst()
+
+        # check user can not change answer if before finished this survey
+        if progress and progress.completed:
+            return HttpResponseBadRequest(Translation.you_answered_to_survey)
+
+        message = engine.check_question(plan, target_question, answers.typed_value)
+        if message:
+            return HttpResponseBadRequest(message)
+
+        message, value = engine.parse_answer(target_question, user_answer, old_answer is not None)
+        if message:
+            return HttpResponseBadRequest(message)
+
+        next_question = await sync_to_async(AnswerBussinesLogic.write_answer)(
+            value, old_answer, progress, plan, target_question, request.user, answers)
+
+        d = {"question": None, "answer": None, "finished": True}
+        if next_question:
+            d["question"] = next_question
+            d["answer"] = answers.value(next_question.id)
+            d["finished"] = False
+            if prefetch:
+                d["prefetch"] = prefetch_hints(plan, next_question, answers)
+        return JsonResponse(NextPreviousAnswerResponseSerializer(d).data)
+
+
+class AsyncPreviousAnswerApiView(AsyncApiView):
+    query_budget = 3
+
+    async def get(self, request, *args, **kwargs):
+        plan = await aget_survey_plan(self.kwargs['survey_id'])
+        if plan is None:
+            return self.not_found()
+        target_question = plan.get_question(self.kwargs['question_id'])
+        if target_question is None:
+            return self.not_found()
+        answers = await AnswerSnapshot.aload(request.user, plan.survey_id)
+
+        previous_question = plan.previous_question(target_question.id, answers.typed_value)
+        if previous_question:
+            d = {"question": previous_question, "answer": answers.value(previous_question.id)}
+            return JsonResponse(NextPreviousAnswerResponseSerializer(d).data)
+        return HttpResponseBadRequest(Translation.firsy_question)
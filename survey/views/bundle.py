@@ -0,0 +1,36 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.status import HTTP_404_NOT_FOUND
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from drf_spectacular.utils import extend_schema
+
+from survey.models import Survey
+from survey.bundle import survey_bundle
+from survey.cache import get_survey_plan
+from survey.etag import survey_etag
+from survey.serializers.bundle import SurveyBundleSerializer
+from survey.views.answer import BatchAnswerApiView
+
+
+class SurveyBundleApiView(APIView):
+    # published survey with its routing program, to run it offline
+    query_budget = 1
+
+    @extend_schema(request=None, responses=SurveyBundleSerializer)
+    @method_decorator(condition(etag_func=survey_etag))
+    def get(self, request, *args, **kwargs):
+        survey = Survey.objects.filter(id=self.kwargs['survey_id'], status=Survey.StatusType.publish).first()
+        plan = survey and get_survey_plan(survey.id)
+        if not plan:
+            return Response(status=HTTP_404_NOT_FOUND, data={"detail": "Not found."})
+        return Response(survey_bundle(survey, plan))
+
+
+class UploadBundleAnswersApiView(BatchAnswerApiView):
+    """
+    Answers of a respondent that ran the survey bundle offline, every shown question in
+    order, without answer for the skipped ones. They are validated like batch answers
+    and saved only if they finish the survey.
+    """
+    require_finished = True
@@ -4,11 +4,13 @@ from rest_framework.status import HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from survey.models import Condition, Operatior, Survey
+from survey.cache import batch_touches
 from survey.serializers.conditions import ConditionSerializer, OperatiorSerializer
 
 
 class ConditionViewSet(viewsets.ModelViewSet):
     serializer_class = ConditionSerializer
+    query_budget = 1
 
     def get_queryset(self):
         return Condition.objects.filter(survey_id=self.kwargs['survey_id'])
@@ -17,12 +19,14 @@ class ConditionViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         if instance.survey.status == Survey.StatusType.publish:
             return Response(status=HTTP_400_BAD_REQUEST, data="survey status is publish")
-        instance.delete()
+        with batch_touches():
+            instance.delete()
         return Response(status=HTTP_204_NO_CONTENT)
 
 
 class OperatiorViewSet(viewsets.ModelViewSet):
     serializer_class = OperatiorSerializer
+    query_budget = 1
 
     def get_queryset(self):
         return Operatior.objects.filter(survey_id=self.kwargs['survey_id'])
@@ -31,6 +35,7 @@ class OperatiorViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         if instance.survey.status == Survey.StatusType.publish:
             return Response(status=HTTP_400_BAD_REQUEST, data="survey status is publish")
-        instance.delete()
+        with batch_touches():
+            instance.delete()
         return Response(status=HTTP_204_NO_CONTENT)
 
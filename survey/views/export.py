@@ -0,0 +1,26 @@
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
+from django.http import Http404, StreamingHttpResponse
+from drf_spectacular.utils import extend_schema, OpenApiTypes
+
+from survey.cache import survey_cache
+from survey.export import AnswerExport
+
+
+class ExportAnswersApiView(APIView):
+    # streaming export of all answers of a survey, one row per respondent
+    permission_classes = [IsAdminUser]
+    query_budget = 1
+
+    @extend_schema(responses={(200, "text/csv"): OpenApiTypes.STR, (200, "application/jsonl"): OpenApiTypes.STR})
+    def get(self, request, *args, **kwargs):
+        output_format = self.kwargs['output_format']
+        if output_format not in AnswerExport.formats:
+            raise Http404
+        stamp = survey_cache.get_stamp(self.kwargs['survey_id'])
+        if stamp is None:
+            raise Http404
+        export = AnswerExport(survey_cache.get_definition(self.kwargs['survey_id'], stamp.version))
+        response = StreamingHttpResponse(export.lines(output_format), content_type=AnswerExport.formats[output_format])
+        response["Content-Disposition"] = f'attachment; filename="survey-{self.kwargs["survey_id"]}.{output_format}"'
+        return response
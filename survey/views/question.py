@@ -2,29 +2,41 @@ from rest_framework import viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.status import HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from drf_spectacular.utils import extend_schema
 
 from survey.models import Question, Option, Survey, Condition
+from survey.cache import batch_touches
+from survey.definition import question_options
+from survey.etag import survey_etag, question_options_etag
 from survey.serializers.question import QuestionSerializer, OptionSerializer
 from survey.translation import Translation
 
 
+@method_decorator(condition(etag_func=survey_etag), name="list")
+@method_decorator(condition(etag_func=survey_etag), name="retrieve")
 class QuestionViewSet(viewsets.ModelViewSet):
     serializer_class = QuestionSerializer
+    query_budget = 3
 
     def get_queryset(self):
-        return Question.objects.filter(survey_id=self.kwargs['survey_id'])
+        return Question.objects.filter(survey_id=self.kwargs['survey_id']).prefetch_related(question_options())
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         if instance.survey.status == Survey.StatusType.publish:
             return Response(status=HTTP_400_BAD_REQUEST, data=Translation.survey_status_is_publish)
-        instance.delete()
+        with batch_touches():
+            instance.delete()
         return Response(status=HTTP_204_NO_CONTENT)
 
 
 class FirstQuestionApiView(APIView):
+    query_budget = 3
+
     @extend_schema(request=None, responses=QuestionSerializer)
+    @method_decorator(condition(etag_func=survey_etag))
     def get(self, request, *args, **kwargs):
         queryset = Question.objects.filter(
             survey_id=self.kwargs['survey_id'], survey__status=Survey.StatusType.publish).order_by("priority").first()
@@ -34,8 +46,11 @@ class FirstQuestionApiView(APIView):
         return Response(serializer.data)
 
 
+@method_decorator(condition(etag_func=question_options_etag), name="list")
+@method_decorator(condition(etag_func=question_options_etag), name="retrieve")
 class OptionViewSet(viewsets.ModelViewSet):
     serializer_class = OptionSerializer
+    query_budget = 2
 
     def get_queryset(self):
         return Option.objects.filter(question_id=self.kwargs['question_id'])
@@ -44,6 +59,7 @@ class OptionViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         if instance.question.survey.status == Survey.StatusType.publish:
             return Response(status=HTTP_400_BAD_REQUEST, data=Translation.survey_status_is_publish)
-        Condition.objects.filter(source_question_id=kwargs["question_id"], value=kwargs["pk"]).delete()
-        instance.delete()
+        with batch_touches():
+            Condition.objects.filter(source_question_id=kwargs["question_id"], value=kwargs["pk"]).delete()
+            instance.delete()
         return Response(status=HTTP_204_NO_CONTENT)
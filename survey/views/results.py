@@ -0,0 +1,25 @@
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from django.http import Http404
+from drf_spectacular.utils import extend_schema
+
+from survey.cache import survey_cache
+from survey.serializers.results import QuestionResultSerializer
+from survey.tally import question_results
+
+
+class ResultsApiView(APIView):
+    # answer counts of every question, per option and numerical bucket, read from the tallies
+    permission_classes = [IsAdminUser]
+    # survey stamp and definition when they are not cached, and the tallies
+    query_budget = 6
+
+    @extend_schema(responses=QuestionResultSerializer(many=True))
+    def get(self, request, *args, **kwargs):
+        stamp = survey_cache.get_stamp(self.kwargs['survey_id'])
+        if stamp is None:
+            raise Http404
+        definition = survey_cache.get_definition(self.kwargs['survey_id'], stamp.version)
+        serializer = QuestionResultSerializer(question_results(definition), many=True)
+        return Response(serializer.data)
@@ -0,0 +1,25 @@
+from rest_framework.generics import ListAPIView
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.permissions import IsAdminUser
+from django.http import Http404
+
+from survey.cache import get_survey_plan
+from survey.serializers.segment import SegmentUserSerializer
+
+
+class SegmentPagination(LimitOffsetPagination):
+    default_limit = 1000
+
+
+class SegmentApiView(ListAPIView):
+    # respondents of a published survey that target question is visible for them
+    permission_classes = [IsAdminUser]
+    serializer_class = SegmentUserSerializer
+    pagination_class = SegmentPagination
+    query_budget = 2
+
+    def get_queryset(self):
+        plan = get_survey_plan(self.kwargs['survey_id'])
+        if plan is None or plan.get_question(self.kwargs['question_id']) is None:
+            raise Http404
+        return plan.segment(self.kwargs['question_id']).order_by("id")
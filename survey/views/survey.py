@@ -1,26 +1,57 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.status import HTTP_400_BAD_REQUEST, HTTP_204_NO_CONTENT, HTTP_404_NOT_FOUND
-from django.db.models import Q, F, Count
+from rest_framework.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST, HTTP_204_NO_CONTENT, HTTP_404_NOT_FOUND
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from drf_spectacular.utils import extend_schema
 
-from survey.models import Survey, Question, Condition, Operatior
-from survey.serializers.survey import SurveySerializer, SurveyPublishSerializer
+from survey.models import Survey
+from survey.analysis import analyze_survey
+from survey.definition import SurveyDefinition
+from survey.etag import survey_etag, survey_list_etag
+from survey.cache import survey_cache, publish_survey_plan, batch_touches
+from survey.importer import SurveyImport
+from survey.routing import compile_survey
+from survey.serializers.survey import (
+    SurveySerializer,
+    SurveyCloneSerializer,
+    SurveyPublishSerializer,
+    SurveyValidationSerializer,
+    SurveyDefinitionSerializer,
+    SurveyImportSerializer,
+)
+from survey.validation import validate_definition
 from survey.translation import Translation
 
 
+@method_decorator(condition(etag_func=survey_list_etag), name="list")
+@method_decorator(condition(etag_func=survey_etag), name="retrieve")
 class SurveyViewSet(viewsets.ModelViewSet):
     serializer_class = SurveySerializer
     queryset = Survey.objects.all()
+    query_budget = 2
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         if instance.status == Survey.StatusType.publish:
             return Response(status=HTTP_400_BAD_REQUEST, data=Translation.survey_status_is_publish)
-        instance.delete()
+        with batch_touches():
+            instance.delete()
         return Response(status=HTTP_204_NO_CONTENT)
 
+    @extend_schema(request=SurveyCloneSerializer, responses={201: SurveySerializer})
+    @action(detail=True, methods=["post"])
+    def clone(self, request, *args, **kwargs):
+        # copy a survey, published or not, into a new draft in a constant number of queries
+        instance = self.get_object()
+        serializer = SurveyCloneSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        definition = survey_cache.get_definition(instance.id, instance.version)
+        survey = SurveyImport(serializer.validated_data.get("title", instance.title), definition).save()
+        return Response(status=HTTP_201_CREATED, data=SurveySerializer(survey).data)
+
 
 class PublishSurveyApiView(APIView):
     @extend_schema(request=None, responses=SurveyPublishSerializer)
@@ -28,55 +59,64 @@ class PublishSurveyApiView(APIView):
         survey = Survey.objects.filter(id=self.kwargs['survey_id']).exclude(status=Survey.StatusType.publish).first()
         if not survey:
             return Response(status=HTTP_404_NOT_FOUND, data={"detail": "Not found."})
-        questions = Question.objects.filter(survey=survey)
-        conditions = Condition.objects.filter(survey=survey)
-        operations = Operatior.objects.filter(survey=survey)
-
-        # check the survey have question
-        if not questions.exists():
-            return Response(status=HTTP_400_BAD_REQUEST, data=Translation.survey_dont_have_question)
-        
-        # check all question have unique priorities
-        if questions.count() != questions.filter(priority__isnull=False).values_list("priority").distinct().count():
-            return Response(status=HTTP_400_BAD_REQUEST, data=Translation.unique_question_priorities)
-
-        # check all question with type option, have minimum 2 option
-        if questions.filter(question_type=Question.QuestionType.option).annotate(num_options=Count('option')).filter(
-            num_options__lte=1).exists():
-
-            return Response(status=HTTP_400_BAD_REQUEST, data=Translation.question_minimum_option)
-
-        # double check source question priority < target question priority (maybe question updated later):
-        if conditions.filter(source_question__priority__gte=F('target_question__priority')).exists():
-            return Response(status=HTTP_400_BAD_REQUEST, data=Translation.condition_question_priorities)
-
-        # operation validation
-        # TODO NEED OPTIMIZATION
-        for question_with_condition in conditions.values_list("target_question").distinct():
-            qwc = question_with_condition[0]
-
-            question_condition = conditions.filter(target_question=qwc)
-            # one condition dont need operation
-            if question_condition.count() <= 1:
-                continue
-
-            question_operations = operations.filter(
-                Q(first_condition__target_question=qwc) | Q(second_condition__target_question=qwc))
-
-            # check operations have unique priorities
-            if question_operations.count() != question_operations.values_list("priority").distinct().count():
-                return Response(status=HTTP_400_BAD_REQUEST, data=Translation.operation_priorities)
-
-            # check operation between all condition in any question
-            used_condition_ids = question_operations.values_list('first_condition_id', 'second_condition_id')
-            unique_used_condition_ids = set()
-            for i, j in used_condition_ids:
-                unique_used_condition_ids.add(i)
-                unique_used_condition_ids.add(j)
-            if question_condition.exclude(id__in=unique_used_condition_ids).exists():
-                return Response(status=HTTP_400_BAD_REQUEST, data=Translation.operation_between_condition)
 
+        definition = SurveyDefinition.load(survey.id)
+        violations = validate_definition(definition)
+        if violations:
+            return Response(status=HTTP_400_BAD_REQUEST, data=violations[0].message)
+
+        plan = compile_survey(definition)
         survey.status = Survey.StatusType.publish
+        survey.analysis = analyze_survey(plan)
         survey.save()
+        publish_survey_plan(survey.id, definition, plan)
         response = SurveyPublishSerializer({"message": "done"}).data
         return Response(response)
+
+
+class ValidateSurveyApiView(APIView):
+    # dry run of publish that return all violations
+    @extend_schema(request=None, responses=SurveyValidationSerializer)
+    def get(self, request, *args, **kwargs):
+        stamp = survey_cache.get_stamp(self.kwargs['survey_id'])
+        if stamp is None:
+            return Response(status=HTTP_404_NOT_FOUND, data={"detail": "Not found."})
+        violations = validate_definition(survey_cache.get_definition(self.kwargs['survey_id'], stamp.version))
+        serializer = SurveyValidationSerializer({"valid": not violations, "violations": violations})
+        return Response(serializer.data)
+
+
+class SurveyDefinitionApiView(APIView):
+    # survey, questions in priority order with options and routing rules, in a constant number of queries
+    query_budget = 5
+
+    @extend_schema(request=None, responses=SurveyDefinitionSerializer)
+    def get(self, request, *args, **kwargs):
+        survey = Survey.objects.filter(id=self.kwargs['survey_id']).first()
+        if not survey:
+            return Response(status=HTTP_404_NOT_FOUND, data={"detail": "Not found."})
+        definition = survey_cache.get_definition(survey.id, survey.version)
+        serializer = SurveyDefinitionSerializer({
+            "survey": survey,
+            "questions": definition.questions,
+            "conditions": definition.conditions,
+            "operators": definition.operators,
+        })
+        return Response(serializer.data)
+
+
+class ImportSurveyApiView(APIView):
+    # create a draft survey from a definition document, with one insert per model
+    query_budget = 11
+
+    @extend_schema(request=SurveyImportSerializer, responses={201: SurveySerializer, 400: SurveyValidationSerializer})
+    def post(self, request, *args, **kwargs):
+        serializer = SurveyImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        survey_import = SurveyImport.from_document(serializer.validated_data)
+        violations = survey_import.violations()
+        if violations:
+            serializer = SurveyValidationSerializer({"valid": False, "violations": violations})
+            return Response(status=HTTP_400_BAD_REQUEST, data=serializer.data)
+        survey = survey_import.save()
+        return Response(status=HTTP_201_CREATED, data=SurveySerializer(survey).data)
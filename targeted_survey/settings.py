@@ -53,12 +53,24 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'survey.instrumentation.QueryAccountingMiddleware',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# send X-Query-Count and X-Query-Time-Ms headers on every response
+SURVEY_QUERY_HEADERS = DEBUG
+
+# cache alias for survey definitions and compiled plans, use a shared backend (redis, memcached,
+# database or file) when running several workers, entries are replaced when Survey.version changes
+SURVEY_CACHE = 'default'
+SURVEY_CACHE_TIMEOUT = 60 * 60 * 24
+
+# width of numerical answer buckets in results, run rebuild_tallies after changing it
+SURVEY_TALLY_BUCKET_SIZE = 10
+
 ROOT_URLCONF = 'targeted_survey.urls'
 
 TEMPLATES = [